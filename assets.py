@@ -0,0 +1,78 @@
+import functools
+import os
+import sys
+
+MATHJAX_VERSION = '2.7.7'
+MERMAID_VERSION = '10.9.1'
+
+# Served by the mdr:// scheme handler from the assets directory
+ASSET_HOST = 'app'
+MATHJAX_SCRIPT = 'mathjax/MathJax.js'
+MERMAID_SCRIPT = 'mermaid/mermaid.min.js'
+
+MATHJAX_DOWNLOAD = f'https://github.com/mathjax/MathJax/archive/refs/tags/{MATHJAX_VERSION}.zip'
+MERMAID_DOWNLOAD = f'https://cdn.jsdelivr.net/npm/mermaid@{MERMAID_VERSION}/dist/mermaid.min.js'
+
+# Parts of the MathJax release the reader never loads
+_MATHJAX_SKIP = ('unpacked/', 'test/', 'docs/', 'fonts/HTML-CSS/TeX/png/', 'fonts/HTML-CSS/STIX-Web/')
+
+
+def assets_dir():
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, 'assets')
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+
+def asset_url(name):
+    return f'mdr://{ASSET_HOST}/{name}'
+
+
+def asset_path(name):
+    root = os.path.realpath(assets_dir())
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def read_asset(name):
+    """Contents of a bundled asset, read once per process; None if it is missing."""
+    path = asset_path(name)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (OSError, TypeError):
+        return None
+
+
+def download_assets(directory=None):
+    # Only needed by this setup step; importing them would slow the viewer's startup
+    import io
+    import urllib.request
+    import zipfile
+    directory = directory or assets_dir()
+    mermaid_path = os.path.join(directory, MERMAID_SCRIPT)
+    os.makedirs(os.path.dirname(mermaid_path), exist_ok=True)
+    with urllib.request.urlopen(MERMAID_DOWNLOAD) as response, open(mermaid_path, 'wb') as f:
+        f.write(response.read())
+    print(f'已下载 Mermaid {MERMAID_VERSION}')
+
+    with urllib.request.urlopen(MATHJAX_DOWNLOAD) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.read()))
+    mathjax_dir = os.path.join(directory, os.path.dirname(MATHJAX_SCRIPT))
+    prefix = f'MathJax-{MATHJAX_VERSION}/'
+    for member in archive.infolist():
+        name = member.filename[len(prefix):]
+        if not name or member.is_dir() or name.startswith(_MATHJAX_SKIP):
+            continue
+        target = os.path.join(mathjax_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with archive.open(member) as source, open(target, 'wb') as f:
+            f.write(source.read())
+    print(f'已下载 MathJax {MATHJAX_VERSION}')
+
+
+if __name__ == "__main__":
+    # Run once before packaging so the reader works without network access
+    download_assets(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,40 @@
+import hashlib
+import threading
+
+from disk_cache import make_key
+from pandoc_server import pandoc_executable, pandoc_version
+
+
+class AstCache:
+    """pandoc's JSON AST per document content, so every writer runs from one parse.
+
+    Exports of the same content that start together wait for the first parse
+    instead of each running their own.
+    """
+
+    def __init__(self, cache, executable=None):
+        self.cache = cache
+        self.executable = executable or pandoc_executable()
+        self._lock = threading.Lock()
+        self._parsing = {}
+
+    def key(self, text):
+        return make_key('ast', pandoc_version(self.executable), hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def get(self, text, parse):
+        """Return the AST of text, calling parse(text) only if it is not cached yet."""
+        key = self.key(text)
+        with self._lock:
+            parsing = self._parsing.setdefault(key, threading.Lock())
+        try:
+            with parsing:
+                ast = self.cache.get(key)
+                if ast is not None:
+                    return ast.decode('utf-8')
+                ast = parse(text)
+                self.cache.put(key, ast.encode('utf-8'))
+                return ast
+        finally:
+            with self._lock:
+                if self._parsing.get(key) is parsing and not parsing.locked():
+                    del self._parsing[key]
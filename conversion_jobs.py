@@ -0,0 +1,307 @@
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtWidgets import QDockWidget, QHBoxLayout, QProgressBar, QPushButton, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
+
+from pandoc_server import PandocError, PandocServerUnavailable, build_request, pandoc_executable, parse_request, read_document
+from tracing import TRACER
+
+QUEUED = '排队中'
+RUNNING = '转换中'
+DONE = '完成'
+FAILED = '失败'
+CANCELLED = '已取消'
+
+# Formats offered for export ("导出全部格式" exports every one of them)
+EXPORT_FORMATS = ['docx', 'html', 'epub', 'pdf']
+
+
+class ConversionCancelled(Exception):
+    pass
+
+
+class PandocNotInstalled(Exception):
+    pass
+
+
+class ConversionJob:
+    def __init__(self, job_id, input_file, output_file, format_type, notify=False):
+        self.id = job_id
+        self.input_file = input_file
+        self.output_file = output_file
+        self.format_type = format_type
+        self.resource_dir = os.path.dirname(input_file)
+        # Interactive exports report failures in a dialog, batch jobs only in the panel
+        self.notify = notify
+        self.state = QUEUED
+        self.progress = 0
+        self.message = ''
+        self.attempts = 0
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ConversionCancelled()
+
+
+def run_pandoc_process(job, arguments, input_text=None):
+    """Run a one-off pandoc process and return its output, killing it if the job is cancelled."""
+    executable = pandoc_executable()
+    # Checked here: a FileNotFoundError may as well be a missing input or output folder
+    if not os.path.isfile(executable):
+        raise PandocNotInstalled(executable)
+    command = [executable, *arguments]
+    creationflags = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS if sys.platform == 'win32' else 0
+    process = subprocess.Popen(command,
+                               creationflags=creationflags,
+                               stdin=subprocess.DEVNULL if input_text is None else subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               text=True,
+                               encoding='utf-8',
+                               errors='ignore')
+    while True:
+        try:
+            stdout, stderr = process.communicate(input_text, timeout=0.2)
+            break
+        except subprocess.TimeoutExpired:
+            if job.cancel_event.is_set():
+                process.kill()
+                process.communicate()
+                raise ConversionCancelled()
+    if process.returncode != 0:
+        raise PandocError(f'Pandoc exited with code {process.returncode}\n{stderr}')
+    return stdout
+
+
+def write_arguments(job):
+    return ['-o', job.output_file, '--embed-resources', '--standalone', f'--resource-path={job.resource_dir}']
+
+
+class ConversionQueue(QObject):
+    """Runs exports on a bounded pool of worker threads.
+
+    The threads mostly wait on pandoc, which does the work in its own process, so
+    several conversions proceed on all cores while the window stays usable.
+    """
+    jobChanged = Signal(int)
+    jobFinished = Signal(int)
+
+    def __init__(self, pandoc_server=None, workers=None, export_cache=None, ast_cache=None, html_exporter=None,
+                 pdf_exporter=None, parent=None):
+        super().__init__(parent)
+        self.pandoc_server = pandoc_server
+        self.export_cache = export_cache
+        self.ast_cache = ast_cache
+        # Formats written from the viewer's render instead of by pandoc
+        self.exporters = {format_type: exporter for format_type, exporter in
+                          (('html', html_exporter), ('pdf', pdf_exporter)) if exporter is not None}
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2, thread_name_prefix='convert')
+        self.jobs = OrderedDict()
+        self._next_id = 1
+
+    def submit(self, input_file, output_file, format_type, notify=False):
+        job = ConversionJob(self._next_id, input_file, output_file, format_type, notify)
+        self._next_id += 1
+        self.jobs[job.id] = job
+        self._schedule(job)
+        return job
+
+    def _schedule(self, job):
+        job.cancel_event.clear()
+        self._update(job, QUEUED, 0, '')
+        job.future = self.executor.submit(self._run, job)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        job.cancel_event.set()
+        # A job that has not started yet is dropped right away; a running one stops
+        # at its next check (its output is discarded)
+        if job.future.cancel():
+            self._finish(job, CANCELLED, '')
+
+    def retry(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and job.state in (FAILED, CANCELLED):
+            self._schedule(job)
+
+    def clear_finished(self):
+        for job_id in [job.id for job in self.jobs.values() if job.finished]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job, state=None, progress=None, message=None):
+        if state is not None:
+            job.state = state
+        if progress is not None:
+            job.progress = progress
+        if message is not None:
+            job.message = message
+        self.jobChanged.emit(job.id)
+
+    def _finish(self, job, state, message):
+        self._update(job, state, 100 if state == DONE else job.progress, message)
+        self.jobFinished.emit(job.id)
+
+    def _run(self, job):
+        job.attempts += 1
+        span = TRACER.span('转换', 'convert', document=job.input_file, format=job.format_type)
+        try:
+            job.check_cancelled()
+            self._update(job, RUNNING, 10)
+            cached = self._convert(job)
+        except ConversionCancelled:
+            span.finish(state=CANCELLED)
+            self._finish(job, CANCELLED, '')
+        except PandocNotInstalled:
+            span.finish(state=FAILED)
+            self._finish(job, FAILED, 'Pandoc未安装')
+        except PandocError as e:
+            span.finish(state=FAILED)
+            self._finish(job, FAILED, f'转换失败: {e}')
+        except Exception as e:
+            span.finish(state=FAILED)
+            self._finish(job, FAILED, f'转换过程中发生错误: {str(e)}')
+        else:
+            span.finish(state=DONE, cached=cached)
+            message = f'转换完成: {os.path.basename(job.input_file)} -> {os.path.basename(job.output_file)}'
+            self._finish(job, DONE, message + (' (使用缓存)' if cached else ''))
+
+    def _convert(self, job):
+        """Produce job.output_file; returns True if it was copied from the export cache."""
+        exporter = self.exporters.get(job.format_type)
+        if exporter is not None:
+            self._update(job, progress=30)
+            with TRACER.span('导出 ' + job.format_type.upper(), 'convert', document=job.input_file):
+                exporter.export(job.input_file, job.output_file, job.cancel_event)
+            return False
+        key = None
+        if self.export_cache is not None:
+            key = self.export_cache.key(job.input_file, job.resource_dir, job.format_type)
+            if key is not None and self.export_cache.restore(key, job.output_file):
+                return True
+        job.check_cancelled()
+        self._run_pandoc(job)
+        if key is not None:
+            self.export_cache.store(key, job.output_file)
+        return False
+
+    def _run_pandoc(self, job):
+        text = read_document(job.input_file)
+        if self.pandoc_server is not None:
+            try:
+                ast = self._parse(job, text, lambda text: self.pandoc_server.convert(parse_request(text)).decode('utf-8'))
+                request = build_request(text, job.format_type, job.resource_dir, ast)
+                job.check_cancelled()
+                self._update(job, progress=60)
+                with TRACER.span('Pandoc 写出', 'convert', document=job.input_file):
+                    output = self.pandoc_server.convert(request)
+                job.check_cancelled()
+                self._update(job, progress=90)
+                with open(job.output_file, 'wb') as f:
+                    f.write(output)
+                return
+            except PandocServerUnavailable:
+                # e.g. a pandoc build without the server command; convert the old way
+                pass
+        if self.ast_cache is None:
+            self._update(job, progress=30)
+            with TRACER.span('Pandoc 转换', 'convert', document=job.input_file):
+                run_pandoc_process(job, [job.input_file, *write_arguments(job)])
+            return
+        ast = self._parse(job, text, lambda text: run_pandoc_process(job, ['-f', 'markdown', '-t', 'json'], text))
+        job.check_cancelled()
+        self._update(job, progress=60)
+        with TRACER.span('Pandoc 写出', 'convert', document=job.input_file):
+            run_pandoc_process(job, ['-f', 'json', *write_arguments(job)], ast)
+
+    def _parse(self, job, text, parse):
+        """The document's AST from the cache (parsed once per content), or None without an AST cache."""
+        if self.ast_cache is None:
+            return None
+        self._update(job, progress=30)
+        with TRACER.span('Pandoc 解析', 'convert', document=job.input_file):
+            return self.ast_cache.get(text, parse)
+
+
+class ConversionJobsPanel(QDockWidget):
+    def __init__(self, queue, parent=None):
+        super().__init__('转换任务', parent)
+        self.queue = queue
+        self.items = {}
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(['文件', '格式', '状态', '进度'])
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSelectionMode(QTreeWidget.ExtendedSelection)
+
+        cancelButton = QPushButton('取消')
+        cancelButton.clicked.connect(self.cancelSelected)
+        retryButton = QPushButton('重试')
+        retryButton.clicked.connect(self.retrySelected)
+        clearButton = QPushButton('清除已完成')
+        clearButton.clicked.connect(self.clearFinished)
+        buttons = QHBoxLayout()
+        buttons.addWidget(cancelButton)
+        buttons.addWidget(retryButton)
+        buttons.addStretch()
+        buttons.addWidget(clearButton)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.tree)
+        layout.addLayout(buttons)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        self.queue.jobChanged.connect(self.updateJob)
+
+    def updateJob(self, job_id):
+        job = self.queue.jobs.get(job_id)
+        if job is None:
+            return
+        item = self.items.get(job_id)
+        if item is None:
+            item = QTreeWidgetItem([os.path.basename(job.input_file), job.format_type.upper(), '', ''])
+            item.setData(0, Qt.UserRole, job_id)
+            item.setToolTip(0, job.input_file)
+            self.tree.addTopLevelItem(item)
+            self.tree.setItemWidget(item, 3, QProgressBar())
+            self.items[job_id] = item
+        item.setText(2, job.state)
+        item.setToolTip(2, job.message)
+        self.tree.itemWidget(item, 3).setValue(job.progress)
+
+    def selectedJobs(self):
+        return [item.data(0, Qt.UserRole) for item in self.tree.selectedItems()]
+
+    def cancelSelected(self):
+        for job_id in self.selectedJobs():
+            self.queue.cancel(job_id)
+
+    def retrySelected(self):
+        for job_id in self.selectedJobs():
+            self.queue.retry(job_id)
+
+    def clearFinished(self):
+        self.queue.clear_finished()
+        for job_id in [job_id for job_id in self.items if job_id not in self.queue.jobs]:
+            item = self.items.pop(job_id)
+            self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sys
+import threading
+import zlib
+
+_COMPRESSED = b'Z'
+_RAW = b'R'
+
+
+def user_cache_dir(*parts):
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(r'~\AppData\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'MarkdownReader', *parts)
+
+
+def user_data_dir(*parts):
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser(r'~\AppData\Roaming')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(base, 'MarkdownReader', *parts)
+
+
+def make_key(*parts):
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """Size-capped key/value store on disk with least-recently-used eviction.
+
+    Every entry is one file; its mtime records the last hit, so the LRU order
+    survives restarts and is shared by every process using the directory.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, compress=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        flag, payload = data[:1], data[1:]
+        if flag == _RAW:
+            return payload
+        if flag == _COMPRESSED:
+            try:
+                return zlib.decompress(payload)
+            except zlib.error:
+                pass
+        self.remove(key)
+        return None
+
+    def put(self, key, value):
+        payload = _COMPRESSED + zlib.compress(value, 1) if self.compress else _RAW + value
+        if len(payload) > self.max_bytes:
+            return False
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            # Readers never see a half-written entry
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+        self._grow(len(payload) - previous)
+        return True
+
+    def _grow(self, delta):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += delta
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+    def size(self):
+        with self._lock:
+            self._size = sum(size for _, size, _ in self._scan())
+            return self._size
+
+    def _scan(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        # Evict down to 90% of the cap so a full cache does not rescan on every put
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
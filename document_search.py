@@ -0,0 +1,113 @@
+import bisect
+import html
+import re
+
+# Left out of the searchable text, both here and by the page script: figures,
+# formulas and diagrams are drawn, not read
+_SKIPPED_RE = re.compile(
+    r'<(math|svg)\b.*?</\1>'
+    r'|<div class="mermaid">.*?</div>'
+    r'|<(span|div) class="[^"]*" data-figure="[0-9a-f]+">.*?</\2>'
+    r'|<!--.*?-->',
+    re.S | re.I)
+# The HTML parser drops a newline right after <pre>, so textContent has none
+_PRE_NEWLINE_RE = re.compile(r'(<pre\b[^>]*>)\r?\n', re.I)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+_SEPARATOR = '\0'
+
+# Matches highlighted on the page; the count stays exact beyond this
+MAX_HIGHLIGHTS = 10000
+
+
+def block_text(block_html):
+    """The text of rendered block HTML as the page's textContent sees it."""
+    text = _SKIPPED_RE.sub('', block_html)
+    text = _PRE_NEWLINE_RE.sub(r'\1', text)
+    return html.unescape(_TAG_RE.sub('', text)).replace('\r\n', '\n')
+
+
+class SearchError(Exception):
+    pass
+
+
+class DocumentSearch:
+    """Text of a rendered document, searched without going through the page.
+
+    Built once per load from the renderer's blocks (unchanged blocks reuse the
+    text of the previous index). The block texts are joined into one string, so
+    a search is a single scan in C and matches are kept as flat spans; they are
+    only mapped to blocks when shown.
+    """
+
+    def __init__(self, blocks, previous=None):
+        reuse = previous.texts_by_hash if previous is not None else {}
+        self.ids = []
+        self.lines = []
+        self.starts = []
+        self.texts_by_hash = {}
+        texts = []
+        offset = 0
+        for block in blocks:
+            text = reuse.get(block.hash)
+            if text is None:
+                text = block_text(block.html)
+            self.texts_by_hash[block.hash] = text
+            self.ids.append(block.id)
+            self.lines.append(block.line)
+            self.starts.append(offset)
+            texts.append(text)
+            offset += len(text) + 1
+        # Blocks are separated by NUL, which no match may span
+        self.text = _SEPARATOR.join(texts)
+        folded = self.text.lower()
+        # Lowercasing changes the length of a few characters; offsets must line up
+        self.folded = folded if len(folded) == len(self.text) else None
+
+    def block_text(self, index):
+        end = self.starts[index + 1] - 1 if index + 1 < len(self.starts) else len(self.text)
+        return self.text[self.starts[index]:end]
+
+    def find(self, pattern, regex=False, case=False):
+        """All matches as (start, end) spans of the joined text."""
+        if not pattern:
+            return []
+        if not regex and (case or self.folded is not None):
+            haystack, needle = (self.text, pattern) if case else (self.folded, pattern.lower())
+            matches = []
+            position = haystack.find(needle)
+            while position >= 0:
+                matches.append((position, position + len(needle)))
+                position = haystack.find(needle, position + len(needle))
+            return matches
+        try:
+            expression = re.compile(pattern if regex else re.escape(pattern), 0 if case else re.I)
+        except re.error as e:
+            raise SearchError(str(e))
+        text = self.text
+        return [match.span() for match in expression.finditer(text)
+                if match.end() > match.start() and text.find(_SEPARATOR, match.start(), match.end()) < 0]
+
+    def locate(self, match):
+        """(block index, start, end) of a match, offsets into the block's text."""
+        index = bisect.bisect_right(self.starts, match[0]) - 1
+        return index, match[0] - self.starts[index], match[1] - self.starts[index]
+
+    def highlights(self, matches, limit=MAX_HIGHLIGHTS):
+        """Matches grouped by block id, as the page script takes them."""
+        grouped = {}
+        for match in matches[:limit]:
+            index, start, end = self.locate(match)
+            grouped.setdefault(self.ids[index], []).append([start, end])
+        return grouped
+
+    def line(self, match):
+        return self.lines[self.locate(match)[0]]
+
+    def nearest(self, matches, line):
+        """Index of the first match at or after a source line."""
+        block = bisect.bisect_left(self.lines, line)
+        if block >= len(self.starts):
+            return 0
+        index = bisect.bisect_left(matches, (self.starts[block], 0))
+        return index if index < len(matches) else 0
@@ -0,0 +1,144 @@
+from figures import diagram_html, math_html
+
+DEFAULT_ENGINE = 'markdown2'
+
+
+class Engine:
+    """A Markdown to HTML backend.
+
+    Every engine supports tables, fenced code, $/$$ math and mermaid fences, and
+    emits math and diagrams in the markup the figure cache understands, so the
+    rest of the pipeline does not care which one produced a block.
+    """
+    name = None
+    package = None
+
+    @classmethod
+    def version(cls):
+        # importlib.metadata takes ~40 ms to import; keep it off the startup path
+        import importlib.metadata
+        return importlib.metadata.version(cls.package)
+
+    @classmethod
+    def available(cls):
+        import importlib.metadata
+        try:
+            cls.version()
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        return True
+
+    def convert(self, source):
+        raise NotImplementedError
+
+
+def _latex_to_mathml(tex, display):
+    import latex2mathml.converter
+    # Engines disagree on surrounding whitespace; strip it so they share cache keys
+    tex = tex.strip()
+    return math_html(tex, display, latex2mathml.converter.convert(tex, display=display))
+
+
+class Markdown2Engine(Engine):
+    name = 'markdown2'
+    package = 'markdown2'
+    extras = ['tables', 'fenced-code-blocks', 'latex', 'mermaid']
+
+    def __init__(self):
+        import markdown2
+
+        class _Markdown(markdown2.Markdown):
+            def _setup_extras(self):
+                super()._setup_extras()
+                # markdown2's latex extra keeps its code placeholders in a class-level dict
+                # that grows with every conversion; give each conversion its own
+                latex = self.extra_classes.get('latex')
+                if latex is not None:
+                    latex.code_blocks = {}
+                    # Keep the TeX next to the MathML so formulas can be looked up in the figure cache
+                    latex._convert_single_match = lambda match: _latex_to_mathml(match.group(1), 'inline')
+                    latex._convert_double_match = lambda match: _latex_to_mathml(match.group(1).replace(r"\n", ''), 'block')
+
+        self._markdown = _Markdown(extras=self.extras)
+
+    def convert(self, source):
+        return self._markdown.convert(source)
+
+
+class MarkdownItEngine(Engine):
+    name = 'markdown-it'
+    package = 'markdown-it-py'
+
+    @classmethod
+    def available(cls):
+        import importlib.metadata
+        try:
+            importlib.metadata.version('mdit-py-plugins')
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        return super().available()
+
+    def __init__(self):
+        from markdown_it import MarkdownIt
+        from markdown_it.renderer import RendererHTML
+        from mdit_py_plugins.dollarmath import dollarmath_plugin
+
+        def fence(renderer, tokens, idx, options, env):
+            token = tokens[idx]
+            if token.info.strip() == 'mermaid':
+                return diagram_html(token.content)
+            return RendererHTML.fence(renderer, tokens, idx, options, env)
+
+        def inline_math(renderer, tokens, idx, options, env):
+            return _latex_to_mathml(tokens[idx].content, 'inline')
+
+        def block_math(renderer, tokens, idx, options, env):
+            return _latex_to_mathml(tokens[idx].content, 'block')
+
+        self._markdown = MarkdownIt('commonmark', {'html': True}).enable('table')
+        self._markdown.use(dollarmath_plugin, double_inline=True)
+        self._markdown.add_render_rule('fence', fence)
+        self._markdown.add_render_rule('math_inline', inline_math)
+        self._markdown.add_render_rule('math_inline_double', block_math)
+        self._markdown.add_render_rule('math_block', block_math)
+        self._markdown.add_render_rule('math_block_label', block_math)
+
+    def convert(self, source):
+        return self._markdown.render(source)
+
+
+class MistuneEngine(Engine):
+    name = 'mistune'
+    package = 'mistune'
+
+    def __init__(self):
+        import mistune
+
+        class _Renderer(mistune.HTMLRenderer):
+            def block_code(self, code, info=None):
+                if info and info.strip() == 'mermaid':
+                    return diagram_html(code)
+                return super().block_code(code, info)
+
+        self._markdown = mistune.create_markdown(escape=False, renderer=_Renderer(escape=False),
+                                                 plugins=['table', 'math'])
+        # The math plugin registers its own renderers, so these have to come after it
+        self._markdown.renderer.register('inline_math', lambda renderer, text: _latex_to_mathml(text, 'inline'))
+        self._markdown.renderer.register('block_math', lambda renderer, text: _latex_to_mathml(text, 'block') + '\n')
+
+    def convert(self, source):
+        return self._markdown(source)
+
+
+ENGINES = {engine.name: engine for engine in (Markdown2Engine, MarkdownItEngine, MistuneEngine)}
+
+
+def available_engines():
+    return [name for name, engine in ENGINES.items() if engine.available()]
+
+
+def engine_class(name):
+    engine = ENGINES.get(name)
+    if engine is None or not engine.available():
+        return ENGINES[DEFAULT_ENGINE]
+    return engine
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from disk_cache import DiskCache, make_key
+from pandoc_server import EXPORT_OPTIONS, pandoc_executable, pandoc_version, referenced_resources
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExportCache(DiskCache):
+    """Finished exports, reused when nothing that affects the output has changed.
+
+    Entries are plain copies of the output files (no DiskCache header), so a hit
+    is a single file copy; use restore()/store() rather than get()/put().
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, executable=None):
+        super().__init__(directory, max_bytes, compress=False)
+        self.executable = executable or pandoc_executable()
+
+    def key(self, input_file, resource_dir, format_type):
+        """Hash of the input, every local resource it references, the format and pandoc's
+        version and options; None when pandoc is unavailable."""
+        version = pandoc_version(self.executable)
+        if version is None:
+            return None
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        resources = [(target, _file_hash(path))
+                     for target, path in referenced_resources(data.decode('utf-8', errors='replace'), resource_dir)]
+        return make_key('export', version, format_type, json.dumps(EXPORT_OPTIONS, sort_keys=True),
+                        hashlib.sha256(data).hexdigest(), json.dumps(resources))
+
+    def restore(self, key, output_file):
+        path = self._path(key)
+        temp_path = f'{output_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, output_file)
+            os.utime(path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def store(self, key, output_file):
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            shutil.copyfile(output_file, temp_path)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+        self._grow(size - previous)
+        return True
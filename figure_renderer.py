@@ -0,0 +1,183 @@
+import json
+
+from PySide6.QtCore import QObject, QUrl, Signal
+from PySide6.QtWebEngineCore import QWebEnginePage
+
+from assets import MATHJAX_SCRIPT, MERMAID_SCRIPT, asset_url
+from tracing import TRACER
+
+# Results come back from the offscreen page as console messages with this prefix
+_RESULT_PREFIX = 'mdr-figure:'
+
+# Figures sent to the page per runJavaScript call
+BATCH_SIZE = 20
+# Times a page that failed to load is recreated before the queued figures are given up
+LOAD_RETRIES = 1
+
+# Self-contained SVG: every formula carries its own glyph definitions
+MATHJAX_SVG_CONFIG = {
+    'jax': ['input/TeX', 'output/SVG'],
+    'TeX': {'extensions': ['AMSmath.js', 'AMSsymbols.js', 'noErrors.js', 'noUndefined.js']},
+    'SVG': {'useGlobalCache': False},
+    'showMathMenu': False,
+    'messageStyle': 'none',
+    'skipStartupTypeset': True,
+}
+
+RENDER_PAGE = f"""<html><head><meta charset="utf-8">
+<script>
+var mdrMathFailed;
+var mdrMathReady = new Promise(function (resolve, reject) {{
+    mdrMathFailed = reject;
+    window.MathJax = {json.dumps(MATHJAX_SVG_CONFIG)};
+    window.MathJax.AuthorInit = function () {{
+        MathJax.Hub.Register.StartupHook('End', resolve);
+    }};
+}});
+</script>
+<script src="{asset_url(MATHJAX_SCRIPT)}" onerror="mdrMathFailed(new Error('MathJax is not available'))"></script>
+<script src="{asset_url(MERMAID_SCRIPT)}"></script>
+<script>
+var mdrRenderers = {{}};
+mdrRenderers.math = function (key, source) {{
+    return mdrMathReady.then(function () {{
+        return new Promise(function (resolve, reject) {{
+            var holder = document.createElement('div');
+            var script = document.createElement('script');
+            script.type = source.display === 'block' ? 'math/tex; mode=display' : 'math/tex';
+            script.text = source.tex;
+            holder.appendChild(script);
+            document.body.appendChild(holder);
+            MathJax.Hub.Queue(['Typeset', MathJax.Hub, holder], function () {{
+                var svg = holder.querySelector('svg');
+                holder.remove();
+                if (svg) {{
+                    resolve(svg.outerHTML);
+                }} else {{
+                    reject(new Error('MathJax produced no output'));
+                }}
+            }});
+        }});
+    }});
+}};
+if (window.mermaid) {{
+    mermaid.initialize({{startOnLoad: false}});
+    mdrRenderers.mermaid = function (key, source) {{
+        return mermaid.render('mdr-' + key.slice(0, 16), source).then(function (result) {{
+            return result.svg;
+        }});
+    }};
+}}
+function mdrReport(result) {{
+    console.log('{_RESULT_PREFIX}' + JSON.stringify(result));
+}}
+async function mdrRender(jobs) {{
+    for (var i = 0; i < jobs.length; i++) {{
+        var key = jobs[i][0], kind = jobs[i][1], source = jobs[i][2];
+        try {{
+            if (!mdrRenderers[kind]) {{
+                throw new Error('no renderer for ' + kind);
+            }}
+            mdrReport({{key: key, html: await mdrRenderers[kind](key, source)}});
+        }} catch (e) {{
+            mdrReport({{key: key, error: String(e && e.message || e)}});
+        }}
+    }}
+    mdrReport({{done: true}});
+}}
+</script></head><body></body></html>"""
+
+
+class _RenderPage(QWebEnginePage):
+    resultReceived = Signal(str)
+
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        if message.startswith(_RESULT_PREFIX):
+            self.resultReceived.emit(message[len(_RESULT_PREFIX):])
+
+
+class FigureRenderer(QObject):
+    """Renders figures to SVG in an offscreen page, one batch at a time.
+
+    Mermaid lays out diagrams and MathJax typesets formulas with its SVG output,
+    both from the bundled assets.
+
+    Every result is written to the figure cache before figureRendered is emitted,
+    so each figure is laid out once no matter how many documents show it.
+    """
+    figureRendered = Signal(str, str)
+    figureFailed = Signal(str, str)
+
+    def __init__(self, figure_cache, parent=None):
+        super().__init__(parent)
+        self.figure_cache = figure_cache
+        self.page = None
+        self.page_ready = False
+        self.busy = False
+        self.queue = []
+        self.pending = set()
+        self.load_failures = 0
+        self.span = None
+
+    def request(self, figures):
+        for key, (kind, source) in figures.items():
+            if key not in self.pending:
+                self.pending.add(key)
+                self.queue.append([key, kind, source])
+        if self.page is None:
+            self.createPage()
+        else:
+            self.renderNext()
+
+    def createPage(self):
+        self.page = _RenderPage(self)
+        self.page.resultReceived.connect(self.onResult)
+        self.page.loadFinished.connect(self.onPageLoaded)
+        self.span = TRACER.span('启动图形页面', 'figures', thread='图形渲染')
+        self.page.setHtml(RENDER_PAGE, QUrl(asset_url('')))
+
+    def onPageLoaded(self, ok):
+        self.span.finish(ok=ok)
+        if ok:
+            self.load_failures = 0
+            self.page_ready = True
+            self.renderNext()
+            return
+        # Without the page nothing would ever answer mdrRender; start over
+        self.page.deleteLater()
+        self.page = None
+        self.page_ready = False
+        self.busy = False
+        self.load_failures += 1
+        if self.load_failures <= LOAD_RETRIES:
+            self.createPage()
+            return
+        # Give up on what is queued; the next request tries a new page
+        self.load_failures = 0
+        failed, self.queue = self.queue, []
+        for key, kind, source in failed:
+            self.pending.discard(key)
+            self.figureFailed.emit(key, '图形渲染页面加载失败')
+
+    def renderNext(self):
+        if not self.page_ready or self.busy or not self.queue:
+            return
+        batch, self.queue = self.queue[:BATCH_SIZE], self.queue[BATCH_SIZE:]
+        self.busy = True
+        self.span = TRACER.span('渲染图形', 'figures', thread='图形渲染', count=len(batch))
+        self.page.runJavaScript(f'mdrRender({json.dumps(batch)});')
+
+    def onResult(self, message):
+        result = json.loads(message)
+        if result.get('done'):
+            self.span.finish()
+            self.busy = False
+            self.renderNext()
+            return
+        key = result['key']
+        self.pending.discard(key)
+        if 'error' in result:
+            self.figureFailed.emit(key, result['error'])
+        else:
+            self.figure_cache.store(key, result['html'])
+            self.figureRendered.emit(key, result['html'])
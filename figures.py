@@ -0,0 +1,70 @@
+import base64
+import html
+import re
+
+from assets import MATHJAX_VERSION, MERMAID_VERSION
+from disk_cache import make_key
+
+# markdown2's mermaid extra wraps the (escaped) diagram source in this markup
+_DIAGRAM_RE = re.compile(r'<pre class="mermaid-pre"><div class="mermaid">(.*?)</div></pre>', re.S)
+# Formulas as tagged by math_html (from engines, e.g. Markdown2Engine._Markdown): base64 TeX, display mode, then the MathML
+_MATH_RE = re.compile(r'<span class="mdr-math" data-tex="([A-Za-z0-9+/=]*)" data-display="(inline|block)">(.*?)</span>', re.S)
+# Figures still waiting for their SVG
+PLACEHOLDER_RE = re.compile(r'<(span|div) class="[^"]*" data-figure="[0-9a-f]+">.*?</\1>', re.S)
+
+_ENGINE_VERSIONS = {'mermaid': MERMAID_VERSION, 'math': MATHJAX_VERSION}
+
+
+def figure_key(kind, *parts):
+    return make_key(kind, _ENGINE_VERSIONS[kind], *parts)
+
+
+def diagram_html(source):
+    return f'<pre class="mermaid-pre"><div class="mermaid">{html.escape(source, quote=False)}</div></pre>'
+
+
+def math_html(tex, display, mathml):
+    encoded = base64.b64encode(tex.encode('utf-8')).decode('ascii')
+    return f'<span class="mdr-math" data-tex="{encoded}" data-display="{display}">{mathml}</span>'
+
+
+class FigureCache:
+    """Replaces figures in rendered HTML with SVG rendered once and kept on disk.
+
+    Figures are mermaid diagrams, keyed by their source, and formulas, keyed by
+    their TeX and display mode. Figures without a cached SVG are left as
+    placeholders (the diagram source or the MathML) and reported as misses, so
+    they can be rendered offscreen and patched in later.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def inline(self, block_html, misses):
+        if 'class="mermaid"' in block_html:
+            block_html = _DIAGRAM_RE.sub(lambda match: self._diagram(match, misses), block_html)
+        if 'class="mdr-math"' in block_html:
+            block_html = _MATH_RE.sub(lambda match: self._math(match, misses), block_html)
+        return block_html
+
+    def _diagram(self, match, misses):
+        source = html.unescape(match.group(1))
+        key = figure_key('mermaid', source)
+        return self._figure('div', 'mdr-figure', key, f'<pre>{match.group(1)}</pre>', misses, ('mermaid', source))
+
+    def _math(self, match, misses):
+        tex = base64.b64decode(match.group(1)).decode('utf-8')
+        display = match.group(2)
+        key = figure_key('math', display, tex)
+        source = {'tex': tex, 'display': display}
+        return self._figure('span', f'mdr-math mdr-math-{display}', key, match.group(3), misses, ('math', source))
+
+    def _figure(self, tag, css_class, key, fallback, misses, job):
+        svg = self.cache.get(key)
+        if svg is None:
+            misses[key] = job
+            return f'<{tag} class="{css_class}" data-figure="{key}">{fallback}</{tag}>'
+        return f'<{tag} class="{css_class}">{svg.decode("utf-8")}</{tag}>'
+
+    def store(self, key, figure_html):
+        self.cache.put(key, figure_html.encode('utf-8'))
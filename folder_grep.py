@@ -0,0 +1,142 @@
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from document_search import SearchError
+from workspace_index import iter_markdown_files
+
+# Files handed to a worker per task
+FILES_PER_TASK = 32
+# Matching lines reported per file
+MAX_MATCHES_PER_FILE = 200
+# Longest line shown in a result
+MAX_LINE_LENGTH = 300
+
+
+def compile_pattern(pattern, case=False):
+    """Files are scanned as bytes, so the pattern is too (\\w and IGNORECASE only cover ASCII)."""
+    try:
+        return re.compile(pattern.encode('utf-8'), 0 if case else re.I)
+    except re.error as e:
+        raise SearchError(str(e))
+
+
+def grep_file(path, expression):
+    """Matching lines of path as (0-based line, text), reading it through mmap."""
+    matches = []
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return matches
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                line = 0
+                counted = 0
+                line_end = -1
+                for match in expression.finditer(data):
+                    start = match.start()
+                    if start <= line_end:
+                        # One result per line
+                        continue
+                    line += data[counted:start].count(b'\n')
+                    counted = start
+                    line_start = data.rfind(b'\n', 0, start) + 1
+                    line_end = data.find(b'\n', start)
+                    if line_end < 0:
+                        line_end = len(data)
+                    text = data[line_start:min(line_end, line_start + MAX_LINE_LENGTH)]
+                    matches.append((line, text.decode('utf-8', errors='replace').rstrip('\r')))
+                    if len(matches) >= MAX_MATCHES_PER_FILE:
+                        break
+    except (OSError, ValueError):
+        pass
+    return matches
+
+
+def grep_files(paths, pattern, flags):
+    expression = re.compile(pattern, flags)
+    results = []
+    for path in paths:
+        matches = grep_file(path, expression)
+        if matches:
+            results.append((path, matches))
+    return results
+
+
+class FolderGrep:
+    """Regex search over every Markdown file under a folder, without an index.
+
+    Files are memory-mapped and scanned in worker processes, a few dozen per
+    task, and results are yielded as tasks finish, so the first matches show up
+    while the rest of the tree is still being walked.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 2
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def search(self, root, pattern, case=False, cancel_event=None):
+        """Yield (path, [(line, text)]) for files under root that match pattern."""
+        expression = compile_pattern(pattern, case)
+        tasks = {}
+        batch = []
+        try:
+            for path in iter_markdown_files(root):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                batch.append(path)
+                if len(batch) == FILES_PER_TASK:
+                    self._submit(tasks, batch, expression)
+                    batch = []
+                    yield from self._collect(tasks, expression, block=False)
+            if batch:
+                self._submit(tasks, batch, expression)
+            while tasks:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                yield from self._collect(tasks, expression, block=True)
+        finally:
+            for future in tasks:
+                future.cancel()
+
+    def _submit(self, tasks, batch, expression):
+        executor = self._get_executor()
+        try:
+            future = executor.submit(grep_files, batch, expression.pattern, expression.flags)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self._get_executor()
+            future = executor.submit(grep_files, batch, expression.pattern, expression.flags)
+        tasks[future] = (batch, executor)
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _collect(self, tasks, expression, block):
+        done, _ = wait(tasks, timeout=0.2 if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch, executor = tasks.pop(future)
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool next time and scan this batch here
+                self._discard(executor)
+                results = grep_files(batch, expression.pattern, expression.flags)
+            yield from results
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
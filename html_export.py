@@ -0,0 +1,91 @@
+import base64
+import functools
+import html
+import mimetypes
+import os
+import re
+import urllib.parse
+import urllib.request
+
+from assets import MERMAID_SCRIPT, asset_url, read_asset
+from engines import DEFAULT_ENGINE
+from renderer import PAGE_HEAD, IncrementalRenderer
+
+_IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]+)(")', re.I)
+# Diagrams with no cached SVG yet, as left by FigureCache.inline
+_DIAGRAM_PLACEHOLDER_RE = re.compile(r'<div class="mdr-figure" data-figure="[0-9a-f]+"><pre>(.*?)</pre></div>', re.S)
+
+
+@functools.lru_cache(maxsize=256)
+def _data_uri(path, mtime, size):
+    with open(path, 'rb') as f:
+        data = f.read()
+    mime = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return f'data:{mime};base64,{base64.b64encode(data).decode("ascii")}'
+
+
+def inline_images(body, resource_dir):
+    """Replace local image links with data URIs; remote and missing images are left alone."""
+    def replace(match):
+        target = html.unescape(match.group(2))
+        scheme = urllib.parse.urlsplit(target).scheme
+        if scheme == 'file':
+            path = urllib.request.url2pathname(urllib.parse.urlsplit(target).path)
+        elif scheme and len(scheme) > 1:
+            return match.group(0)
+        else:
+            path = os.path.join(resource_dir, urllib.request.url2pathname(urllib.parse.unquote(target)))
+        try:
+            stat = os.stat(path)
+            uri = _data_uri(os.path.abspath(path), stat.st_mtime, stat.st_size)
+        except OSError:
+            return match.group(0)
+        return match.group(1) + uri + match.group(3)
+    return _IMG_SRC_RE.sub(replace, body)
+
+
+class HtmlExporter:
+    """Writes self-contained HTML from the viewer's own render, without pandoc.
+
+    The body comes from the render cache (shared with the viewer, so a document
+    that has been opened is not converted again), figures from the figure cache,
+    and images and scripts are embedded so the file opens anywhere.
+    """
+
+    def __init__(self, engine=DEFAULT_ENGINE, cache=None, figures=None):
+        self.engine = engine
+        self.cache = cache
+        self.figures = figures
+
+    def render(self, text, resource_dir, title='', standalone=True):
+        """The page for text. Without standalone, images and mermaid are left to be
+        loaded over mdr:// and mermaid is not started, for pages printed in the app."""
+        renderer = IncrementalRenderer(self.engine, self.cache, self.figures)
+        body = ''.join(renderer.stream(text))
+        if standalone:
+            body = inline_images(body, resource_dir)
+        scripts = ''
+        if 'class="mermaid"' in body or 'data-figure=' in body:
+            # Diagrams never rendered in the viewer are drawn by mermaid; formulas
+            # without SVG keep their MathML, which browsers render natively
+            body = _DIAGRAM_PLACEHOLDER_RE.sub(r'<pre class="mermaid-pre"><div class="mermaid">\1</div></pre>', body)
+            mermaid = read_asset(MERMAID_SCRIPT)
+            if mermaid is not None and 'class="mermaid"' in body:
+                if standalone:
+                    # A literal </script> inside the bundle would end the tag early
+                    source = mermaid.decode('utf-8').replace('</script', '<\\/script')
+                    scripts = f'<script>{source}</script><script>mermaid.initialize({{startOnLoad:true}});</script>'
+                else:
+                    scripts = f'<script src="{asset_url(MERMAID_SCRIPT)}"></script>'
+        return (f'<!DOCTYPE html><html><head>{PAGE_HEAD}<title>{html.escape(title)}</title>{scripts}</head>'
+                f'<body>{body}</body></html>')
+
+    def export(self, input_file, output_file, cancel_event=None):
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        title = os.path.splitext(os.path.basename(input_file))[0]
+        page = self.render(text, os.path.dirname(os.path.abspath(input_file)), title)
+        temp_path = f'{output_file}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        os.replace(temp_path, output_file)
@@ -1,91 +1,503 @@
 import sys
 import os
-import subprocess
 import json
 import ctypes
-import markdown2
+import multiprocessing
+import time
+from startup_profile import (APPLICATION, FIRST_RENDER, IMPORTS, VISIBLE, WEB_ENGINE, WINDOW, StartupProfile,
+                             process_started)
+
+STARTUP = StartupProfile(process_started())
+
 from PySide6.QtWidgets import (QApplication, QMainWindow, QFileDialog, QVBoxLayout, QWidget,
-                             QStatusBar, QMessageBox, QLineEdit, QPushButton, QListWidget,
-                             QHBoxLayout, QInputDialog, QToolBar, QSizePolicy, QMenu, QDialog)
+                             QStatusBar, QMessageBox, QLineEdit, QPushButton,
+                             QHBoxLayout, QInputDialog, QToolBar, QSizePolicy, QMenu,
+                             QTabWidget, QCheckBox, QLabel)
 from PySide6.QtGui import QAction
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEnginePage
-from PySide6.QtCore import QLocale, QTranslator, QUrl, QThread, Signal
+from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile
+from PySide6.QtCore import Qt, QLocale, QTranslator, QThread, Signal, QFileSystemWatcher, QTimer, QSettings, QUrl
+from renderer import TRACE_PREFIX, IncrementalRenderer, build_page, error_page
+from document_search import DocumentSearch, SearchError
+from disk_cache import DiskCache, user_cache_dir, user_data_dir
+from scheme_handler import SCHEME, DocumentSchemeHandler, register_scheme
+from figures import FigureCache
+from figure_renderer import FigureRenderer
+from engines import DEFAULT_ENGINE, available_engines
+from page_lru import LOAD, REBUILD, RELOAD, RenderedPageLRU, restore_action
+from single_instance import InstanceServer
+from tracing import TRACER, MetricsLog, document_record
+# Exporting, workspace search, tags, process rendering and the web view widgets are
+# imported when first used, so none of them delay the window
+
+STARTUP.mark(IMPORTS)
 
 class FileLoaderThread(QThread):
     contentLoaded = Signal(str)
+    chunkLoaded = Signal(str)
+    blocksPatched = Signal(str)
+    figuresMissing = Signal(dict)
+    searchIndexReady = Signal(object)
     progress = Signal(str)
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, renderer, previous_search=None):
         super().__init__()
         self.file_path = file_path
+        self.renderer = renderer
+        self.previous_search = previous_search
 
     def run(self):
+        document = self.file_path
+        thread = f'加载: {os.path.basename(document)}'
         try:
             self.progress.emit('正在读取文件...')
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            self.progress.emit('正在转换Markdown为HTML...')
-            html_content = markdown2.markdown(content, extras=['tables', 'fenced-code-blocks', 'latex', 'mermaid'])
-            mathjax_html = """
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.7/MathJax.js?config=TeX-AMS-MML_HTMLorMML"></script>
-            <script type="text/x-mathjax-config">
-                MathJax.Hub.Config({
-                    tex2jax: {
-                        inlineMath: [['
-,'
-'], ['\\(','\\)']],
-                        displayMath: [['
-            self.contentLoaded.emit(html_content)
+            with TRACER.span('读取文件', thread=thread, document=document):
+                with open(self.file_path, 'r', encoding='utf-8') as file:
+                    content = file.read()
+            if self.renderer.blocks:
+                self.progress.emit('正在更新已修改的内容...')
+                with TRACER.span('增量渲染', thread=thread, document=document):
+                    ops = self.renderer.update(content)
+                if ops:
+                    self.blocksPatched.emit(json.dumps(ops))
+                    self.emitMissingFigures()
+            else:
+                # Show the first screenful right away and append the rest as it renders
+                self.progress.emit('正在转换Markdown为HTML...')
+                chunks = self.renderer.stream(content)
+                with TRACER.span('渲染首屏', thread=thread, document=document):
+                    first = next(chunks)
+                self.contentLoaded.emit(build_page(first))
+                self.emitMissingFigures()
+                total_lines = max(len(self.renderer.lines), 1)
+                # The blocks of a chunk are split and converted while the generator advances
+                started = time.perf_counter()
+                for chunk in chunks:
+                    TRACER.add('渲染分块', 'load', started, time.perf_counter(), thread, document=document)
+                    if self.isInterruptionRequested():
+                        self.renderer.reset()
+                        return
+                    self.chunkLoaded.emit(chunk)
+                    self.emitMissingFigures()
+                    self.progress.emit(f'正在加载: {self.renderer.blocks[-1].line * 100 // total_lines}%')
+                    started = time.perf_counter()
+            with TRACER.span('建立搜索索引', thread=thread, document=document):
+                search = DocumentSearch(self.renderer.blocks, self.previous_search)
+            self.searchIndexReady.emit(search)
         except Exception as e:
-            self.contentLoaded.emit(f"<html><body><h1>加载文件出错: {str(e)}</h1></body></html>")
+            self.renderer.reset()
+            self.contentLoaded.emit(error_page(str(e)))
+
+    def emitMissingFigures(self):
+        figures = self.renderer.take_missing_figures()
+        if figures:
+            self.figuresMissing.emit(figures)
+
+class DocumentPage(QWebEnginePage):
+    """Passes the timings logged by the page script on to the tracer."""
+    traceReceived = Signal(list)
+
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        if not message.startswith(TRACE_PREFIX):
+            super().javaScriptConsoleMessage(level, message, line, source)
+            return
+        try:
+            self.traceReceived.emit(json.loads(message[len(TRACE_PREFIX):]))
+        except ValueError:
+            pass
 
-class ConvertThread(QThread):
-    conversionFinished = Signal(str)
-    conversionError = Signal(str)
 
-    def __init__(self, input_file, output_file, format_type, resource_dir):
+class DocumentTab(QWidget):
+    statusMessage = Signal(str)
+    searchUpdated = Signal()
+    traceFinished = Signal(dict)
+
+    def __init__(self, file_path, reader):
         super().__init__()
-        self.input_file = input_file
-        self.output_file = output_file
-        self.format_type = format_type
-        self.resource_dir = resource_dir
+        self.file_path = file_path
+        # Caches, handlers and render settings are shared by every tab of the window
+        self.reader = reader
+        self.scheme_handler = reader.scheme_handler
+        self.figure_renderer = reader.figure_renderer
+        self.figure_renderer.figureRendered.connect(self.onFigureRendered)
+        self.figure_renderer.figureFailed.connect(self.onFigureFailed)
+        self.figure_keys = set()
+        self.ready_figures = {}
+        self.renderer = None
+        self.loader_thread = None
+        self.stale_loaders = set()
+        self.page_ready = False
+        self.section_count = 0
+        self.sections_requested = 0
+        self.restore_scroll = None
+        self.pending_line = None
+        self.pending_position = None
+        self.search_index = None
+        self.search_query = None
+        self.search_matches = []
+        self.search_current = -1
+        self.scroll_y = 0
+        self.rendered_bytes = 0
+        self.stale = False
+        # Set while a traced load is running: from opening the file to the last section on the page
+        self.load_span = None
+        self.page_span = None
+        self.webView = reader.takeWebView()
+        self.webView.loadFinished.connect(self.onPageLoaded)
+        self.webView.page().traceReceived.connect(self.onTrace)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.webView)
+        self.setLayout(layout)
+
+    def isLoading(self):
+        return self.loader_thread is not None and self.loader_thread.isRunning()
+
+    def load(self):
+        name = os.path.basename(self.file_path)
+        self.renderer = IncrementalRenderer(self.reader.engine, cache=self.reader.render_cache,
+                                            figures=self.reader.figures, pool=self.reader.render_pool)
+        self.stale = False
+        if self.isLoading():
+            # Keep the superseded loader alive until its run() returns
+            stale = self.loader_thread
+            stale.requestInterruption()
+            self.stale_loaders.add(stale)
+            stale.finished.connect(lambda: self.stale_loaders.discard(stale))
+        self.statusMessage.emit(f'正在打开: {name}...')
+        self.startTrace('打开文档')
+        # The matches point into the old index; the query runs again once the new one is built
+        self.search_index = None
+        self.search_matches = []
+        self.search_current = -1
+        self.loader_thread = FileLoaderThread(self.file_path, self.renderer)
+        self.loader_thread.contentLoaded.connect(self.showPage)
+        self.loader_thread.chunkLoaded.connect(self.appendChunk)
+        self.loader_thread.figuresMissing.connect(self.requestFigures)
+        self.loader_thread.searchIndexReady.connect(self.setSearchIndex)
+        self.loader_thread.progress.connect(self.statusMessage.emit)
+        self.loader_thread.finished.connect(lambda: self.statusMessage.emit(f'已打开: {name}'))
+        self.loader_thread.finished.connect(self.showPendingLine)
+        self.loader_thread.finished.connect(self.requestTraceDone)
+        self.loader_thread.start()
+
+    def reload(self):
+        # Returns False while an earlier load is still running so the caller can retry
+        if self.isLoading():
+            return False
+        if self.renderer is None:
+            self.load()
+            return True
+        name = os.path.basename(self.file_path)
+        self.stale = False
+        self.startTrace('更新文档')
+        self.loader_thread = FileLoaderThread(self.file_path, self.renderer, self.search_index)
+        self.loader_thread.contentLoaded.connect(self.showPage)
+        self.loader_thread.chunkLoaded.connect(self.appendChunk)
+        self.loader_thread.blocksPatched.connect(self.applyPatch)
+        self.loader_thread.figuresMissing.connect(self.requestFigures)
+        self.loader_thread.searchIndexReady.connect(self.setSearchIndex)
+        self.loader_thread.progress.connect(self.statusMessage.emit)
+        self.loader_thread.finished.connect(lambda: self.statusMessage.emit(f'已更新: {name}'))
+        self.loader_thread.finished.connect(self.showPendingLine)
+        self.loader_thread.finished.connect(self.requestTraceDone)
+        self.loader_thread.start()
+        return True
+
+    def showPage(self, html):
+        # Ignore output from a loader that was superseded by a newer open
+        if self.sender() is not self.loader_thread:
+            return
+        self.setPageHtml(html)
+
+    def setPageHtml(self, html):
+        self.page_ready = False
+        self.section_count = 0
+        self.sections_requested = 0
+        if self.load_span is not None:
+            self.page_span = TRACER.span('页面加载', 'page', thread=self.pageThread(), document=self.file_path)
+        self.webView.load(self.scheme_handler.publish(self.file_path, html))
+
+    def appendChunk(self, html):
+        if self.sender() is not self.loader_thread:
+            return
+        self.scheme_handler.publish_section(self.file_path, self.section_count, html)
+        self.section_count += 1
+        if self.page_ready:
+            self.requestSections()
+            self.showPendingLine()
+
+    def requestSections(self):
+        # The page pulls the sections itself, so the HTML never goes through runJavaScript
+        if self.sections_requested < self.section_count:
+            self.webView.page().runJavaScript(f'mdrLoadSections({self.sections_requested}, {self.section_count});')
+            self.sections_requested = self.section_count
+
+    def scrollToLine(self, line):
+        # Applied once the block holding the source line has been rendered
+        self.pending_line = line
+        self.showPendingLine()
+
+    def scrollToPosition(self, y):
+        # A scroll offset needs the whole document on the page
+        self.pending_position = y
+        self.showPendingLine()
+
+    def showPendingLine(self):
+        if self.pending_position is not None and self.page_ready and not self.isLoading():
+            self.webView.page().runJavaScript(f'mdrSections.then(function () {{ window.scrollTo(0, {self.pending_position}); }});')
+            self.pending_position = None
+        if self.pending_line is None or not self.page_ready or self.renderer is None or not self.renderer.blocks:
+            return
+        block = self.renderer.block_at_line(self.pending_line)
+        if block is None or (self.isLoading() and block is self.renderer.blocks[-1]):
+            return
+        self.pending_line = None
+        # The block may sit in a section the page is still fetching
+        self.webView.page().runJavaScript(
+            f'mdrSections.then(function () {{ var node = document.getElementById({json.dumps(block.id)}); if (node) {{ node.scrollIntoView(); }} }});')
 
-    def run(self):
+    def setSearchIndex(self, index):
+        if self.sender() is not self.loader_thread:
+            return
+        self.search_index = index
+        if self.search_query is not None:
+            # The text changed under the previous matches; find them again
+            try:
+                self.search(*self.search_query)
+            except SearchError:
+                pass
+            self.searchUpdated.emit()
+
+    def search(self, pattern, regex=False, case=False):
+        """Find every match and highlight them all; returns the match count, or None
+        while the document is still loading."""
+        self.search_query = (pattern, regex, case) if pattern else None
+        previous = self.search_matches[self.search_current] if 0 <= self.search_current < len(self.search_matches) else None
+        self.search_matches = []
+        self.search_current = -1
+        if self.search_index is None:
+            return None
         try:
-            if getattr(sys, 'frozen', False):
-                # If the application is run as a bundle, the PyInstaller bootloader
-                # extends the sys module by a flag frozen=True and sets the absolute
-                # path of the bundle by the _MEIPASS attribute.
-                pandoc_base_path = sys._MEIPASS
-            else:
-                pandoc_base_path = os.getcwd()
-            command = [os.path.join(pandoc_base_path, 'pandoc-3.7.0.2', 'pandoc.exe'), self.input_file, '-o', self.output_file, '--embed-resources', '--standalone', f'--resource-path={self.resource_dir}']
-            result = subprocess.run(command,
-                                    creationflags=subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS,
-                                    stdin=subprocess.DEVNULL,
-                                    stdout=subprocess.DEVNULL,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    encoding='utf-8',
-                                    errors='ignore')
-            if result.returncode == 0:
-                self.conversionFinished.emit(f'转换完成: {os.path.basename(self.input_file)} -> {os.path.basename(self.output_file)}')
-            else:
-                self.conversionError.emit(f'转换失败: Pandoc exited with code {result.returncode}\n{result.stderr}')
-        except FileNotFoundError:
-            self.conversionError.emit('Pandoc未安装')
-        except Exception as e:
-            self.conversionError.emit(f'转换过程中发生错误: {str(e)}')
+            self.search_matches = self.search_index.find(pattern, regex, case)
+        finally:
+            self.showSearchMatches()
+        if previous is not None and self.search_matches:
+            # Stay near the match shown before the query or the text changed
+            self.search_current = self.search_index.nearest(self.search_matches, self.search_index.line(previous)) - 1
+        return len(self.search_matches)
+
+    def showSearchMatches(self):
+        if self.page_ready and self.search_index is not None:
+            highlights = self.search_index.highlights(self.search_matches)
+            self.webView.page().runJavaScript(f'mdrSearch({json.dumps(highlights)});')
+
+    def searchStep(self, backward=False):
+        if self.search_index is None or not self.search_matches:
+            return
+        step = -1 if backward else 1
+        self.search_current = (self.search_current + step) % len(self.search_matches)
+        index, start, end = self.search_index.locate(self.search_matches[self.search_current])
+        self.webView.page().runJavaScript(f'mdrSearchGoto({json.dumps(self.search_index.ids[index])}, {start}, {end});')
+
+    def searchStatus(self):
+        if self.search_query is None:
+            return ''
+        if self.search_index is None:
+            return '正在建立搜索索引...'
+        if not self.search_matches:
+            return '无匹配'
+        if self.search_current < 0:
+            return f'共 {len(self.search_matches)} 处匹配'
+        line = self.search_index.line(self.search_matches[self.search_current]) + 1
+        return f'第 {self.search_current + 1}/{len(self.search_matches)} 处匹配 (第 {line} 行)'
+
+    def applyPatch(self, ops):
+        self.webView.page().runJavaScript(f'mdrPatch({ops});')
+
+    def requestFigures(self, figures):
+        self.figure_keys.update(figures)
+        self.figure_renderer.request(figures)
+
+    def onFigureRendered(self, key, html):
+        if key not in self.figure_keys:
+            return
+        self.figure_keys.discard(key)
+        self.ready_figures[key] = html
+        if self.page_ready and self.webView.page().lifecycleState() == QWebEnginePage.LifecycleState.Active:
+            self.showFigures()
+
+    def onFigureFailed(self, key, message):
+        if key in self.figure_keys:
+            self.figure_keys.discard(key)
+            self.statusMessage.emit(f'公式或图表渲染失败: {message}')
+
+    def showFigures(self):
+        for key, html in self.ready_figures.items():
+            self.webView.page().runJavaScript(f'mdrSetFigure({json.dumps(key)}, {json.dumps(html)});')
+        self.ready_figures = {}
+
+    def onPageLoaded(self, ok):
+        self.page_ready = True
+        if self.page_span is not None:
+            self.page_span.finish()
+            self.page_span = None
+        self.requestSections()
+        self.showFigures()
+        if self.search_matches:
+            self.showSearchMatches()
+        if self.restore_scroll is not None:
+            self.webView.page().runJavaScript(f'window.scrollTo(0, {self.restore_scroll});')
+            self.restore_scroll = None
+        self.showPendingLine()
+        self.requestTraceDone()
+
+    def pageThread(self):
+        return f'页面: {os.path.basename(self.file_path)}'
+
+    def startTrace(self, name):
+        self.load_span = TRACER.span(name, 'document', thread=self.pageThread(), document=self.file_path) if TRACER.enabled else None
+        self.page_span = None
+
+    def requestTraceDone(self):
+        # The page reports back once every section requested so far is inserted
+        if self.load_span is not None and self.page_ready and not self.isLoading():
+            self.webView.page().runJavaScript('mdrTraceDone();')
+
+    def onTrace(self, entry):
+        if self.load_span is None:
+            return
+        if entry == ['done']:
+            span, self.load_span = self.load_span, None
+            span.finish()
+            phases = TRACER.document_phases(self.file_path, since=span.start)
+            try:
+                size = os.path.getsize(self.file_path)
+            except OSError:
+                size = None
+            self.reader.metrics_log.append(document_record(self.file_path, phases, span.duration * 1000, size))
+            self.traceFinished.emit(phases)
+        elif len(entry) == 3:
+            name, start, end = entry
+            TRACER.add_wall(name, 'page', start / 1000, end / 1000, self.pageThread(), document=self.file_path)
+
+    def activate(self):
+        page = self.webView.page()
+        state = page.lifecycleState()
+        if state != QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        action = restore_action(self.renderer is not None, self.stale, state == QWebEnginePage.LifecycleState.Discarded)
+        if action == LOAD:
+            self.load()
+        elif action == REBUILD:
+            # The renderer process dropped the page; rebuild it from the HTML kept in memory
+            self.restore_scroll = self.scroll_y
+            self.ready_figures = {}
+            self.setPageHtml(build_page(self.renderer.body()))
+            self.requestFigures(self.renderer.take_missing_figures())
+        elif action == RELOAD:
+            self.reload()
+        elif self.page_ready:
+            self.showFigures()
+
+    def deactivate(self):
+        self.scroll_y = int(self.webView.page().scrollPosition().y())
+        if self.renderer is not None:
+            self.rendered_bytes = self.renderer.html_size()
+        # A frozen page runs no script, so keep it live until streaming is done
+        if not self.isLoading():
+            self.webView.page().setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+
+    def discard(self):
+        page = self.webView.page()
+        if self.isLoading() or page.lifecycleState() == QWebEnginePage.LifecycleState.Discarded:
+            return
+        if page.lifecycleState() == QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+        page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+
+    def invalidate(self):
+        if self.renderer is not None:
+            # Rendered with the previous settings; render from scratch when shown again
+            self.renderer = None
+            self.rendered_bytes = 0
+
+    def release(self):
+        if not self.isLoading():
+            self.discard()
+            self.renderer = None
+            self.rendered_bytes = 0
+
+    def shutdown(self):
+        for thread in [self.loader_thread, *self.stale_loaders]:
+            if thread is not None and thread.isRunning():
+                thread.requestInterruption()
+                thread.wait()
+        self.scheme_handler.withdraw(self.file_path)
+        self.figure_renderer.figureRendered.disconnect(self.onFigureRendered)
+        self.figure_renderer.figureFailed.disconnect(self.onFigureFailed)
 
 class MarkdownReader(QMainWindow):
-    def __init__(self):
+    # Spans are recorded on loader threads too; this brings them to the overlay
+    spanRecorded = Signal(object)
+
+    def __init__(self, paths=(), profile_startup=False):
         super().__init__()
-        self.current_file = None
+        self.active_tab = None
         self.translator = QTranslator()
-        self.tags = self.load_tags()
+        self.tag_store = None
+        # Opened once the window has painted
+        self.startup_paths = list(paths)
+        self.profile_startup = profile_startup
+        self.painted = False
+        self.settings = QSettings('MarkdownReader', 'MarkdownReader')
+        self.engine = self.settings.value('render/engine', DEFAULT_ENGINE)
+        self.render_cache = DiskCache(user_cache_dir('render'))
+        self.scheme_handler = DocumentSchemeHandler(self)
+        # Documents may show images from anywhere in the workspace
+        self.scheme_handler.workspace_root = self.settings.value('workspace/root', '') or None
+        # WebEngine is brought up after the first paint (see warmUp)
+        self.web_engine_ready = False
+        self.spare_view = None
+        self.figures = FigureCache(DiskCache(user_cache_dir('figures')))
+        self.figure_renderer = FigureRenderer(self.figures, self)
+        self.render_pool = None
+        if self.settings.value('render/processes', False, type=bool):
+            from render_pool import RenderPool
+            self.render_pool = RenderPool()
+        # Built by conversionQueue() on the first export
+        self.pandoc_server = None
+        self.html_exporter = None
+        self.pdf_exporter = None
+        self.conversion_queue = None
+        self.jobsPanel = None
+        self.searchPanel = None
+        self.page_lru = RenderedPageLRU()
+        self.metrics_log = MetricsLog(user_cache_dir('trace', 'metrics.jsonl'))
+        self.trace_overlay = self.settings.value('trace/overlay', False, type=bool)
+        TRACER.enabled = self.trace_overlay or self.settings.value('trace/enabled', False, type=bool)
+        self.trace_listener = self.spanRecorded.emit
+        TRACER.listeners.append(self.trace_listener)
+        self.spanRecorded.connect(self.showSpan)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.onFileChanged)
+        # Editors often write a file in several steps; coalesce them into one reload
+        self.changed_paths = set()
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(200)
+        self.reload_timer.timeout.connect(self.reloadChangedFiles)
         self.initUI()
 
+    @property
+    def current_file(self):
+        tab = self.tabs.currentWidget()
+        return tab.file_path if tab else None
+
+    @property
+    def webView(self):
+        tab = self.tabs.currentWidget()
+        return tab.webView if tab else None
+
     def initUI(self):
         self.setWindowTitle('Markdown Reader')
         self.setGeometry(100, 100, 800, 600)
@@ -94,6 +506,114 @@ class MarkdownReader(QMainWindow):
         self.setup_main_layout()
         self.setStatusBar(QStatusBar())
         self.statusBar().showMessage('就绪')
+        self.perfLabel = QLabel()
+        self.perfLabel.setVisible(self.trace_overlay)
+        self.statusBar().addPermanentWidget(self.perfLabel)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            STARTUP.mark(VISIBLE)
+            # Let this frame reach the screen before the slow part of startup
+            QTimer.singleShot(0, self.afterFirstPaint)
+
+    def afterFirstPaint(self):
+        self.warmUp()
+        paths, self.startup_paths = self.startup_paths, []
+        self.openPaths(paths)
+        if self.profile_startup:
+            tab = self.tabs.currentWidget()
+            if tab is not None:
+                tab.webView.loadFinished.connect(self.finishStartupProfile)
+            else:
+                self.finishStartupProfile()
+
+    def finishStartupProfile(self, ok=True):
+        if STARTUP.elapsed(FIRST_RENDER) is not None:
+            return
+        STARTUP.mark(FIRST_RENDER)
+        report = STARTUP.report()
+        os.makedirs(user_cache_dir(), exist_ok=True)
+        with open(user_cache_dir('startup-profile.txt'), 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+        if sys.stdout is not None:
+            print(report)
+        # A failed budget fails the run, so the check can be scripted
+        QApplication.exit(0 if STARTUP.within_budget() else 1)
+
+    def warmUp(self):
+        # Starting Chromium takes longer than everything before the first paint; a
+        # spare view loading a blank page gets its processes going for the first document
+        self.ensureWebEngine()
+        if self.spare_view is None and not self.tabs.count():
+            self.spare_view = self.newWebView()
+            self.spare_view.load(QUrl('about:blank'))
+        STARTUP.mark(WEB_ENGINE)
+
+    def ensureWebEngine(self):
+        if not self.web_engine_ready:
+            QWebEngineProfile.defaultProfile().installUrlSchemeHandler(SCHEME, self.scheme_handler)
+            self.web_engine_ready = True
+
+    def newWebView(self):
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+        view = QWebEngineView()
+        view.setPage(DocumentPage(view))
+        return view
+
+    def takeWebView(self):
+        self.ensureWebEngine()
+        view, self.spare_view = self.spare_view, None
+        return view if view is not None else self.newWebView()
+
+    def conversionQueue(self):
+        """The export queue, with its exporters and panel, built on the first export."""
+        if self.conversion_queue is None:
+            from ast_cache import AstCache
+            from conversion_jobs import ConversionJobsPanel, ConversionQueue
+            from export_cache import ExportCache
+            from html_export import HtmlExporter
+            from pandoc_server import PandocServer
+            from pdf_export import PdfExporter
+            self.ensureWebEngine()
+            # Started on the first export and kept running for the following ones
+            self.pandoc_server = PandocServer()
+            self.html_exporter = HtmlExporter(self.engine, self.render_cache, self.figures)
+            self.pdf_exporter = PdfExporter(self.html_exporter, self.scheme_handler, parent=self)
+            self.conversion_queue = ConversionQueue(self.pandoc_server,
+                                                    export_cache=ExportCache(user_cache_dir('exports')),
+                                                    ast_cache=AstCache(DiskCache(user_cache_dir('ast'))),
+                                                    html_exporter=self.html_exporter,
+                                                    pdf_exporter=self.pdf_exporter,
+                                                    parent=self)
+            self.conversion_queue.jobFinished.connect(self.onConversionFinished)
+            self.jobsPanel = ConversionJobsPanel(self.conversion_queue, self)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.jobsPanel)
+            self.jobsPanel.hide()
+        return self.conversion_queue
+
+    def showJobsPanel(self):
+        self.conversionQueue()
+        self.jobsPanel.show()
+
+    def showWorkspaceSearch(self, grep=False):
+        from workspace_search import GREP_MODE, INDEX_MODE, WorkspaceSearchPanel
+        if self.searchPanel is None:
+            self.searchPanel = WorkspaceSearchPanel(self.settings.value('workspace/root', ''), self)
+            self.searchPanel.openRequested.connect(self.openFileAt)
+            self.searchPanel.rootChanged.connect(self.onWorkspaceRootChanged)
+            self.addDockWidget(Qt.LeftDockWidgetArea, self.searchPanel)
+        self.searchPanel.showMode(GREP_MODE if grep else INDEX_MODE)
+
+    def onWorkspaceRootChanged(self, root):
+        self.settings.setValue('workspace/root', root)
+        self.scheme_handler.workspace_root = root or None
+
+    def tagStore(self):
+        if self.tag_store is None:
+            self.tag_store = self.openTagStore()
+        return self.tag_store
 
     def setup_toolbar(self):
         self.toolbar = QToolBar()
@@ -114,33 +634,151 @@ class MarkdownReader(QMainWindow):
 
         self.searchInput = QLineEdit()
         self.searchInput.setPlaceholderText('搜索...')
+        self.searchInput.textChanged.connect(lambda: self.searchTimer.start())
         self.searchInput.returnPressed.connect(self.searchText)
         self.toolbar.addWidget(self.searchInput)
+        # Matches are counted and highlighted as the query is typed
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(150)
+        self.searchTimer.timeout.connect(self.runSearch)
+
+        self.regexBox = QCheckBox('正则')
+        self.regexBox.toggled.connect(self.runSearch)
+        self.toolbar.addWidget(self.regexBox)
+
+        self.caseBox = QCheckBox('区分大小写')
+        self.caseBox.toggled.connect(self.runSearch)
+        self.toolbar.addWidget(self.caseBox)
+
+        self.searchCount = QLabel()
+        self.toolbar.addWidget(self.searchCount)
+
+        previousButton = QPushButton('上一个')
+        previousButton.clicked.connect(self.searchPrevious)
+        self.toolbar.addWidget(previousButton)
 
         searchButton = QPushButton('搜索')
         searchButton.clicked.connect(self.searchText)
         self.toolbar.addWidget(searchButton)
 
     def setup_main_layout(self):
-        layout = QVBoxLayout()
-        self.webView = QWebEngineView()
-        layout.addWidget(self.webView, 1)
-        container = QWidget()
-        container.setLayout(layout)
-        self.setCentralWidget(container)
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.currentChanged.connect(self.onTabChanged)
+        self.tabs.tabCloseRequested.connect(self.closeTab)
+        self.setCentralWidget(self.tabs)
 
     def openFile(self, fname=None):
         if not fname:
             fname, _ = QFileDialog.getOpenFileName(self, '打开Markdown文件', '', 'Markdown文件 (*.md)')
         if fname:
-            self.current_file = fname
-            self.statusBar().showMessage(f'正在打开: {os.path.basename(fname)}...')
-            self.setEnabled(False)
-            self.loader_thread = FileLoaderThread(fname)
-            self.loader_thread.contentLoaded.connect(lambda html: self.webView.setHtml(html, QUrl.fromLocalFile(fname)))
-            self.loader_thread.progress.connect(self.statusBar().showMessage)
-            self.loader_thread.finished.connect(lambda: [self.statusBar().showMessage(f'已打开: {os.path.basename(fname)}'), self.setEnabled(True)])
-            self.loader_thread.start()
+            tab = self.findTab(fname)
+            if tab is None:
+                tab = DocumentTab(fname, self)
+                tab.statusMessage.connect(self.showTabMessage)
+                tab.searchUpdated.connect(self.onSearchUpdated)
+                tab.traceFinished.connect(self.showTraceSummary)
+                index = self.tabs.addTab(tab, os.path.basename(fname))
+                self.tabs.setTabToolTip(index, fname)
+                self.watcher.addPath(fname)
+            self.tabs.setCurrentWidget(tab)
+
+    def openPaths(self, paths):
+        for path in paths:
+            if os.path.isfile(path) and path.endswith('.md'):
+                self.openFile(path)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def openFileAt(self, fname, line):
+        self.openFile(fname)
+        tab = self.findTab(fname)
+        if tab is not None:
+            tab.scrollToLine(line)
+
+    def findTab(self, fname):
+        target = os.path.normcase(os.path.abspath(fname))
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if os.path.normcase(os.path.abspath(tab.file_path)) == target:
+                return tab
+        return None
+
+    def onTabChanged(self, index):
+        tab = self.tabs.widget(index)
+        if self.active_tab is not None and self.active_tab is not tab:
+            self.active_tab.deactivate()
+        self.active_tab = tab
+        if tab is None:
+            self.statusBar().showMessage('就绪')
+            return
+        self.page_lru.touch(tab)
+        tab.activate()
+        self.page_lru.enforce()
+        if self.searchInput.text():
+            self.runSearch()
+
+    def closeTab(self, index):
+        tab = self.tabs.widget(index)
+        if tab is self.active_tab:
+            self.active_tab = None
+        self.page_lru.remove(tab)
+        self.watcher.removePath(tab.file_path)
+        tab.shutdown()
+        self.tabs.removeTab(index)
+        tab.deleteLater()
+
+    def closeEvent(self, event):
+        for index in range(self.tabs.count()):
+            self.tabs.widget(index).shutdown()
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+        if self.searchPanel is not None:
+            self.searchPanel.shutdown()
+        if self.conversion_queue is not None:
+            self.conversion_queue.shutdown()
+            self.pdf_exporter.shutdown()
+            self.pandoc_server.stop()
+        if self.tag_store is not None:
+            self.tag_store.close()
+        if self.spare_view is not None:
+            self.spare_view.deleteLater()
+        TRACER.listeners.remove(self.trace_listener)
+        super().closeEvent(event)
+
+    def showTabMessage(self, message):
+        if self.sender() is self.tabs.currentWidget():
+            self.statusBar().showMessage(message)
+
+    def onFileChanged(self, path):
+        # Saving via rename drops the path from the watcher
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+        self.changed_paths.add(path)
+        self.reload_timer.start()
+        if self.searchPanel is not None:
+            self.searchPanel.onFileChanged(path)
+
+    def reloadChangedFiles(self):
+        retry = set()
+        for path in self.changed_paths:
+            tab = self.findTab(path)
+            if tab is None or not os.path.exists(path):
+                continue
+            if tab is self.tabs.currentWidget():
+                if not tab.reload():
+                    retry.add(path)
+            else:
+                # Background tabs catch up when they are activated again
+                tab.stale = True
+        self.changed_paths = retry
+        if retry:
+            self.reload_timer.start()
 
     def showFileMenu(self):
         menu = QMenu(self)
@@ -156,6 +794,62 @@ class MarkdownReader(QMainWindow):
         saveHtmlAction.triggered.connect(lambda: self.convertTo('html'))
         menu.addAction(saveHtmlAction)
 
+        savePdfAction = QAction('保存为PDF', self)
+        savePdfAction.triggered.connect(lambda: self.convertTo('pdf'))
+        menu.addAction(savePdfAction)
+
+        exportAllAction = QAction('导出全部格式...', self)
+        exportAllAction.triggered.connect(self.exportAllFormats)
+        menu.addAction(exportAllAction)
+
+        batchConvertAction = QAction('批量转换...', self)
+        batchConvertAction.triggered.connect(self.batchConvert)
+        menu.addAction(batchConvertAction)
+
+        workspaceAction = QAction('工作区搜索', self)
+        workspaceAction.triggered.connect(self.showWorkspaceSearch)
+        menu.addAction(workspaceAction)
+
+        grepAction = QAction('在文件夹中查找', self)
+        grepAction.triggered.connect(lambda: self.showWorkspaceSearch(grep=True))
+        menu.addAction(grepAction)
+
+        jobsAction = QAction('转换任务', self)
+        jobsAction.triggered.connect(self.showJobsPanel)
+        menu.addAction(jobsAction)
+
+        engineMenu = menu.addMenu('渲染引擎')
+        for engine in available_engines():
+            engineAction = QAction(engine, self)
+            engineAction.setCheckable(True)
+            engineAction.setChecked(engine == self.engine)
+            engineAction.triggered.connect(lambda checked, engine=engine: self.setEngine(engine))
+            engineMenu.addAction(engineAction)
+
+        processAction = QAction('多进程渲染', self)
+        processAction.setCheckable(True)
+        processAction.setChecked(self.render_pool is not None)
+        processAction.triggered.connect(self.setProcessRendering)
+        menu.addAction(processAction)
+
+        traceMenu = menu.addMenu('性能跟踪')
+        traceAction = QAction('记录性能跟踪', self)
+        traceAction.setCheckable(True)
+        traceAction.setChecked(TRACER.enabled)
+        traceAction.triggered.connect(self.setTracing)
+        traceMenu.addAction(traceAction)
+
+        overlayAction = QAction('在状态栏显示耗时', self)
+        overlayAction.setCheckable(True)
+        overlayAction.setChecked(self.trace_overlay)
+        overlayAction.triggered.connect(self.setTraceOverlay)
+        traceMenu.addAction(overlayAction)
+
+        exportTraceAction = QAction('导出性能跟踪...', self)
+        exportTraceAction.setEnabled(bool(TRACER.spans))
+        exportTraceAction.triggered.connect(self.exportTrace)
+        traceMenu.addAction(exportTraceAction)
+
         menu.addSeparator()
 
         setDefaultAction = QAction('设置为默认Markdown阅读器', self)
@@ -164,10 +858,103 @@ class MarkdownReader(QMainWindow):
 
         menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
 
+    def setEngine(self, engine):
+        if engine == self.engine:
+            return
+        self.engine = engine
+        if self.html_exporter is not None:
+            self.html_exporter.engine = engine
+        self.settings.setValue('render/engine', engine)
+        for index in range(self.tabs.count()):
+            self.tabs.widget(index).invalidate()
+        if self.active_tab is not None:
+            self.active_tab.load()
+        self.statusBar().showMessage(f'渲染引擎: {engine}')
+
+    def setProcessRendering(self, enabled):
+        # Only affects documents loaded from now on
+        self.settings.setValue('render/processes', enabled)
+        if enabled and self.render_pool is None:
+            from render_pool import RenderPool
+            self.render_pool = RenderPool()
+        elif not enabled and self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+        self.statusBar().showMessage('已启用多进程渲染' if enabled else '已关闭多进程渲染')
+
+    def setTracing(self, enabled):
+        self.settings.setValue('trace/enabled', enabled)
+        TRACER.enabled = enabled or self.trace_overlay
+        self.statusBar().showMessage('已开始记录性能跟踪' if TRACER.enabled else '已停止记录性能跟踪')
+
+    def setTraceOverlay(self, enabled):
+        # The overlay shows the tracer's spans, so it keeps tracing on
+        self.trace_overlay = enabled
+        self.settings.setValue('trace/overlay', enabled)
+        TRACER.enabled = enabled or self.settings.value('trace/enabled', False, type=bool)
+        self.perfLabel.clear()
+        self.perfLabel.setVisible(enabled)
+
+    def showSpan(self, span):
+        if self.trace_overlay and span.args.get('document') == self.current_file:
+            self.perfLabel.setText(f'{span.name} {span.duration * 1000:.0f} ms')
+
+    def showTraceSummary(self, phases):
+        if not self.trace_overlay or self.sender() is not self.tabs.currentWidget():
+            return
+        # The slowest stages first; the document span itself is the total
+        total = max(phases.values(), default=0)
+        slowest = sorted(phases.items(), key=lambda item: item[1], reverse=True)[1:4]
+        details = ' · '.join(f'{name} {duration:.0f} ms' for name, duration in slowest)
+        self.perfLabel.setText(f'共 {total:.0f} ms' + (f' ({details})' if details else ''))
+
+    def exportTrace(self):
+        fname, _ = QFileDialog.getSaveFileName(self, '导出性能跟踪', 'trace.json', 'Chrome 跟踪文件 (*.json)')
+        if not fname:
+            return
+        try:
+            TRACER.export(fname)
+        except OSError as e:
+            QMessageBox.critical(self, '导出失败', f'无法写入跟踪文件:\n{e}')
+            return
+        self.statusBar().showMessage(f'已导出 {len(TRACER.spans)} 个跟踪记录: {fname}')
+
+    def searchQuery(self):
+        return (self.searchInput.text(), self.regexBox.isChecked(), self.caseBox.isChecked())
+
+    def runSearch(self):
+        self.searchTimer.stop()
+        tab = self.active_tab
+        if tab is None:
+            self.searchCount.setText('')
+            return
+        try:
+            tab.search(*self.searchQuery())
+        except SearchError as e:
+            self.searchCount.setText('正则表达式有误')
+            self.searchCount.setToolTip(str(e))
+            return
+        self.searchCount.setToolTip('')
+        self.searchCount.setText(tab.searchStatus())
+
     def searchText(self):
-        search_term = self.searchInput.text()
-        if search_term:
-            self.webView.findText(search_term)
+        self.stepSearch(backward=False)
+
+    def searchPrevious(self):
+        self.stepSearch(backward=True)
+
+    def stepSearch(self, backward):
+        tab = self.active_tab
+        if tab is None or not self.searchInput.text():
+            return
+        if self.searchTimer.isActive() or tab.search_query != self.searchQuery():
+            self.runSearch()
+        tab.searchStep(backward)
+        self.searchCount.setText(tab.searchStatus())
+
+    def onSearchUpdated(self):
+        if self.sender() is self.active_tab:
+            self.searchCount.setText(self.sender().searchStatus())
 
     def showTagMenu(self):
         menu = QMenu(self)
@@ -185,23 +972,10 @@ class MarkdownReader(QMainWindow):
 
         menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
 
-    def searchPrevious(self):
-        search_term = self.searchInput.text()
-        if not search_term:
-            QMessageBox.warning(self, '搜索', '请输入搜索词', QMessageBox.Ok)
-            return
-
-        if not hasattr(self, 'last_search_term') or self.last_search_term != search_term:
-            self.searchText()
-
-        flags = QWebEnginePage.FindFlag.FindBackward
-        self.webView.findText(search_term, flags, lambda found: self.statusBar().showMessage('找到上一个匹配项' if found else '未找到上一个匹配项'))
-        self.last_search_term = search_term
-
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             pos = event.position().toPoint()
-            web_view_rect = self.webView.geometry()
+            web_view_rect = self.tabs.geometry()
             if web_view_rect.contains(pos):
                 event.accept()
             else:
@@ -220,71 +994,40 @@ class MarkdownReader(QMainWindow):
         tag, ok = QInputDialog.getText(self, '添加标签', '输入标签名称:')
         if ok and tag:
             if self.current_file:
-                if self.current_file not in self.tags:
-                    self.tags[self.current_file] = []
                 self.webView.page().runJavaScript("window.scrollY", 0, lambda result: self.storeTagWithPosition(tag, result))
             else:
                 self.statusBar().showMessage('请先打开一个文件')
 
-    def viewTags(self):
-        if not self.tags:
+    def viewTags(self, current_only=False):
+        if not self.tagStore().count():
             QMessageBox.information(self, '标签', '没有标签', QMessageBox.Ok)
             return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('标签列表')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for file, tags in self.tags.items():
-            for tag_info in tags:
-                if isinstance(tag_info, dict):
-                    tag_name = tag_info.get('name', '未知标签')
-                    position = tag_info.get('position', '未知位置')
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_name} (位置: {position})")
-                else:
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_info}")
-        layout.addWidget(listWidget)
-
-        listWidget.itemDoubleClicked.connect(lambda item: self.jumpToTagPosition(item, dialog))
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        jumpButton = QPushButton('跳转到标签位置')
-        jumpButton.clicked.connect(lambda: self.jumpToTagPosition(listWidget.currentItem(), dialog))
-        layout.addWidget(jumpButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
+        from tag_browser import TagBrowser
+        browser = TagBrowser(self.tag_store, self.current_file, current_only, self)
+        browser.jumpRequested.connect(self.jumpToTagPosition)
+        browser.tagRemoved.connect(lambda tag: self.statusBar().showMessage(f'已删除标签 "{tag.name}"'))
+        browser.exec()
 
     def storeTagWithPosition(self, tag, scrollY):
-        tag_info = {'name': tag, 'position': scrollY}
-        if tag_info not in self.tags[self.current_file]:
-            self.tags[self.current_file].append(tag_info)
-            self.save_tags()
+        if self.tagStore().add(self.current_file, tag, scrollY) is not None:
             self.statusBar().showMessage(f'已添加标签 "{tag}" 到当前文件，位置: {scrollY}')
         else:
             self.statusBar().showMessage(f'标签 "{tag}" 已存在于当前文件')
 
-    def jumpToTagPosition(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            if start_idx != -1:
-                position_str = text[start_idx + 7:].rstrip(')')
-                try:
-                    position = int(position_str)
-                    self.webView.page().runJavaScript(f"window.scrollTo(0, {position});", 0, lambda _: None)
-                    dialog.close()
-                    self.statusBar().showMessage(f'已跳转到标签位置: {position}')
-                except ValueError:
-                    self.statusBar().showMessage('无法解析标签位置')
-            else:
-                self.statusBar().showMessage('无法找到标签位置信息')
-        else:
-            self.statusBar().showMessage('请选择一个标签')
+    def jumpToTagPosition(self, tag):
+        if tag.file != self.current_file:
+            if not os.path.exists(tag.file):
+                self.statusBar().showMessage(f'文件不存在: {tag.file}')
+                return
+            self.openFile(tag.file)
+        tab = self.findTab(tag.file)
+        if tab is None:
+            return
+        if tag.position is None:
+            self.statusBar().showMessage(f'标签 "{tag.name}" 没有记录位置')
+            return
+        tab.scrollToPosition(tag.position)
+        self.statusBar().showMessage(f'已跳转到标签位置: {tag.position}')
 
     def convertTo(self, format):
         if not self.current_file:
@@ -297,66 +1040,55 @@ class MarkdownReader(QMainWindow):
         output_file, _ = QFileDialog.getSaveFileName(self, f'保存为{format.upper()}', default_save_name, f'{format.upper()}文件 (*.{format})')
         if output_file:
             self.statusBar().showMessage(f'转换中: {base_name} -> {format.upper()}')
-            self.setEnabled(False)
-            resource_dir = os.path.dirname(self.current_file)
-            self.convert_thread = ConvertThread(self.current_file, output_file, format, resource_dir)
-            self.convert_thread.conversionFinished.connect(lambda msg: [self.statusBar().showMessage(msg), self.setEnabled(True)])
-            self.convert_thread.conversionError.connect(lambda err: [self.showConversionError(err, format), self.setEnabled(True)])
-            self.convert_thread.start()
+            self.conversionQueue().submit(self.current_file, output_file, format, notify=True)
+            self.jobsPanel.show()
+
+    def exportAllFormats(self):
+        if not self.current_file:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, '选择输出目录', os.path.dirname(self.current_file))
+        if not output_dir:
+            return
+        from conversion_jobs import EXPORT_FORMATS
+        # The jobs share one parse of the document through the AST cache
+        base_name_without_ext = os.path.splitext(os.path.basename(self.current_file))[0]
+        for format in EXPORT_FORMATS:
+            self.conversionQueue().submit(self.current_file, os.path.join(output_dir, f'{base_name_without_ext}.{format}'), format, notify=True)
+        self.jobsPanel.show()
+        self.statusBar().showMessage(f'导出中: {os.path.basename(self.current_file)} -> {", ".join(format.upper() for format in EXPORT_FORMATS)}')
+
+    def batchConvert(self):
+        from conversion_jobs import EXPORT_FORMATS
+        files, _ = QFileDialog.getOpenFileNames(self, '选择要转换的Markdown文件', '', 'Markdown文件 (*.md)')
+        if not files:
+            return
+        format, ok = QInputDialog.getItem(self, '批量转换', '输出格式:', EXPORT_FORMATS, 0, False)
+        if not ok:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, '选择输出目录', os.path.dirname(files[0]))
+        if not output_dir:
+            return
+        for input_file in files:
+            base_name_without_ext = os.path.splitext(os.path.basename(input_file))[0]
+            self.conversionQueue().submit(input_file, os.path.join(output_dir, f'{base_name_without_ext}.{format}'), format)
+        self.jobsPanel.show()
+        self.statusBar().showMessage(f'已加入 {len(files)} 个转换任务')
+
+    def onConversionFinished(self, job_id):
+        from conversion_jobs import FAILED
+        job = self.conversion_queue.jobs.get(job_id)
+        if job is None:
+            return
+        if job.state == FAILED and job.notify:
+            self.showConversionError(job.message, job.format_type)
+        elif job.message:
+            self.statusBar().showMessage(job.message)
 
     def deleteTag(self):
-        if not self.tags or not self.current_file or self.current_file not in self.tags:
+        if not self.current_file or not self.tagStore().count(self.current_file):
             QMessageBox.information(self, '删除标签', '当前文件没有标签', QMessageBox.Ok)
             return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('删除标签')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for tag_info in self.tags[self.current_file]:
-            if isinstance(tag_info, dict):
-                tag_name = tag_info.get('name', '未知标签')
-                position = tag_info.get('position', '未知位置')
-                listWidget.addItem(f"{tag_name} (位置: {position})")
-            else:
-                listWidget.addItem(tag_info)
-        layout.addWidget(listWidget)
-
-        deleteButton = QPushButton('删除')
-        deleteButton.clicked.connect(lambda: self.removeTag(listWidget.currentItem(), dialog))
-        layout.addWidget(deleteButton)
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
-
-    def removeTag(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            tag_name = text.split(' (位置: ')[0] if start_idx != -1 else text
-            for tag_info in self.tags[self.current_file][:]:
-                if isinstance(tag_info, dict) and tag_info.get('name') == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-                elif tag_info == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-            if not self.tags[self.current_file]:
-                del self.tags[self.current_file]
-                self.save_tags()
-        else:
-            self.statusBar().showMessage('请选择一个要删除的标签')
+        self.viewTags(current_only=True)
 
     def showConversionError(self, error_message, format):
         if 'Pandoc未安装' in error_message:
@@ -366,852 +1098,13 @@ class MarkdownReader(QMainWindow):
             QMessageBox.warning(self, '转换错误', error_message, QMessageBox.Ok)
             self.statusBar().showMessage('转换失败: 发生错误')
 
-    def load_tags(self):
-        try:
-            with open('tags.json', 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def save_tags(self):
-        with open('tags.json', 'w') as f:
-            json.dump(self.tags, f, indent=4)
-
-    def setDefaultMdHandler(self):
-        try:
-            import winreg
-            app_path = os.path.abspath(sys.argv[0])
-            if app_path.endswith('.py'):
-                QMessageBox.warning(self, '设置默认程序', '无法在开发模式下设置默认程序。请运行编译后的EXE文件。', QMessageBox.Ok)
-                return
-
-            # Define the application name and description
-            app_name = 'MarkdownReader'
-            app_description = 'Markdown Reader Application'
-
-            # Set up the file association for .md files
-            # 1. Create or open the .md key
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, r'Software\Classes\.md')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'{app_name}.md')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置.md文件关联: {e}', QMessageBox.Ok)
-                return
-
-            # 2. Create or open the application key
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, app_description)
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法创建应用程序键: {e}', QMessageBox.Ok)
-                return
-
-            # 3. Set the default icon
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md\DefaultIcon')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'"{app_path}",0')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置默认图标: {e}', QMessageBox.Ok)
-                return
-
-            # 4. Set the shell open command
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md\shell\open\command')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'"{app_path}" "%1"')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置打开命令: {e}', QMessageBox.Ok)
-                return
-
-            # Notify Windows about the change
-            # SHChangeNotify(SHCNE_ASSOCCHANGED, SHCNF_IDLIST, NULL, NULL)
-            # This requires ctypes.windll.shell32.SHChangeNotify
-            # For simplicity, we'll skip this for now, as it often works without it.
-            # If issues arise, this can be added.
-
-            QMessageBox.information(self, '设置默认程序', 'Markdown Reader 已成功设置为 .md 文件的默认打开程序。', QMessageBox.Ok)
-
-        except ImportError:
-            QMessageBox.critical(self, '错误', '无法导入 winreg 模块。此功能仅在 Windows 上可用。', QMessageBox.Ok)
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'设置默认程序时发生未知错误: {e}', QMessageBox.Ok)
-
-if __name__ == '__main__':
-    ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
-    app = QApplication(sys.argv)
-    ex = MarkdownReader()
-    ex.show()
-    if len(sys.argv) > 1:
-        file_path = sys.argv[1]
-        if os.path.exists(file_path) and file_path.endswith('.md'):
-            ex.openFile(file_path)
-    sys.exit(app.exec())
-,'
-            self.contentLoaded.emit(html_content)
-        except Exception as e:
-            self.contentLoaded.emit(f"<html><body><h1>加载文件出错: {str(e)}</h1></body></html>")
-
-class ConvertThread(QThread):
-    conversionFinished = Signal(str)
-    conversionError = Signal(str)
-
-    def __init__(self, input_file, output_file, format_type, resource_dir):
-        super().__init__()
-        self.input_file = input_file
-        self.output_file = output_file
-        self.format_type = format_type
-        self.resource_dir = resource_dir
-
-    def run(self):
-        try:
-            if getattr(sys, 'frozen', False):
-                # If the application is run as a bundle, the PyInstaller bootloader
-                # extends the sys module by a flag frozen=True and sets the absolute
-                # path of the bundle by the _MEIPASS attribute.
-                pandoc_base_path = sys._MEIPASS
-            else:
-                pandoc_base_path = os.getcwd()
-            command = [os.path.join(pandoc_base_path, 'pandoc-3.7.0.2', 'pandoc.exe'), self.input_file, '-o', self.output_file, '--embed-resources', '--standalone', f'--resource-path={self.resource_dir}']
-            result = subprocess.run(command,
-                                    creationflags=subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS,
-                                    stdin=subprocess.DEVNULL,
-                                    stdout=subprocess.DEVNULL,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    encoding='utf-8',
-                                    errors='ignore')
-            if result.returncode == 0:
-                self.conversionFinished.emit(f'转换完成: {os.path.basename(self.input_file)} -> {os.path.basename(self.output_file)}')
-            else:
-                self.conversionError.emit(f'转换失败: Pandoc exited with code {result.returncode}\n{result.stderr}')
-        except FileNotFoundError:
-            self.conversionError.emit('Pandoc未安装')
-        except Exception as e:
-            self.conversionError.emit(f'转换过程中发生错误: {str(e)}')
-
-class MarkdownReader(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.current_file = None
-        self.translator = QTranslator()
-        self.tags = self.load_tags()
-        self.initUI()
-
-    def initUI(self):
-        self.setWindowTitle('Markdown Reader')
-        self.setGeometry(100, 100, 800, 600)
-        self.setAcceptDrops(True)
-        self.setup_toolbar()
-        self.setup_main_layout()
-        self.setStatusBar(QStatusBar())
-        self.statusBar().showMessage('就绪')
-
-    def setup_toolbar(self):
-        self.toolbar = QToolBar()
-        self.toolbar.setMovable(False)
-        self.addToolBar(self.toolbar)
-
-        fileButton = QPushButton('文件')
-        fileButton.clicked.connect(self.showFileMenu)
-        self.toolbar.addWidget(fileButton)
-
-        tagButton = QPushButton('标签')
-        tagButton.clicked.connect(self.showTagMenu)
-        self.toolbar.addWidget(tagButton)
-
-        spacer = QWidget()
-        spacer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.toolbar.addWidget(spacer)
-
-        self.searchInput = QLineEdit()
-        self.searchInput.setPlaceholderText('搜索...')
-        self.searchInput.returnPressed.connect(self.searchText)
-        self.toolbar.addWidget(self.searchInput)
-
-        searchButton = QPushButton('搜索')
-        searchButton.clicked.connect(self.searchText)
-        self.toolbar.addWidget(searchButton)
-
-    def setup_main_layout(self):
-        layout = QVBoxLayout()
-        self.webView = QWebEngineView()
-        layout.addWidget(self.webView, 1)
-        container = QWidget()
-        container.setLayout(layout)
-        self.setCentralWidget(container)
-
-    def openFile(self, fname=None):
-        if not fname:
-            fname, _ = QFileDialog.getOpenFileName(self, '打开Markdown文件', '', 'Markdown文件 (*.md)')
-        if fname:
-            self.current_file = fname
-            self.statusBar().showMessage(f'正在打开: {os.path.basename(fname)}...')
-            self.setEnabled(False)
-            self.loader_thread = FileLoaderThread(fname)
-            self.loader_thread.contentLoaded.connect(lambda html: self.webView.setHtml(html, QUrl.fromLocalFile(fname)))
-            self.loader_thread.progress.connect(self.statusBar().showMessage)
-            self.loader_thread.finished.connect(lambda: [self.statusBar().showMessage(f'已打开: {os.path.basename(fname)}'), self.setEnabled(True)])
-            self.loader_thread.start()
-
-    def showFileMenu(self):
-        menu = QMenu(self)
-        openAction = QAction('打开', self)
-        openAction.triggered.connect(self.openFile)
-        menu.addAction(openAction)
-
-        saveDocxAction = QAction('保存为DOCX', self)
-        saveDocxAction.triggered.connect(lambda: self.convertTo('docx'))
-        menu.addAction(saveDocxAction)
-
-        saveHtmlAction = QAction('保存为HTML', self)
-        saveHtmlAction.triggered.connect(lambda: self.convertTo('html'))
-        menu.addAction(saveHtmlAction)
-
-        menu.addSeparator()
-
-        setDefaultAction = QAction('设置为默认Markdown阅读器', self)
-        setDefaultAction.triggered.connect(self.setDefaultMdHandler)
-        menu.addAction(setDefaultAction)
-
-        menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
-
-    def searchText(self):
-        search_term = self.searchInput.text()
-        if search_term:
-            self.webView.findText(search_term)
-
-    def showTagMenu(self):
-        menu = QMenu(self)
-        addTagAction = QAction('添加标签', self)
-        addTagAction.triggered.connect(self.addTag)
-        menu.addAction(addTagAction)
-
-        viewTagsAction = QAction('查看标签', self)
-        viewTagsAction.triggered.connect(self.viewTags)
-        menu.addAction(viewTagsAction)
-
-        deleteTagAction = QAction('删除标签', self)
-        deleteTagAction.triggered.connect(self.deleteTag)
-        menu.addAction(deleteTagAction)
-
-        menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
-
-    def searchPrevious(self):
-        search_term = self.searchInput.text()
-        if not search_term:
-            QMessageBox.warning(self, '搜索', '请输入搜索词', QMessageBox.Ok)
-            return
-
-        if not hasattr(self, 'last_search_term') or self.last_search_term != search_term:
-            self.searchText()
-
-        flags = QWebEnginePage.FindFlag.FindBackward
-        self.webView.findText(search_term, flags, lambda found: self.statusBar().showMessage('找到上一个匹配项' if found else '未找到上一个匹配项'))
-        self.last_search_term = search_term
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls():
-            pos = event.position().toPoint()
-            web_view_rect = self.webView.geometry()
-            if web_view_rect.contains(pos):
-                event.accept()
-            else:
-                event.ignore()
-        else:
-            event.ignore()
-
-    def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.endswith('.md'):
-                self.openFile(file_path)
-                break
-
-    def addTag(self):
-        tag, ok = QInputDialog.getText(self, '添加标签', '输入标签名称:')
-        if ok and tag:
-            if self.current_file:
-                if self.current_file not in self.tags:
-                    self.tags[self.current_file] = []
-                self.webView.page().runJavaScript("window.scrollY", 0, lambda result: self.storeTagWithPosition(tag, result))
-            else:
-                self.statusBar().showMessage('请先打开一个文件')
-
-    def viewTags(self):
-        if not self.tags:
-            QMessageBox.information(self, '标签', '没有标签', QMessageBox.Ok)
-            return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('标签列表')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for file, tags in self.tags.items():
-            for tag_info in tags:
-                if isinstance(tag_info, dict):
-                    tag_name = tag_info.get('name', '未知标签')
-                    position = tag_info.get('position', '未知位置')
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_name} (位置: {position})")
-                else:
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_info}")
-        layout.addWidget(listWidget)
-
-        listWidget.itemDoubleClicked.connect(lambda item: self.jumpToTagPosition(item, dialog))
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        jumpButton = QPushButton('跳转到标签位置')
-        jumpButton.clicked.connect(lambda: self.jumpToTagPosition(listWidget.currentItem(), dialog))
-        layout.addWidget(jumpButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
-
-    def storeTagWithPosition(self, tag, scrollY):
-        tag_info = {'name': tag, 'position': scrollY}
-        if tag_info not in self.tags[self.current_file]:
-            self.tags[self.current_file].append(tag_info)
-            self.save_tags()
-            self.statusBar().showMessage(f'已添加标签 "{tag}" 到当前文件，位置: {scrollY}')
-        else:
-            self.statusBar().showMessage(f'标签 "{tag}" 已存在于当前文件')
-
-    def jumpToTagPosition(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            if start_idx != -1:
-                position_str = text[start_idx + 7:].rstrip(')')
-                try:
-                    position = int(position_str)
-                    self.webView.page().runJavaScript(f"window.scrollTo(0, {position});", 0, lambda _: None)
-                    dialog.close()
-                    self.statusBar().showMessage(f'已跳转到标签位置: {position}')
-                except ValueError:
-                    self.statusBar().showMessage('无法解析标签位置')
-            else:
-                self.statusBar().showMessage('无法找到标签位置信息')
-        else:
-            self.statusBar().showMessage('请选择一个标签')
-
-    def convertTo(self, format):
-        if not self.current_file:
-            return
-
-        base_name = os.path.basename(self.current_file)
-        base_name_without_ext = os.path.splitext(base_name)[0]
-        default_save_name = f"{base_name_without_ext}.{format}"
-
-        output_file, _ = QFileDialog.getSaveFileName(self, f'保存为{format.upper()}', default_save_name, f'{format.upper()}文件 (*.{format})')
-        if output_file:
-            self.statusBar().showMessage(f'转换中: {base_name} -> {format.upper()}')
-            self.setEnabled(False)
-            resource_dir = os.path.dirname(self.current_file)
-            self.convert_thread = ConvertThread(self.current_file, output_file, format, resource_dir)
-            self.convert_thread.conversionFinished.connect(lambda msg: [self.statusBar().showMessage(msg), self.setEnabled(True)])
-            self.convert_thread.conversionError.connect(lambda err: [self.showConversionError(err, format), self.setEnabled(True)])
-            self.convert_thread.start()
-
-    def deleteTag(self):
-        if not self.tags or not self.current_file or self.current_file not in self.tags:
-            QMessageBox.information(self, '删除标签', '当前文件没有标签', QMessageBox.Ok)
-            return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('删除标签')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for tag_info in self.tags[self.current_file]:
-            if isinstance(tag_info, dict):
-                tag_name = tag_info.get('name', '未知标签')
-                position = tag_info.get('position', '未知位置')
-                listWidget.addItem(f"{tag_name} (位置: {position})")
-            else:
-                listWidget.addItem(tag_info)
-        layout.addWidget(listWidget)
-
-        deleteButton = QPushButton('删除')
-        deleteButton.clicked.connect(lambda: self.removeTag(listWidget.currentItem(), dialog))
-        layout.addWidget(deleteButton)
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
-
-    def removeTag(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            tag_name = text.split(' (位置: ')[0] if start_idx != -1 else text
-            for tag_info in self.tags[self.current_file][:]:
-                if isinstance(tag_info, dict) and tag_info.get('name') == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-                elif tag_info == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-            if not self.tags[self.current_file]:
-                del self.tags[self.current_file]
-                self.save_tags()
-        else:
-            self.statusBar().showMessage('请选择一个要删除的标签')
-
-    def showConversionError(self, error_message, format):
-        if 'Pandoc未安装' in error_message:
-            QMessageBox.critical(self, 'Pandoc未安装', 'Pandoc未安装，转换功能不可用。请安装Pandoc以启用转换功能.<br><br><font color="red">下载链接: <a href="https://pandoc.org/installing.html">https://pandoc.org/installing.html</a></font>', QMessageBox.Ok)
-            self.statusBar().showMessage('转换失败: Pandoc未安装')
-        else:
-            QMessageBox.warning(self, '转换错误', error_message, QMessageBox.Ok)
-            self.statusBar().showMessage('转换失败: 发生错误')
-
-    def load_tags(self):
-        try:
-            with open('tags.json', 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def save_tags(self):
-        with open('tags.json', 'w') as f:
-            json.dump(self.tags, f, indent=4)
-
-    def setDefaultMdHandler(self):
-        try:
-            import winreg
-            app_path = os.path.abspath(sys.argv[0])
-            if app_path.endswith('.py'):
-                QMessageBox.warning(self, '设置默认程序', '无法在开发模式下设置默认程序。请运行编译后的EXE文件。', QMessageBox.Ok)
-                return
-
-            # Define the application name and description
-            app_name = 'MarkdownReader'
-            app_description = 'Markdown Reader Application'
-
-            # Set up the file association for .md files
-            # 1. Create or open the .md key
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, r'Software\Classes\.md')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'{app_name}.md')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置.md文件关联: {e}', QMessageBox.Ok)
-                return
-
-            # 2. Create or open the application key
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, app_description)
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法创建应用程序键: {e}', QMessageBox.Ok)
-                return
-
-            # 3. Set the default icon
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md\DefaultIcon')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'"{app_path}",0')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置默认图标: {e}', QMessageBox.Ok)
-                return
-
-            # 4. Set the shell open command
-            try:
-                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, fr'Software\Classes\{app_name}.md\shell\open\command')
-                winreg.SetValueEx(key, None, 0, winreg.REG_SZ, f'"{app_path}" "%1"')
-                winreg.CloseKey(key)
-            except Exception as e:
-                QMessageBox.critical(self, '错误', f'无法设置打开命令: {e}', QMessageBox.Ok)
-                return
-
-            # Notify Windows about the change
-            # SHChangeNotify(SHCNE_ASSOCCHANGED, SHCNF_IDLIST, NULL, NULL)
-            # This requires ctypes.windll.shell32.SHChangeNotify
-            # For simplicity, we'll skip this for now, as it often works without it.
-            # If issues arise, this can be added.
-
-            QMessageBox.information(self, '设置默认程序', 'Markdown Reader 已成功设置为 .md 文件的默认打开程序。', QMessageBox.Ok)
-
-        except ImportError:
-            QMessageBox.critical(self, '错误', '无法导入 winreg 模块。此功能仅在 Windows 上可用。', QMessageBox.Ok)
-        except Exception as e:
-            QMessageBox.critical(self, '错误', f'设置默认程序时发生未知错误: {e}', QMessageBox.Ok)
-
-if __name__ == '__main__':
-    ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
-    app = QApplication(sys.argv)
-    ex = MarkdownReader()
-    ex.show()
-    if len(sys.argv) > 1:
-        file_path = sys.argv[1]
-        if os.path.exists(file_path) and file_path.endswith('.md'):
-            ex.openFile(file_path)
-    sys.exit(app.exec())
-], ['\\[','\\]']],
-                        processEscapes: true
-                    }
-                });
-            </script>
-            <script src="https://cdn.jsdelivr.net/npm/mermaid/dist/mermaid.min.js"></script>
-            <script>mermaid.initialize({startOnLoad:true});</script>
-            """
-            html_content = f"<html><head>{mathjax_html}</head><body>{html_content}</body></html>"
-            self.contentLoaded.emit(html_content)
-        except Exception as e:
-            self.contentLoaded.emit(f"<html><body><h1>加载文件出错: {str(e)}</h1></body></html>")
-
-class ConvertThread(QThread):
-    conversionFinished = Signal(str)
-    conversionError = Signal(str)
-
-    def __init__(self, input_file, output_file, format_type, resource_dir):
-        super().__init__()
-        self.input_file = input_file
-        self.output_file = output_file
-        self.format_type = format_type
-        self.resource_dir = resource_dir
-
-    def run(self):
-        try:
-            if getattr(sys, 'frozen', False):
-                # If the application is run as a bundle, the PyInstaller bootloader
-                # extends the sys module by a flag frozen=True and sets the absolute
-                # path of the bundle by the _MEIPASS attribute.
-                pandoc_base_path = sys._MEIPASS
-            else:
-                pandoc_base_path = os.getcwd()
-            command = [os.path.join(pandoc_base_path, 'pandoc-3.7.0.2', 'pandoc.exe'), self.input_file, '-o', self.output_file, '--embed-resources', '--standalone', f'--resource-path={self.resource_dir}']
-            result = subprocess.run(command,
-                                    creationflags=subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS,
-                                    stdin=subprocess.DEVNULL,
-                                    stdout=subprocess.DEVNULL,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    encoding='utf-8',
-                                    errors='ignore')
-            if result.returncode == 0:
-                self.conversionFinished.emit(f'转换完成: {os.path.basename(self.input_file)} -> {os.path.basename(self.output_file)}')
-            else:
-                self.conversionError.emit(f'转换失败: Pandoc exited with code {result.returncode}\n{result.stderr}')
-        except FileNotFoundError:
-            self.conversionError.emit('Pandoc未安装')
-        except Exception as e:
-            self.conversionError.emit(f'转换过程中发生错误: {str(e)}')
-
-class MarkdownReader(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.current_file = None
-        self.translator = QTranslator()
-        self.tags = self.load_tags()
-        self.initUI()
-
-    def initUI(self):
-        self.setWindowTitle('Markdown Reader')
-        self.setGeometry(100, 100, 800, 600)
-        self.setAcceptDrops(True)
-        self.setup_toolbar()
-        self.setup_main_layout()
-        self.setStatusBar(QStatusBar())
-        self.statusBar().showMessage('就绪')
-
-    def setup_toolbar(self):
-        self.toolbar = QToolBar()
-        self.toolbar.setMovable(False)
-        self.addToolBar(self.toolbar)
-
-        fileButton = QPushButton('文件')
-        fileButton.clicked.connect(self.showFileMenu)
-        self.toolbar.addWidget(fileButton)
-
-        tagButton = QPushButton('标签')
-        tagButton.clicked.connect(self.showTagMenu)
-        self.toolbar.addWidget(tagButton)
-
-        spacer = QWidget()
-        spacer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.toolbar.addWidget(spacer)
-
-        self.searchInput = QLineEdit()
-        self.searchInput.setPlaceholderText('搜索...')
-        self.searchInput.returnPressed.connect(self.searchText)
-        self.toolbar.addWidget(self.searchInput)
-
-        searchButton = QPushButton('搜索')
-        searchButton.clicked.connect(self.searchText)
-        self.toolbar.addWidget(searchButton)
-
-    def setup_main_layout(self):
-        layout = QVBoxLayout()
-        self.webView = QWebEngineView()
-        layout.addWidget(self.webView, 1)
-        container = QWidget()
-        container.setLayout(layout)
-        self.setCentralWidget(container)
-
-    def openFile(self, fname=None):
-        if not fname:
-            fname, _ = QFileDialog.getOpenFileName(self, '打开Markdown文件', '', 'Markdown文件 (*.md)')
-        if fname:
-            self.current_file = fname
-            self.statusBar().showMessage(f'正在打开: {os.path.basename(fname)}...')
-            self.setEnabled(False)
-            self.loader_thread = FileLoaderThread(fname)
-            self.loader_thread.contentLoaded.connect(lambda html: self.webView.setHtml(html, QUrl.fromLocalFile(fname)))
-            self.loader_thread.progress.connect(self.statusBar().showMessage)
-            self.loader_thread.finished.connect(lambda: [self.statusBar().showMessage(f'已打开: {os.path.basename(fname)}'), self.setEnabled(True)])
-            self.loader_thread.start()
-
-    def showFileMenu(self):
-        menu = QMenu(self)
-        openAction = QAction('打开', self)
-        openAction.triggered.connect(self.openFile)
-        menu.addAction(openAction)
-
-        saveDocxAction = QAction('保存为DOCX', self)
-        saveDocxAction.triggered.connect(lambda: self.convertTo('docx'))
-        menu.addAction(saveDocxAction)
-
-        saveHtmlAction = QAction('保存为HTML', self)
-        saveHtmlAction.triggered.connect(lambda: self.convertTo('html'))
-        menu.addAction(saveHtmlAction)
-
-        menu.addSeparator()
-
-        setDefaultAction = QAction('设置为默认Markdown阅读器', self)
-        setDefaultAction.triggered.connect(self.setDefaultMdHandler)
-        menu.addAction(setDefaultAction)
-
-        menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
-
-    def searchText(self):
-        search_term = self.searchInput.text()
-        if search_term:
-            self.webView.findText(search_term)
-
-    def showTagMenu(self):
-        menu = QMenu(self)
-        addTagAction = QAction('添加标签', self)
-        addTagAction.triggered.connect(self.addTag)
-        menu.addAction(addTagAction)
-
-        viewTagsAction = QAction('查看标签', self)
-        viewTagsAction.triggered.connect(self.viewTags)
-        menu.addAction(viewTagsAction)
-
-        deleteTagAction = QAction('删除标签', self)
-        deleteTagAction.triggered.connect(self.deleteTag)
-        menu.addAction(deleteTagAction)
-
-        menu.exec(self.mapToGlobal(self.toolbar.geometry().bottomLeft()))
-
-    def searchPrevious(self):
-        search_term = self.searchInput.text()
-        if not search_term:
-            QMessageBox.warning(self, '搜索', '请输入搜索词', QMessageBox.Ok)
-            return
-
-        if not hasattr(self, 'last_search_term') or self.last_search_term != search_term:
-            self.searchText()
-
-        flags = QWebEnginePage.FindFlag.FindBackward
-        self.webView.findText(search_term, flags, lambda found: self.statusBar().showMessage('找到上一个匹配项' if found else '未找到上一个匹配项'))
-        self.last_search_term = search_term
-
-    def dragEnterEvent(self, event):
-        if event.mimeData().hasUrls():
-            pos = event.position().toPoint()
-            web_view_rect = self.webView.geometry()
-            if web_view_rect.contains(pos):
-                event.accept()
-            else:
-                event.ignore()
-        else:
-            event.ignore()
-
-    def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.endswith('.md'):
-                self.openFile(file_path)
-                break
-
-    def addTag(self):
-        tag, ok = QInputDialog.getText(self, '添加标签', '输入标签名称:')
-        if ok and tag:
-            if self.current_file:
-                if self.current_file not in self.tags:
-                    self.tags[self.current_file] = []
-                self.webView.page().runJavaScript("window.scrollY", 0, lambda result: self.storeTagWithPosition(tag, result))
-            else:
-                self.statusBar().showMessage('请先打开一个文件')
-
-    def viewTags(self):
-        if not self.tags:
-            QMessageBox.information(self, '标签', '没有标签', QMessageBox.Ok)
-            return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('标签列表')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for file, tags in self.tags.items():
-            for tag_info in tags:
-                if isinstance(tag_info, dict):
-                    tag_name = tag_info.get('name', '未知标签')
-                    position = tag_info.get('position', '未知位置')
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_name} (位置: {position})")
-                else:
-                    listWidget.addItem(f"{os.path.basename(file)}: {tag_info}")
-        layout.addWidget(listWidget)
-
-        listWidget.itemDoubleClicked.connect(lambda item: self.jumpToTagPosition(item, dialog))
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        jumpButton = QPushButton('跳转到标签位置')
-        jumpButton.clicked.connect(lambda: self.jumpToTagPosition(listWidget.currentItem(), dialog))
-        layout.addWidget(jumpButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
-
-    def storeTagWithPosition(self, tag, scrollY):
-        tag_info = {'name': tag, 'position': scrollY}
-        if tag_info not in self.tags[self.current_file]:
-            self.tags[self.current_file].append(tag_info)
-            self.save_tags()
-            self.statusBar().showMessage(f'已添加标签 "{tag}" 到当前文件，位置: {scrollY}')
-        else:
-            self.statusBar().showMessage(f'标签 "{tag}" 已存在于当前文件')
-
-    def jumpToTagPosition(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            if start_idx != -1:
-                position_str = text[start_idx + 7:].rstrip(')')
-                try:
-                    position = int(position_str)
-                    self.webView.page().runJavaScript(f"window.scrollTo(0, {position});", 0, lambda _: None)
-                    dialog.close()
-                    self.statusBar().showMessage(f'已跳转到标签位置: {position}')
-                except ValueError:
-                    self.statusBar().showMessage('无法解析标签位置')
-            else:
-                self.statusBar().showMessage('无法找到标签位置信息')
-        else:
-            self.statusBar().showMessage('请选择一个标签')
-
-    def convertTo(self, format):
-        if not self.current_file:
-            return
-
-        base_name = os.path.basename(self.current_file)
-        base_name_without_ext = os.path.splitext(base_name)[0]
-        default_save_name = f"{base_name_without_ext}.{format}"
-
-        output_file, _ = QFileDialog.getSaveFileName(self, f'保存为{format.upper()}', default_save_name, f'{format.upper()}文件 (*.{format})')
-        if output_file:
-            self.statusBar().showMessage(f'转换中: {base_name} -> {format.upper()}')
-            self.setEnabled(False)
-            resource_dir = os.path.dirname(self.current_file)
-            self.convert_thread = ConvertThread(self.current_file, output_file, format, resource_dir)
-            self.convert_thread.conversionFinished.connect(lambda msg: [self.statusBar().showMessage(msg), self.setEnabled(True)])
-            self.convert_thread.conversionError.connect(lambda err: [self.showConversionError(err, format), self.setEnabled(True)])
-            self.convert_thread.start()
-
-    def deleteTag(self):
-        if not self.tags or not self.current_file or self.current_file not in self.tags:
-            QMessageBox.information(self, '删除标签', '当前文件没有标签', QMessageBox.Ok)
-            return
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle('删除标签')
-        layout = QVBoxLayout()
-
-        listWidget = QListWidget()
-        for tag_info in self.tags[self.current_file]:
-            if isinstance(tag_info, dict):
-                tag_name = tag_info.get('name', '未知标签')
-                position = tag_info.get('position', '未知位置')
-                listWidget.addItem(f"{tag_name} (位置: {position})")
-            else:
-                listWidget.addItem(tag_info)
-        layout.addWidget(listWidget)
-
-        deleteButton = QPushButton('删除')
-        deleteButton.clicked.connect(lambda: self.removeTag(listWidget.currentItem(), dialog))
-        layout.addWidget(deleteButton)
-
-        closeButton = QPushButton('关闭')
-        closeButton.clicked.connect(dialog.close)
-        layout.addWidget(closeButton)
-
-        dialog.setLayout(layout)
-        dialog.exec()
-
-    def removeTag(self, item, dialog):
-        if item:
-            text = item.text()
-            start_idx = text.find('(位置: ')
-            tag_name = text.split(' (位置: ')[0] if start_idx != -1 else text
-            for tag_info in self.tags[self.current_file][:]:
-                if isinstance(tag_info, dict) and tag_info.get('name') == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-                elif tag_info == tag_name:
-                    self.tags[self.current_file].remove(tag_info)
-                    self.save_tags()
-                    self.statusBar().showMessage(f'已删除标签 "{tag_name}"')
-                    dialog.close()
-                    break
-            if not self.tags[self.current_file]:
-                del self.tags[self.current_file]
-                self.save_tags()
-        else:
-            self.statusBar().showMessage('请选择一个要删除的标签')
-
-    def showConversionError(self, error_message, format):
-        if 'Pandoc未安装' in error_message:
-            QMessageBox.critical(self, 'Pandoc未安装', 'Pandoc未安装，转换功能不可用。请安装Pandoc以启用转换功能.<br><br><font color="red">下载链接: <a href="https://pandoc.org/installing.html">https://pandoc.org/installing.html</a></font>', QMessageBox.Ok)
-            self.statusBar().showMessage('转换失败: Pandoc未安装')
-        else:
-            QMessageBox.warning(self, '转换错误', error_message, QMessageBox.Ok)
-            self.statusBar().showMessage('转换失败: 发生错误')
-
-    def load_tags(self):
-        try:
-            with open('tags.json', 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def save_tags(self):
-        with open('tags.json', 'w') as f:
-            json.dump(self.tags, f, indent=4)
+    def openTagStore(self):
+        from tag_store import TagStore, legacy_tag_files
+        store = TagStore(user_data_dir('tags.sqlite'))
+        for path in legacy_tag_files():
+            if os.path.isfile(path):
+                store.migrate(path)
+        return store
 
     def setDefaultMdHandler(self):
         try:
@@ -1276,12 +1169,31 @@ class MarkdownReader(QMainWindow):
             QMessageBox.critical(self, '错误', f'设置默认程序时发生未知错误: {e}', QMessageBox.Ok)
 
 if __name__ == '__main__':
-    ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
+    # Render worker processes start by re-running this script in a frozen build
+    multiprocessing.freeze_support()
+    # --profile-startup reports where startup time goes, then exits (1 if over budget)
+    profile_startup = '--profile-startup' in sys.argv[1:]
+    arguments = [argument for argument in sys.argv[1:] if argument != '--profile-startup']
+    if not profile_startup:
+        ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
+    register_scheme()
+    # The web view widgets are imported after the window is up; Qt needs this set before the application
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
-    ex = MarkdownReader()
+    STARTUP.mark(APPLICATION)
+    paths = [os.path.abspath(path) for path in arguments]
+    instance = None
+    if not profile_startup:
+        # A window is already open: it opens the files and this launch ends here
+        instance = InstanceServer()
+        if not instance.acquire(paths):
+            sys.exit(0)
+    ex = MarkdownReader(paths, profile_startup)
+    STARTUP.mark(WINDOW)
+    if instance is not None:
+        instance.filesReceived.connect(ex.openPaths)
     ex.show()
-    if len(sys.argv) > 1:
-        file_path = sys.argv[1]
-        if os.path.exists(file_path) and file_path.endswith('.md'):
-            ex.openFile(file_path)
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if instance is not None:
+        instance.close()
+    sys.exit(exit_code)
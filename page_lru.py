@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+# What an activated tab does to show its document again (see restore_action)
+SHOW = 'show'
+RELOAD = 'reload'
+REBUILD = 'rebuild'
+LOAD = 'load'
+
+
+def restore_action(rendered, stale, discarded):
+    """How a tab gets its page back when it is shown.
+
+    rendered: the tab still holds its rendered HTML; stale: the file changed
+    while the tab was in the background; discarded: its web page was dropped.
+    """
+    if not rendered or (stale and discarded):
+        return LOAD
+    if discarded:
+        # Rebuilt from the HTML kept in memory, without rendering again
+        return REBUILD
+    if stale:
+        return RELOAD
+    return SHOW
+
+
+class RenderedPageLRU:
+    """Keeps the rendered HTML of recently used tabs in memory.
+
+    Only the live_pages most recent tabs keep a web page; older ones are discarded
+    and rebuilt from their HTML, and tabs beyond max_bytes of HTML drop it too.
+    Tabs are anything with renderer and rendered_bytes attributes and discard()
+    and release() methods.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024, live_pages=5):
+        self.max_bytes = max_bytes
+        self.live_pages = live_pages
+        self._tabs = OrderedDict()
+
+    def touch(self, tab):
+        self._tabs.pop(tab, None)
+        self._tabs[tab] = None
+
+    def remove(self, tab):
+        self._tabs.pop(tab, None)
+
+    def enforce(self):
+        total = 0
+        for rank, tab in enumerate(reversed(self._tabs)):
+            if rank == 0:
+                continue
+            if rank >= self.live_pages:
+                tab.discard()
+            if tab.renderer is not None:
+                total += tab.rendered_bytes
+                if total > self.max_bytes:
+                    total -= tab.rendered_bytes
+                    tab.release()
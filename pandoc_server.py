@@ -0,0 +1,213 @@
+import base64
+import functools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Local images referenced from Markdown, as ![alt](path) or <img src="path">
+_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)|<img\b[^>]*\bsrc="([^"]+)"', re.I)
+
+
+# Writer options used for every export, by the server and by one-off pandoc runs alike
+EXPORT_OPTIONS = {'standalone': True, 'embed-resources': True}
+
+
+class PandocError(Exception):
+    pass
+
+
+class PandocServerUnavailable(PandocError):
+    pass
+
+
+def pandoc_executable():
+    if getattr(sys, 'frozen', False):
+        # If the application is run as a bundle, the PyInstaller bootloader
+        # extends the sys module by a flag frozen=True and sets the absolute
+        # path of the bundle by the _MEIPASS attribute.
+        pandoc_base_path = sys._MEIPASS
+    else:
+        pandoc_base_path = os.getcwd()
+    return os.path.join(pandoc_base_path, 'pandoc-3.7.0.2', 'pandoc.exe')
+
+
+def _no_window():
+    return subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@functools.lru_cache(maxsize=None)
+def pandoc_version(executable):
+    try:
+        result = subprocess.run([executable, '--version'], creationflags=_no_window(),
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout.splitlines()[0]
+
+
+def referenced_resources(text, resource_dir):
+    """Yield (link target, path) for the local images a document references."""
+    seen = set()
+    for match in _IMAGE_RE.finditer(text):
+        target = match.group(1) or match.group(2)
+        if re.match(r'^[a-z][a-z0-9+.-]*:', target, re.I) or target in seen:
+            continue
+        seen.add(target)
+        path = os.path.join(resource_dir, urllib.request.url2pathname(target))
+        if os.path.isfile(path):
+            yield target, path
+
+
+def resource_files(text, resource_dir):
+    """Map the local images a document references to their base64 content.
+
+    pandoc-server cannot read the file system, so everything --resource-path used
+    to find has to travel with the request.
+    """
+    files = {}
+    for target, path in referenced_resources(text, resource_dir):
+        try:
+            with open(path, 'rb') as f:
+                files[target] = base64.b64encode(f.read()).decode('ascii')
+        except OSError:
+            continue
+    return files
+
+
+def read_document(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def parse_request(text):
+    return {'text': text, 'from': 'markdown', 'to': 'json'}
+
+
+def build_request(text, format_type, resource_dir, ast=None):
+    """Convert text, or write its already parsed JSON AST if one is given."""
+    return {
+        'text': text if ast is None else ast,
+        'from': 'markdown' if ast is None else 'json',
+        'to': format_type,
+        **EXPORT_OPTIONS,
+        'resource-path': ['.'],
+        'files': resource_files(text, resource_dir),
+    }
+
+
+class PandocServer:
+    """A long-lived `pandoc server` that conversions are posted to.
+
+    Starting pandoc costs far more than converting a short document, so one
+    server is started on first use and kept running; it is health-checked before
+    use and restarted if it has died.
+    """
+
+    def __init__(self, executable=None, timeout=120, startup_timeout=10):
+        self.executable = executable or pandoc_executable()
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.port = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def healthy(self):
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f'{self.url}/version', timeout=2) as response:
+                return response.status == 200
+        except (OSError, urllib.error.URLError):
+            return False
+
+    def ensure_running(self):
+        with self._lock:
+            if self.healthy():
+                return
+            self._stop()
+            self._start()
+
+    def _start(self):
+        self.port = _free_port()
+        command = [self.executable, 'server', f'--port={self.port}', f'--timeout={self.timeout}']
+        try:
+            self.process = subprocess.Popen(command,
+                                            creationflags=_no_window(),
+                                            stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.DEVNULL)
+        except OSError as e:
+            self.process = None
+            raise PandocServerUnavailable(f'无法启动 pandoc server: {e}')
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            if self.healthy():
+                return
+            time.sleep(0.05)
+        self._stop()
+        raise PandocServerUnavailable('pandoc server 未能启动')
+
+    def convert(self, request):
+        """Post one conversion and return the output as bytes."""
+        body = json.dumps(request).encode('utf-8')
+        for attempt in range(2):
+            self.ensure_running()
+            http_request = urllib.request.Request(self.url, data=body, method='POST', headers={
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+            })
+            try:
+                with urllib.request.urlopen(http_request, timeout=self.timeout + 5) as response:
+                    result = json.loads(response.read().decode('utf-8'))
+                break
+            except urllib.error.HTTPError as e:
+                raise PandocError(e.read().decode('utf-8', errors='ignore') or str(e))
+            except (OSError, urllib.error.URLError):
+                # Try once more; ensure_running restarts the server only if it is really
+                # down, so a worker never kills one another worker has just restarted
+                if attempt:
+                    raise PandocServerUnavailable('pandoc server 无响应')
+        if 'error' in result:
+            raise PandocError(result['error'])
+        output = result.get('output', '')
+        return base64.b64decode(output) if result.get('base64') else output.encode('utf-8')
+
+    def convert_file(self, input_file, output_file, format_type, resource_dir):
+        output = self.convert(build_request(read_document(input_file), format_type, resource_dir))
+        with open(output_file, 'wb') as f:
+            f.write(output)
+
+    def _stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+            self.process = None
+
+    def stop(self):
+        with self._lock:
+            self._stop()
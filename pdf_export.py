@@ -0,0 +1,202 @@
+import collections
+import itertools
+import os
+import threading
+import time
+
+from PySide6.QtCore import QMarginsF, QObject, Signal
+from PySide6.QtGui import QPageLayout, QPageSize
+from PySide6.QtWebEngineCore import QWebEnginePage
+
+from conversion_jobs import ConversionCancelled
+
+# Logged by the page once its diagrams have been laid out
+_READY_MESSAGE = 'mdr-print-ready'
+
+WAIT_SCRIPT = f"""
+(window.mermaid ? (mermaid.initialize({{startOnLoad: false}}), mermaid.run()) : Promise.resolve())
+    .catch(function () {{}})
+    .then(function () {{ console.log('{_READY_MESSAGE}'); }});
+"""
+
+# Offscreen pages kept for printing
+PAGE_POOL_SIZE = 3
+# Seconds a print may take, from being queued to the PDF being written
+PRINT_TIMEOUT = 300
+
+
+class PdfExportError(Exception):
+    pass
+
+
+class _PrintJob:
+    def __init__(self, input_file, output_file, html, cancel_event):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.html = html
+        self.cancel_event = cancel_event
+        self.path = None
+        self.printing = False
+        self.cancelled = False
+        self.error = None
+        self.done = threading.Event()
+
+
+class _PrintPage(QWebEnginePage):
+    ready = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.job = None
+
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        if message == _READY_MESSAGE:
+            self.ready.emit()
+
+
+class PdfExporter(QObject):
+    """Prints documents to PDF with QWebEnginePage.printToPdf, no LaTeX needed.
+
+    Pages are rendered like the viewer's (from the same render and figure caches)
+    and printed on a small pool of offscreen pages that are reused from one
+    document to the next, so a folder of files runs a few prints in parallel
+    without starting a page per file.
+    """
+    _submitted = Signal(object)
+    _abandoned = Signal(object)
+
+    def __init__(self, html_exporter, scheme_handler, pages=PAGE_POOL_SIZE, timeout=PRINT_TIMEOUT, parent=None):
+        super().__init__(parent)
+        self.html_exporter = html_exporter
+        self.scheme_handler = scheme_handler
+        self.timeout = timeout
+        self.size = pages
+        self.pages = []
+        self.idle = []
+        self.waiting = collections.deque()
+        self.layout = QPageLayout(QPageSize(QPageSize.A4), QPageLayout.Portrait, QMarginsF(15, 15, 15, 15))
+        self._ids = itertools.count(1)
+        self._submitted.connect(self.enqueue)
+        self._abandoned.connect(self.abandon)
+
+    def export(self, input_file, output_file, cancel_event=None):
+        """Print input_file to output_file. Blocks until done, so call it from a worker thread."""
+        with open(input_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        title = os.path.splitext(os.path.basename(input_file))[0]
+        html = self.html_exporter.render(text, os.path.dirname(os.path.abspath(input_file)), title, standalone=False)
+        job = _PrintJob(os.path.abspath(input_file), output_file, html, cancel_event)
+        # Pages live in the GUI thread; the signal hands the job over to it
+        self._submitted.emit(job)
+        # The page may never report back (a script error, a stuck print), so the
+        # worker keeps checking for cancellation and gives up after the timeout
+        deadline = time.monotonic() + self.timeout
+        while not job.done.wait(0.2):
+            if job.cancel_event is not None and job.cancel_event.is_set():
+                job.cancelled = True
+            elif time.monotonic() >= deadline:
+                job.error = 'PDF导出超时'
+            else:
+                continue
+            self._abandoned.emit(job)
+            break
+        if job.cancelled:
+            raise ConversionCancelled()
+        if job.error:
+            raise PdfExportError(job.error)
+
+    def enqueue(self, job):
+        self.waiting.append(job)
+        self.startNext()
+
+    def startNext(self):
+        while self.waiting:
+            if not self.idle:
+                if len(self.pages) >= self.size:
+                    return
+                self.idle.append(self._newPage())
+            job = self.waiting.popleft()
+            if job.cancel_event is not None and job.cancel_event.is_set():
+                job.cancelled = True
+                job.done.set()
+                continue
+            page = self.idle.pop()
+            page.job = job
+            # Published next to the document so its relative image links resolve
+            job.path = os.path.join(os.path.dirname(job.input_file), f'.{os.path.basename(job.input_file)}.print{next(self._ids)}.html')
+            page.load(self.scheme_handler.publish(job.path, job.html))
+
+    def _newPage(self):
+        page = _PrintPage(self)
+        page.loadFinished.connect(lambda ok: self.onLoaded(page, ok))
+        page.ready.connect(lambda: self.onReady(page))
+        page.pdfPrintingFinished.connect(lambda path, ok: self.onPrinted(page, ok))
+        self.pages.append(page)
+        return page
+
+    def onLoaded(self, page, ok):
+        if page.job is None or page.job.printing:
+            return
+        if self._cancelled(page):
+            return
+        if not ok:
+            self._finish(page, '页面加载失败')
+            return
+        page.runJavaScript(WAIT_SCRIPT)
+
+    def onReady(self, page):
+        if page.job is None or page.job.printing:
+            return
+        if self._cancelled(page):
+            return
+        page.job.printing = True
+        page.printToPdf(page.job.output_file, self.layout)
+
+    def onPrinted(self, page, ok):
+        if page.job is not None:
+            self._finish(page, None if ok else '无法写入PDF文件')
+
+    def _cancelled(self, page):
+        job = page.job
+        if job.cancel_event is None or not job.cancel_event.is_set():
+            return False
+        job.cancelled = True
+        self._finish(page, None)
+        return True
+
+    def abandon(self, job):
+        """Drop a job its worker stopped waiting for, and the page printing it."""
+        if job in self.waiting:
+            self.waiting.remove(job)
+            return
+        for page in self.pages:
+            if page.job is job:
+                # A load or print cannot be stopped; the page is not reused
+                page.job = None
+                self.scheme_handler.withdraw(job.path)
+                job.html = None
+                self.pages.remove(page)
+                page.deleteLater()
+                self.startNext()
+                return
+
+    def _finish(self, page, error):
+        job, page.job = page.job, None
+        self.scheme_handler.withdraw(job.path)
+        job.error = error
+        job.html = None
+        job.done.set()
+        self.idle.append(page)
+        self.startNext()
+
+    def shutdown(self):
+        # Release the worker threads still waiting on a print
+        for job in [*self.waiting, *(page.job for page in self.pages if page.job is not None)]:
+            job.cancelled = True
+            job.done.set()
+        self.waiting.clear()
+        for page in self.pages:
+            page.job = None
+            page.deleteLater()
+        self.pages = []
+        self.idle = []
@@ -0,0 +1,66 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from engines import engine_class
+from renderer import CHUNK_BLOCKS, FIRST_PAINT_BLOCKS, convert_block
+
+# One converter per engine and worker process, reused across batches
+_converters = {}
+
+
+def render_batch(engine, sources, definitions):
+    converter = _converters.get(engine)
+    if converter is None:
+        converter = _converters[engine] = engine_class(engine)()
+    return [convert_block(converter, source, definitions) for source in sources]
+
+
+class RenderPool:
+    """Converts blocks in worker processes.
+
+    Markdown conversion is pure-Python work, so on a thread it holds the GIL the
+    GUI needs; in worker processes it no longer stalls the UI and several
+    documents (or parts of one large document) convert on all cores at once.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def render(self, engine, sources, definitions, first=FIRST_PAINT_BLOCKS, size=CHUNK_BLOCKS):
+        """Yield the HTML of sources in order, the first batch kept small for first paint."""
+        batches = [sources[:first]] + [sources[start:start + size] for start in range(first, len(sources), size)]
+        executor = self._get_executor()
+        futures = [executor.submit(render_batch, engine, batch, definitions) for batch in batches]
+        done = 0
+        try:
+            for future in futures:
+                yield from future.result()
+                done += 1
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); start a fresh pool next time and
+            # finish this document in-process
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            for batch in batches[done:]:
+                yield from render_batch(engine, batch, definitions)
+        finally:
+            # Nothing is waiting for the rest once a load is interrupted
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,614 @@
+import bisect
+import difflib
+import hashlib
+import html
+import json
+import re
+
+from assets import MATHJAX_SCRIPT, MERMAID_SCRIPT, asset_url
+from disk_cache import make_key
+from engines import DEFAULT_ENGINE, engine_class
+from figures import PLACEHOLDER_RE
+
+# Bump whenever the HTML produced for the same source changes
+RENDERER_VERSION = '2'
+
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_LIST_ITEM_RE = re.compile(r'^ {0,3}([*+-]|\d+[.)])\s')
+_LINK_DEF_RE = re.compile(r'^ {0,3}\[[^\]]+\]:\s*\S')
+_LINK_DEF_LINE_RE = re.compile(r'^ {0,3}\[[^\]\n]+\]:[ \t]*\S.*$', re.M)
+
+# Blocks rendered before the page is first shown, then per streamed chunk
+FIRST_PAINT_BLOCKS = 30
+CHUNK_BLOCKS = 200
+
+PAGE_HEAD = ('<meta charset="utf-8"><style>.mdr-math-block{display:block;text-align:center;margin:1em 0}'
+             '::highlight(mdr-search){background-color:#ffe066}::highlight(mdr-search-current){background-color:#ff9632}</style>')
+
+MATHJAX_CONFIG = {
+    'tex2jax': {
+        'inlineMath': [['$', '$'], ['\\(', '\\)']],
+        'displayMath': [['$$', '$$'], ['\\[', '\\]']],
+        'processEscapes': True,
+    },
+    # Only the web fonts are bundled
+    'HTML-CSS': {'imageFont': None},
+}
+
+MATHJAX_SRC = asset_url(MATHJAX_SCRIPT) + '?config=TeX-AMS-MML_HTMLorMML'
+MERMAID_SRC = asset_url(MERMAID_SCRIPT)
+
+# Timings of the work done in the page reach the viewer's tracer as console
+# messages: [name, start, end] in wall-clock milliseconds, or ['done'] once every
+# requested section is on the page
+TRACE_PREFIX = 'mdr-trace:'
+TRACE_SCRIPT = """
+<script>
+function mdrTraceSpan(name, start, end) {
+    var origin = performance.timeOrigin;
+    console.log('%s' + JSON.stringify([name, origin + start, origin + (end === undefined ? performance.now() : end)]));
+}
+var mdrPaintNames = {'first-paint': '首次绘制', 'first-contentful-paint': '首次内容绘制'};
+if (window.PerformanceObserver) {
+    new PerformanceObserver(function (list) {
+        list.getEntries().forEach(function (entry) {
+            mdrTraceSpan(mdrPaintNames[entry.name] || entry.name, 0, entry.startTime);
+        });
+    }).observe({type: 'paint', buffered: true});
+}
+document.addEventListener('DOMContentLoaded', function () {
+    mdrTraceSpan('解析页面', 0);
+});
+function mdrTraceMathJax(config) {
+    var start = performance.now();
+    config.AuthorInit = function () {
+        MathJax.Hub.Register.StartupHook('End', function () {
+            mdrTraceSpan('MathJax', start);
+        });
+    };
+    return config;
+}
+function mdrTraceDone() {
+    mdrSections.then(function () {
+        console.log('%s' + JSON.stringify(['done']));
+    });
+}
+function mdrRunMermaid(nodes) {
+    var start = performance.now();
+    Promise.resolve(mermaid.run({nodes: nodes})).then(function () {
+        mdrTraceSpan('Mermaid', start);
+    });
+}
+</script>
+""".replace('%s', TRACE_PREFIX)
+
+# Scripts are only put on pages that need them; blocks added later load them on demand
+ASSET_SCRIPT = '<script>var mdrAssets = %s;</script>' % json.dumps({
+    'mathjax': MATHJAX_SRC,
+    'mathjaxConfig': MATHJAX_CONFIG,
+    'mermaid': MERMAID_SRC,
+})
+
+FEATURE_SCRIPTS = {
+    'math': f'<script>window.MathJax = mdrTraceMathJax(mdrAssets.mathjaxConfig);</script><script src="{MATHJAX_SRC}"></script>',
+    'mermaid': (f'<script src="{MERMAID_SRC}"></script><script>mermaid.initialize({{startOnLoad:false}});'
+                "window.addEventListener('load', function () { mdrRunMermaid(document.querySelectorAll('.mermaid')); });</script>"),
+}
+
+# Applies the block patches produced by IncrementalRenderer.update() to the live page
+PATCH_SCRIPT = """
+<script>
+var mdrRequested = {};
+function mdrRequire(src, onload) {
+    if (mdrRequested[src]) {
+        return;
+    }
+    mdrRequested[src] = true;
+    var script = document.createElement('script');
+    script.src = src;
+    script.onload = onload || null;
+    document.head.appendChild(script);
+}
+function mdrTypeset(node) {
+    // Formulas waiting for their pre-rendered SVG are left to the native MathML renderer
+    var formulas = Array.prototype.filter.call(node.querySelectorAll('math'), function (math) {
+        return !math.closest('[data-figure]');
+    });
+    if (formulas.length) {
+        if (window.MathJax && MathJax.Hub) {
+            var start = performance.now();
+            MathJax.Hub.Queue(['Typeset', MathJax.Hub, node], function () {
+                mdrTraceSpan('MathJax', start);
+            });
+        } else {
+            // MathJax typesets the whole page once it has started
+            window.MathJax = window.MathJax || mdrTraceMathJax(mdrAssets.mathjaxConfig);
+            mdrRequire(mdrAssets.mathjax);
+        }
+    }
+    var diagrams = node.querySelectorAll('.mermaid');
+    if (diagrams.length) {
+        if (window.mermaid) {
+            mdrRunMermaid(diagrams);
+        } else {
+            mdrRequire(mdrAssets.mermaid, function () {
+                mermaid.initialize({startOnLoad: false});
+                mdrRunMermaid(document.querySelectorAll('.mermaid'));
+            });
+        }
+    }
+}
+// Figures rendered offscreen replace their placeholders as they arrive
+var mdrFigures = {};
+function mdrShowFigures(node) {
+    node.querySelectorAll('[data-figure]').forEach(function (placeholder) {
+        var figure = mdrFigures[placeholder.getAttribute('data-figure')];
+        if (figure !== undefined) {
+            placeholder.innerHTML = figure;
+            placeholder.removeAttribute('data-figure');
+        }
+    });
+}
+function mdrSetFigure(key, html) {
+    mdrFigures[key] = html;
+    mdrShowFigures(document);
+}
+// In-document search: matches arrive as text offsets per block, computed from the
+// same text (figures, formulas and diagrams left out) by document_search.py
+var mdrSearchMatches = {};
+function mdrTextNodes(block) {
+    var walker = document.createTreeWalker(block, NodeFilter.SHOW_TEXT, {
+        acceptNode: function (node) {
+            return node.parentElement.closest('math, svg, .mermaid, [data-figure]') ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT;
+        }
+    });
+    var nodes = [];
+    while (walker.nextNode()) {
+        nodes.push(walker.currentNode);
+    }
+    return nodes;
+}
+function mdrRanges(block, spans) {
+    var nodes = mdrTextNodes(block);
+    var ranges = [];
+    var index = 0, base = 0;
+    function locate(offset, isEnd) {
+        while (index < nodes.length && base + nodes[index].length < offset + (isEnd ? 0 : 1)) {
+            base += nodes[index].length;
+            index++;
+        }
+        return index < nodes.length ? [nodes[index], offset - base] : null;
+    }
+    spans.forEach(function (span) {
+        var start = locate(span[0], false);
+        var end = start && locate(span[1], true);
+        if (end) {
+            var range = document.createRange();
+            range.setStart(start[0], start[1]);
+            range.setEnd(end[0], end[1]);
+            ranges.push(range);
+        }
+    });
+    return ranges;
+}
+function mdrSearchApply(node) {
+    var spans = mdrSearchMatches[node.id];
+    if (spans && window.CSS && CSS.highlights && CSS.highlights.has('mdr-search')) {
+        var highlight = CSS.highlights.get('mdr-search');
+        mdrRanges(node, spans).forEach(function (range) {
+            highlight.add(range);
+        });
+    }
+}
+function mdrSearch(matches) {
+    mdrSearchMatches = matches;
+    if (!window.CSS || !CSS.highlights) {
+        return;
+    }
+    CSS.highlights.set('mdr-search', new Highlight());
+    CSS.highlights.delete('mdr-search-current');
+    Object.keys(matches).forEach(function (id) {
+        var block = document.getElementById(id);
+        if (block) {
+            mdrSearchApply(block);
+        }
+    });
+}
+function mdrSearchGoto(id, start, end) {
+    mdrSections.then(function () {
+        var block = document.getElementById(id);
+        if (!block) {
+            return;
+        }
+        var range = mdrRanges(block, [[start, end]])[0];
+        if (!range) {
+            block.scrollIntoView();
+            return;
+        }
+        if (window.CSS && CSS.highlights) {
+            CSS.highlights.set('mdr-search-current', new Highlight(range));
+        }
+        window.scrollBy(0, range.getBoundingClientRect().top - window.innerHeight / 3);
+    });
+}
+function mdrInsert(html, before) {
+    var template = document.createElement('template');
+    template.innerHTML = html;
+    var nodes = Array.prototype.slice.call(template.content.children);
+    document.getElementById('mdr-root').insertBefore(template.content, before);
+    nodes.forEach(function (node) {
+        mdrShowFigures(node);
+        mdrTypeset(node);
+        mdrSearchApply(node);
+    });
+}
+function mdrAppend(html) {
+    mdrInsert(html, null);
+}
+// Streamed sections are fetched from the mdr:// scheme handler, in order
+var mdrSections = Promise.resolve();
+function mdrLoadSections(first, end) {
+    for (var index = first; index < end; index++) {
+        (function (section) {
+            mdrSections = mdrSections.then(function () {
+                var start = performance.now();
+                return fetch('?section=' + section).then(function (response) {
+                    return response.ok ? response.text() : '';
+                }).then(function (html) {
+                    mdrAppend(html);
+                    mdrTraceSpan('插入分块', start);
+                });
+            });
+        })(index);
+    }
+}
+function mdrPatch(ops) {
+    var start = performance.now();
+    var root = document.getElementById('mdr-root');
+    ops.forEach(function (op) {
+        op.remove.forEach(function (id) {
+            var node = document.getElementById(id);
+            if (node) {
+                node.remove();
+            }
+        });
+        if (op.html) {
+            var anchor = op.after ? document.getElementById(op.after) : null;
+            mdrInsert(op.html, anchor ? anchor.nextSibling : root.firstChild);
+        }
+    });
+    mdrTraceSpan('应用补丁', start);
+}
+</script>
+"""
+
+
+def page_features(body):
+    if 'data-figure=' in body:
+        body = PLACEHOLDER_RE.sub('', body)
+    features = set()
+    if '<math' in body:
+        features.add('math')
+    if 'class="mermaid"' in body:
+        features.add('mermaid')
+    return features
+
+
+def build_page(body):
+    scripts = ''.join(FEATURE_SCRIPTS[feature] for feature in sorted(page_features(body)))
+    return f"<html><head>{PAGE_HEAD}{TRACE_SCRIPT}{ASSET_SCRIPT}{scripts}{PATCH_SCRIPT}</head><body><div id=\"mdr-root\">{body}</div></body></html>"
+
+
+def error_page(message):
+    return f"<html><head><meta charset=\"utf-8\"></head><body><h1>加载文件出错: {html.escape(message)}</h1></body></html>"
+
+
+def iter_blocks(lines, start=0):
+    """Yield the top-level blocks of lines[start:] as (start_line, source) pairs.
+
+    start must be the first line of a block (or 0).
+    """
+    current = []
+    first = start
+    blanks = 0
+    fence = None
+    in_math = False
+    in_list = False
+    for number in range(start, len(lines)):
+        line = lines[number]
+        stripped = line.strip()
+        if fence:
+            current.append(line)
+            match = _FENCE_RE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+                    and not stripped[len(match.group(1)):].strip():
+                fence = None
+            continue
+        if in_math:
+            current.append(line)
+            if stripped.endswith('$$'):
+                in_math = False
+            continue
+        if not stripped:
+            if current:
+                blanks += 1
+            continue
+
+        # A blank line only ends a block when the next line is not a continuation
+        # (indented content or another item of the same list)
+        continues = current and (not blanks or line[:1] in (' ', '\t') or (in_list and _LIST_ITEM_RE.match(line)))
+        if continues:
+            current.extend([''] * blanks)
+        else:
+            if current:
+                yield first, '\n'.join(current)
+            current = []
+            first = number
+            in_list = bool(_LIST_ITEM_RE.match(line))
+        blanks = 0
+        current.append(line)
+
+        match = _FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+        elif stripped.startswith('$$'):
+            in_math = stripped == '$$' or not (len(stripped) >= 4 and stripped.endswith('$$'))
+    if current:
+        yield first, '\n'.join(current)
+
+
+def split_blocks(text):
+    """Split markdown source into top-level blocks, returning (start_line, source) pairs."""
+    return list(iter_blocks(text.splitlines()))
+
+
+def _common_prefix(a, b):
+    # Binary search on slice equality keeps the comparisons in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def collect_link_definitions(text):
+    # Reference-style links resolve across the whole document, so every block is
+    # rendered with the full set of definitions appended
+    return '\n'.join(_LINK_DEF_LINE_RE.findall(text))
+
+
+def fingerprint(source, salt=''):
+    return hashlib.blake2b(f'{salt}\0{source}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def convert_block(converter, source, definitions):
+    try:
+        return converter.convert(f'{source}\n\n{definitions}' if definitions else source)
+    except Exception:
+        # A block the converter chokes on (e.g. malformed LaTeX) should not take
+        # the rest of the document down with it
+        return f'<pre>{html.escape(source)}</pre>'
+
+
+class Block:
+    __slots__ = ('id', 'line', 'source', 'hash', 'html')
+
+    def __init__(self, block_id, line, source, block_hash, block_html):
+        self.id = block_id
+        self.line = line
+        self.source = source
+        self.hash = block_hash
+        self.html = block_html
+
+    def wrapped(self):
+        return f'<div class="md-block" id="{self.id}">{self.html}</div>'
+
+
+class IncrementalRenderer:
+    def __init__(self, engine=DEFAULT_ENGINE, cache=None, figures=None, pool=None):
+        self.engine = engine_class(engine)
+        self.cache = cache
+        self.figures = figures
+        self.pool = pool
+        self.missing_figures = {}
+        self.blocks = []
+        self.lines = []
+        self.definitions = ''
+        self._next_id = 0
+        self._converter = None
+
+    def reset(self):
+        self.blocks = []
+        self.lines = []
+
+    def body(self):
+        return ''.join(self._emit(block) for block in self.blocks)
+
+    def _emit(self, block):
+        # Figures are inlined on the way out so the cached block HTML stays independent
+        # of which SVGs have been rendered so far
+        if self.figures is None:
+            return block.wrapped()
+        return self.figures.inline(block.wrapped(), self.missing_figures)
+
+    def take_missing_figures(self):
+        missing, self.missing_figures = self.missing_figures, {}
+        return missing
+
+    def html_size(self):
+        return sum(len(block.html) for block in self.blocks)
+
+    def block_at_line(self, line):
+        index = bisect.bisect_right([block.line for block in self.blocks], line)
+        return self.blocks[index - 1] if index else None
+
+    def render_block(self, source, definitions):
+        if self._converter is None:
+            self._converter = self.engine()
+        return convert_block(self._converter, source, definitions)
+
+    def stream(self, text, first=FIRST_PAINT_BLOCKS, size=CHUNK_BLOCKS):
+        """Render text from scratch, yielding the body HTML in chunks.
+
+        The first chunk holds roughly a screenful of blocks so the page can be shown
+        before the rest of the document has been split or rendered. With a cache,
+        a document rendered before is restored without parsing it again.
+        """
+        self.reset()
+        self.lines = text.splitlines()
+        key = self.cache_key(text) if self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+        if cached is None:
+            self.definitions = collect_link_definitions(text)
+            blocks = self._render_all()
+        else:
+            blocks = self._restore(json.loads(cached))
+        chunk = []
+        limit = first
+        for block in blocks:
+            self.blocks.append(block)
+            chunk.append(self._emit(block))
+            if len(chunk) >= limit:
+                yield ''.join(chunk)
+                chunk = []
+                limit = size
+        if chunk or len(self.blocks) < first:
+            yield ''.join(chunk)
+        # Only reached when the whole document was streamed
+        if key and cached is None:
+            self.cache.put(key, self._dump())
+
+    def cache_key(self, text):
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return make_key(RENDERER_VERSION, self.engine.name, self.engine.version(), content_hash)
+
+    def _new_block(self, line, source, block_hash, block_html):
+        block = Block(f'b{self._next_id}', line, source, block_hash, block_html)
+        self._next_id += 1
+        return block
+
+    def _render_all(self):
+        salt = fingerprint(self.definitions)
+        if self.pool is None:
+            for line, source in iter_blocks(self.lines):
+                yield self._new_block(line, source, fingerprint(source, salt), self.render_block(source, self.definitions))
+            return
+        # Splitting is cheap; the conversion is what gets spread over the worker processes
+        pieces = list(iter_blocks(self.lines))
+        rendered = self.pool.render(self.engine.name, [source for _, source in pieces], self.definitions)
+        for (line, source), block_html in zip(pieces, rendered):
+            yield self._new_block(line, source, fingerprint(source, salt), block_html)
+
+    def _restore(self, entry):
+        self.definitions = entry['definitions']
+        for line, count, block_hash, block_html in entry['blocks']:
+            yield self._new_block(line, '\n'.join(self.lines[line:line + count]), block_hash, block_html)
+
+    def _dump(self):
+        blocks = [[block.line, block.source.count('\n') + 1, block.hash, block.html] for block in self.blocks]
+        return json.dumps({'definitions': self.definitions, 'blocks': blocks}, ensure_ascii=False).encode('utf-8')
+
+    def update(self, text):
+        """Re-render only the blocks whose fingerprint changed.
+
+        Returns a list of patch operations ({'remove': [...], 'after': id, 'html': ...})
+        that mdrPatch() applies to the page built from the previous state.
+        """
+        lines = text.splitlines()
+        window = self._changed_window(lines) if self.blocks else None
+        if window is None:
+            pieces = list(iter_blocks(lines))
+            self.definitions = collect_link_definitions(text)
+            low, high = 0, len(self.blocks)
+        else:
+            low, high, pieces = window
+        self.lines = lines
+        salt = fingerprint(self.definitions)
+        return self._patch(low, high, pieces, [fingerprint(source, salt) for _, source in pieces])
+
+    def _changed_window(self, lines):
+        """Re-split only the region around the edited lines.
+
+        Returns (low, high, pieces) where pieces replace self.blocks[low:high], or
+        None when the whole document has to be split again.
+        """
+        old_lines = self.lines
+        first = _common_prefix(old_lines, lines)
+        if first == len(old_lines) == len(lines):
+            return 0, 0, []
+        tail = _common_prefix(old_lines[first:][::-1], lines[first:][::-1])
+        old_end = len(old_lines) - tail
+        new_end = len(lines) - tail
+        if any(_LINK_DEF_RE.match(line) for line in old_lines[first:old_end] + lines[first:new_end]):
+            return None
+
+        # An edit can turn the first line of a block into a continuation of the
+        # previous one, so start from the block before the one containing it
+        starts = [block.line for block in self.blocks]
+        low = max(bisect.bisect_right(starts, first) - 2, 0)
+        shift = new_end - old_end
+        pieces = []
+        high = len(self.blocks)
+        for line, source in iter_blocks(lines, starts[low] if low else 0):
+            if line >= new_end:
+                # Once a block starts where an unchanged old block started, the rest
+                # of the document splits exactly as before
+                index = bisect.bisect_left(starts, line - shift)
+                if index < len(starts) and starts[index] == line - shift:
+                    high = index
+                    break
+            pieces.append((line, source))
+        for block in self.blocks[high:]:
+            block.line += shift
+        return low, high, pieces
+
+    def _patch(self, low, high, pieces, hashes):
+        old = self.blocks[low:high]
+
+        # Trim the common prefix and suffix first so a local edit never runs the
+        # sequence matcher over the whole document
+        prefix = 0
+        limit = min(len(old), len(hashes))
+        while prefix < limit and old[prefix].hash == hashes[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix].hash == hashes[-1 - suffix]:
+            suffix += 1
+
+        old_middle = old[prefix:len(old) - suffix]
+        new_middle = hashes[prefix:len(hashes) - suffix]
+        reusable = {block.hash: block.html for block in old_middle}
+        matcher = difflib.SequenceMatcher(None, [block.hash for block in old_middle], new_middle, autojunk=False)
+
+        blocks = self.blocks[:low + prefix]
+        ops = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                blocks.extend(old_middle[i1:i2])
+                continue
+            inserted = []
+            for index in range(prefix + j1, prefix + j2):
+                line, source = pieces[index]
+                block_html = reusable.get(hashes[index])
+                if block_html is None:
+                    block_html = self.render_block(source, self.definitions)
+                inserted.append(self._new_block(line, source, hashes[index], block_html))
+            ops.append({
+                'remove': [block.id for block in old_middle[i1:i2]],
+                'after': blocks[-1].id if blocks else None,
+                'html': ''.join(self._emit(block) for block in inserted),
+            })
+            blocks.extend(inserted)
+
+        if suffix:
+            blocks.extend(old[len(old) - suffix:])
+
+        # Unchanged blocks inside the window may still have moved within the source
+        for block, (line, _) in zip(blocks[low:], pieces):
+            block.line = line
+        blocks.extend(self.blocks[high:])
+        self.blocks = blocks
+        return ops
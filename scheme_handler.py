@@ -0,0 +1,205 @@
+import mimetypes
+import os
+import re
+import secrets
+
+from PySide6.QtCore import QBuffer, QByteArray, QFile, QIODevice, QUrl, QUrlQuery
+from PySide6.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler
+
+from assets import ASSET_HOST, asset_path
+
+SCHEME = b'mdr'
+LOCAL_HOST = 'local'
+UNC_PREFIX = '/unc/'
+
+# The Windows registry sometimes maps .js to text/plain
+mimetypes.add_type('text/javascript', '.js')
+mimetypes.add_type('font/woff', '.woff')
+
+# Served pages are built from document HTML. Only the page's own scripts (marked
+# with a nonce per publish) and the bundled assets run, so a <script> written in a
+# document does not; images load from anywhere, as they did from file://
+CONTENT_SECURITY_POLICY = ("default-src 'none'; script-src 'nonce-{nonce}' mdr://app 'unsafe-eval'; "
+                           "style-src mdr: 'unsafe-inline'; img-src mdr: file: data: blob: https: http:; "
+                           "font-src mdr: data:; media-src mdr: file: https: http:; connect-src 'self'")
+# Images and media may also come from up to this many folders above the document,
+# e.g. ../images or ../../assets, but never from a whole drive
+MEDIA_LEVELS = 2
+_MEDIA_TYPES = ('image/', 'audio/', 'video/')
+_SCRIPT_TAG_RE = re.compile(r'<script(?=[\s>])', re.I)
+
+
+def secure_page(html, nonce):
+    """html with the CSP and the nonce on the scripts of its head, which the app writes."""
+    head_end = html.find('</head>')
+    if head_end < 0:
+        head, body = '', html
+    else:
+        head, body = html[:head_end], html[head_end:]
+    head = _SCRIPT_TAG_RE.sub(f'<script nonce="{nonce}"', head)
+    meta = f'<meta http-equiv="Content-Security-Policy" content="{CONTENT_SECURITY_POLICY.format(nonce=nonce)}">'
+    if '<head>' in head:
+        # Before any script of the page, so the policy covers all of them
+        return head.replace('<head>', '<head>' + meta, 1) + body
+    return meta + head + body
+
+
+def register_scheme():
+    # Must run before the QApplication is created
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    # Pages fetch their sections, and MathJax loads its fonts from mdr://app into
+    # pages on mdr://local; what a page may read is limited by the handler and the CSP
+    scheme.setFlags(QWebEngineUrlScheme.Flag.LocalAccessAllowed
+                    | QWebEngineUrlScheme.Flag.CorsEnabled
+                    | QWebEngineUrlScheme.Flag.FetchApiAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _is_inside(path, directory):
+    try:
+        return os.path.commonpath([directory, path]) == directory
+    except ValueError:
+        # On another drive
+        return False
+
+
+def local_url(path):
+    # mdr://local/<absolute path> mirrors the file system, so relative image links
+    # resolve as they would next to the markdown file (but see resource_path)
+    url = QUrl.fromLocalFile(os.path.abspath(path))
+    if url.host():
+        # A UNC path (//server/share/...) keeps its server as mdr://local/unc/server/share/...
+        url.setPath(UNC_PREFIX + url.host() + url.path(QUrl.FullyDecoded), QUrl.DecodedMode)
+    url.setScheme(SCHEME.decode())
+    url.setHost(LOCAL_HOST)
+    return url
+
+
+def local_path(url):
+    file_url = QUrl(url)
+    file_url.setScheme('file')
+    file_url.setHost('')
+    file_url.setQuery('')
+    file_url.setFragment('')
+    path = file_url.path(QUrl.FullyDecoded)
+    if path.startswith(UNC_PREFIX):
+        server, _, rest = path[len(UNC_PREFIX):].partition('/')
+        file_url.setHost(server)
+        file_url.setPath('/' + rest, QUrl.DecodedMode)
+    return file_url.toLocalFile()
+
+
+class DocumentSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Serves rendered documents, their sections, local resources and the bundled
+    script assets over mdr://.
+
+    Unlike QWebEngineView.setHtml there is no size limit on a page; pages and
+    sections are handed to the web engine straight from in-memory buffers and
+    local files are streamed from disk. Files inside the folder of a published
+    document are served, and images and media also from the folders above it
+    and from the workspace; nothing else on the disk is.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pages = {}
+        self.sections = {}
+        self.generations = {}
+        self.workspace_root = None
+
+    def publish(self, path, html):
+        key = _key(path)
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+        self.pages[key] = secure_page(html, secrets.token_urlsafe(16)).encode('utf-8')
+        self.sections = {section: data for section, data in self.sections.items() if section[0] != key}
+        url = local_url(path)
+        # A new query per publish keeps the engine from reusing the previous page
+        url.setQuery(f'v={generation}')
+        return url
+
+    def publish_section(self, path, index, html):
+        self.sections[(_key(path), index)] = html.encode('utf-8')
+
+    def withdraw(self, path):
+        key = _key(path)
+        self.pages.pop(key, None)
+        self.sections = {section: data for section, data in self.sections.items() if section[0] != key}
+
+    def resource_path(self, path):
+        """The real path of a file a published document may load, or None."""
+        if not path:
+            return None
+        real_path = os.path.realpath(path)
+        checked = os.path.normcase(real_path)
+        folders = [os.path.normcase(os.path.realpath(os.path.dirname(key))) for key in self.pages]
+        if any(_is_inside(checked, folder) for folder in folders):
+            return real_path
+        mime_type = mimetypes.guess_type(real_path)[0] or ''
+        if not mime_type.startswith(_MEDIA_TYPES):
+            return None
+        if self.workspace_root and _is_inside(checked, os.path.normcase(os.path.realpath(self.workspace_root))):
+            return real_path
+        for folder in folders:
+            for _ in range(MEDIA_LEVELS):
+                parent = os.path.dirname(folder)
+                if os.path.dirname(parent) == parent:
+                    break
+                folder = parent
+            if _is_inside(checked, folder):
+                return real_path
+        return None
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        if url.host() == ASSET_HOST:
+            self._reply_file(job, asset_path(url.path().lstrip('/')))
+            return
+        if url.host() != LOCAL_HOST:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        path = local_path(url)
+        key = _key(path)
+        if key in self.pages:
+            query = QUrlQuery(url)
+            if not query.hasQueryItem('section'):
+                self._reply(job, b'text/html', self.pages[key])
+                return
+            try:
+                index = int(query.queryItemValue('section'))
+            except ValueError:
+                index = -1
+            # Sections are fetched once by the page that asked for them
+            data = self.sections.pop((key, index), None)
+            if data is None:
+                job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            else:
+                self._reply(job, b'text/html', data)
+            return
+        resource = self.resource_path(path)
+        if resource is None:
+            job.fail(QWebEngineUrlRequestJob.Error.RequestDenied)
+            return
+        self._reply_file(job, resource)
+
+    def _reply_file(self, job, path):
+        if not path or not os.path.isfile(path):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        file = QFile(path, job)
+        if not file.open(QIODevice.ReadOnly):
+            job.fail(QWebEngineUrlRequestJob.Error.RequestDenied)
+            return
+        mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        job.reply(mime_type.encode(), file)
+
+    def _reply(self, job, mime_type, data):
+        buffer = QBuffer(job)
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mime_type, buffer)
@@ -0,0 +1,131 @@
+import getpass
+import json
+import os
+import sys
+import time
+
+from PySide6.QtCore import QLockFile, QObject, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from disk_cache import make_key, user_data_dir
+
+# How long a later launch waits for the running window before starting on its own
+CONNECT_TIMEOUT = 500
+REPLY_TIMEOUT = 5000
+# A first launch still starting up holds the lock but is not listening yet
+STARTUP_WAIT = 10000
+
+_ACK = b'ok\n'
+
+
+def server_name():
+    # Per user: on a shared machine every account runs its own window
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = os.path.expanduser('~')
+    return 'MarkdownReader-' + make_key(user)[:16]
+
+
+def encode_message(paths):
+    return json.dumps({'paths': paths}).encode('utf-8') + b'\n'
+
+
+def decode_message(data):
+    try:
+        message = json.loads(data.decode('utf-8'))
+    except ValueError:
+        return []
+    paths = message.get('paths') if isinstance(message, dict) else None
+    return [path for path in paths if isinstance(path, str)] if isinstance(paths, list) else []
+
+
+def forward_paths(paths, name=None, timeout=CONNECT_TIMEOUT):
+    """Hand paths to a running instance; returns False if there is none to take them."""
+    socket = QLocalSocket()
+    socket.connectToServer(name or server_name())
+    if not socket.waitForConnected(timeout):
+        return False
+    if sys.platform == 'win32':
+        # Only the process the user just started may bring a window to the front
+        import ctypes
+        ctypes.windll.user32.AllowSetForegroundWindow(-1)
+    socket.write(encode_message(paths))
+    socket.flush()
+    reply = b''
+    while not reply.endswith(b'\n') and socket.waitForReadyRead(REPLY_TIMEOUT):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return reply == _ACK
+
+
+class InstanceServer(QObject):
+    """Makes the first launch the only window, receiving the files of later launches.
+
+    A lock file decides which launch is first; QLocalServer alone cannot, since
+    on Windows several processes may listen on the same pipe name. Later
+    launches connect, send their command-line paths and exit.
+    """
+    filesReceived = Signal(list)
+
+    def __init__(self, name=None, lock_path=None, parent=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        lock_path = lock_path or user_data_dir(self.name + '.lock')
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        self.lock = QLockFile(lock_path)
+        # The window runs for days; only a dead owner makes the lock stale
+        self.lock.setStaleLockTime(0)
+        self.server = None
+        self.buffers = {}
+
+    def acquire(self, paths, wait=STARTUP_WAIT):
+        """True if this launch should open a window; False once paths were handed over."""
+        deadline = time.monotonic() + wait / 1000
+        while not self.lock.tryLock(0):
+            if forward_paths(paths, self.name):
+                return False
+            if time.monotonic() >= deadline:
+                # The first launch is stuck; run without single-instance support
+                return True
+            time.sleep(0.05)
+        self.listen()
+        return True
+
+    def listen(self):
+        # Holding the lock, any existing socket was left behind by a crash
+        QLocalServer.removeServer(self.name)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.onNewConnection)
+        return self.server.listen(self.name)
+
+    def onNewConnection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b''
+            socket.readyRead.connect(lambda socket=socket: self.onReadyRead(socket))
+            socket.disconnected.connect(lambda socket=socket: self.onDisconnected(socket))
+            if socket.bytesAvailable():
+                self.onReadyRead(socket)
+
+    def onReadyRead(self, socket):
+        if socket not in self.buffers:
+            return
+        self.buffers[socket] += bytes(socket.readAll())
+        if not self.buffers[socket].endswith(b'\n'):
+            return
+        paths = decode_message(self.buffers.pop(socket))
+        socket.write(_ACK)
+        socket.flush()
+        self.filesReceived.emit(paths)
+
+    def onDisconnected(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        self.lock.unlock()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+# Cold start to a painted window, in seconds; --profile-startup fails above it
+STARTUP_BUDGET = 1.5
+
+IMPORTS = '导入模块'
+APPLICATION = '创建应用'
+WINDOW = '构建界面'
+VISIBLE = '窗口可见'
+WEB_ENGINE = 'WebEngine 预热'
+FIRST_RENDER = '首次渲染'
+
+
+def process_started():
+    """When the process was created, on the perf_counter clock, or None if unknown.
+
+    Interpreter startup happens before any of our code runs, so it is only seen
+    by asking the system.
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+            creation, exit_time, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            if not ctypes.windll.kernel32.GetProcessTimes(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(creation),
+                                                          ctypes.byref(exit_time), ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            # FILETIME counts 100 ns intervals since 1601
+            started = ((creation.dwHighDateTime << 32) | creation.dwLowDateTime) / 1e7 - 11644473600
+        elif sys.platform.startswith('linux'):
+            with open('/proc/self/stat') as f:
+                # The command name may contain spaces; fields are counted after it
+                ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+            with open('/proc/uptime') as f:
+                uptime = float(f.read().split()[0])
+            started = time.time() - (uptime - ticks / os.sysconf('SC_CLK_TCK'))
+        else:
+            return None
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    return time.perf_counter() - max(time.time() - started, 0)
+
+
+class StartupProfile:
+    """Timestamps of the startup phases, reported by --profile-startup."""
+
+    def __init__(self, started=None, budget=STARTUP_BUDGET):
+        self.started = started if started is not None else time.perf_counter()
+        self.budget = budget
+        self.marks = []
+
+    def mark(self, name, when=None):
+        if self.elapsed(name) is None:
+            self.marks.append((name, when if when is not None else time.perf_counter()))
+
+    def elapsed(self, name):
+        """Seconds from process start to a phase's end, or None if it has not ended."""
+        for mark, when in self.marks:
+            if mark == name:
+                return when - self.started
+        return None
+
+    def phases(self):
+        """(name, duration, since start) for every phase, in order."""
+        phases = []
+        previous = self.started
+        for name, when in self.marks:
+            phases.append((name, when - previous, when - self.started))
+            previous = when
+        return phases
+
+    def within_budget(self):
+        visible = self.elapsed(VISIBLE)
+        return visible is not None and visible <= self.budget
+
+    def report(self):
+        lines = ['启动分析:']
+        for name, duration, total in self.phases():
+            lines.append(f'  {name}: {duration * 1000:.0f} ms (累计 {total * 1000:.0f} ms)')
+        visible = self.elapsed(VISIBLE)
+        verdict = '通过' if self.within_budget() else '超出预算'
+        shown = f'{visible * 1000:.0f}' if visible is not None else '-'
+        lines.append(f'窗口可见: {shown} ms, 预算 {self.budget * 1000:.0f} ms, {verdict}')
+        return '\n'.join(lines)
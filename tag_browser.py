@@ -0,0 +1,157 @@
+import os
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer, Signal
+from PySide6.QtWidgets import QCheckBox, QDialog, QHBoxLayout, QLabel, QLineEdit, QListView, QPushButton, QVBoxLayout
+
+from tag_store import PAGE_SIZE
+
+
+def tag_label(tag):
+    label = f'{os.path.basename(tag.file)}: {tag.name}'
+    return f'{label} (位置: {tag.position})' if tag.position is not None else label
+
+
+class TagListModel(QAbstractListModel):
+    """Tags matching a filter, read from the TagStore a page at a time.
+
+    Only the rows the view scrolls to are fetched, and each row holds its Tag,
+    so opening the list costs one page whatever the number of tags.
+    """
+    TagRole = Qt.UserRole
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.tags = []
+        self.query = ''
+        self.file = None
+        self.exhausted = True
+
+    def setFilter(self, query='', file=None):
+        self.beginResetModel()
+        self.query = query
+        self.file = file
+        self.tags = self.store.page(self.query, self.file)
+        self.exhausted = len(self.tags) < PAGE_SIZE
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tags)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.tags):
+            return None
+        tag = self.tags[index.row()]
+        if role == Qt.DisplayRole:
+            return tag_label(tag)
+        if role == Qt.ToolTipRole:
+            return tag.file
+        if role == self.TagRole:
+            return tag
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        tags = self.store.page(self.query, self.file, after=self.tags[-1] if self.tags else None)
+        self.exhausted = len(tags) < PAGE_SIZE
+        if tags:
+            self.beginInsertRows(QModelIndex(), len(self.tags), len(self.tags) + len(tags) - 1)
+            self.tags.extend(tags)
+            self.endInsertRows()
+
+    def tag(self, row):
+        return self.tags[row] if 0 <= row < len(self.tags) else None
+
+    def removeTag(self, row):
+        tag = self.tag(row)
+        if tag is None:
+            return None
+        self.store.remove(tag.id)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.tags[row]
+        self.endRemoveRows()
+        return tag
+
+
+class TagBrowser(QDialog):
+    """Lists, filters, opens and deletes tags; replaces the per-tag list widgets."""
+    jumpRequested = Signal(object)
+    tagRemoved = Signal(object)
+
+    def __init__(self, store, current_file=None, current_only=False, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('标签列表')
+        self.store = store
+        self.current_file = current_file
+        self.model = TagListModel(store, self)
+
+        self.filterInput = QLineEdit()
+        self.filterInput.setPlaceholderText('按标签名或文件名筛选...')
+        self.filterInput.textChanged.connect(lambda: self.filterTimer.start())
+        self.currentOnly = QCheckBox('仅当前文件')
+        self.currentOnly.setEnabled(current_file is not None)
+        self.currentOnly.setChecked(current_only and current_file is not None)
+        self.currentOnly.toggled.connect(self.applyFilter)
+        filterRow = QHBoxLayout()
+        filterRow.addWidget(self.filterInput, 1)
+        filterRow.addWidget(self.currentOnly)
+        # Filtering runs a query; wait for a pause in typing
+        self.filterTimer = QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(150)
+        self.filterTimer.timeout.connect(self.applyFilter)
+
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)
+        self.view.setModel(self.model)
+        self.view.activated.connect(lambda index: self.jump())
+        self.countLabel = QLabel()
+
+        jumpButton = QPushButton('跳转到标签位置')
+        jumpButton.clicked.connect(self.jump)
+        deleteButton = QPushButton('删除')
+        deleteButton.clicked.connect(self.removeCurrent)
+        closeButton = QPushButton('关闭')
+        closeButton.clicked.connect(self.close)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.countLabel, 1)
+        buttons.addWidget(jumpButton)
+        buttons.addWidget(deleteButton)
+        buttons.addWidget(closeButton)
+
+        layout = QVBoxLayout()
+        layout.addLayout(filterRow)
+        layout.addWidget(self.view)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.resize(520, 420)
+        self.applyFilter()
+
+    def applyFilter(self):
+        self.filterTimer.stop()
+        file = self.current_file if self.currentOnly.isChecked() else None
+        query = self.filterInput.text()
+        self.model.setFilter(query, file)
+        self.countLabel.setText(f'共 {self.store.count(file, query)} 个标签')
+        if self.model.rowCount():
+            self.view.setCurrentIndex(self.model.index(0))
+
+    def currentTag(self):
+        return self.model.tag(self.view.currentIndex().row())
+
+    def jump(self):
+        tag = self.currentTag()
+        if tag is None:
+            return
+        self.jumpRequested.emit(tag)
+        self.close()
+
+    def removeCurrent(self):
+        tag = self.model.removeTag(self.view.currentIndex().row())
+        if tag is not None:
+            self.countLabel.setText(f'共 {self.store.count(self.model.file, self.model.query)} 个标签')
+            self.tagRemoved.emit(tag)
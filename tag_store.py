@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import sys
+
+# Rows fetched at a time by the tag browser
+PAGE_SIZE = 200
+
+# Legacy tags (plain strings in tags.json) have no position; NULL stands in for it
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, file TEXT NOT NULL, name TEXT NOT NULL, position INTEGER);
+CREATE UNIQUE INDEX IF NOT EXISTS tags_file_name ON tags (file, name, IFNULL(position, -1));
+CREATE INDEX IF NOT EXISTS tags_name ON tags (name);
+CREATE INDEX IF NOT EXISTS tags_file ON tags (file);
+"""
+
+
+def legacy_tag_files():
+    """Where older versions may have left tags.json: the working directory, usually
+    the program's own, and the program's folder (next to the exe when frozen)."""
+    if getattr(sys, 'frozen', False):
+        program_dir = os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        program_dir = os.path.dirname(os.path.abspath(__file__))
+    return {os.path.abspath('tags.json'), os.path.join(program_dir, 'tags.json')}
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _filter(query, file):
+    conditions = []
+    parameters = []
+    if file is not None:
+        conditions.append('file = ?')
+        parameters.append(file)
+    for term in (query or '').split():
+        conditions.append("(name LIKE ? ESCAPE '\\' OR file LIKE ? ESCAPE '\\')")
+        parameters.extend([f'%{_escape_like(term)}%'] * 2)
+    return conditions, parameters
+
+
+class Tag:
+    __slots__ = ('id', 'file', 'name', 'position')
+
+    def __init__(self, tag_id, file, name, position):
+        self.id = tag_id
+        self.file = file
+        self.name = name
+        self.position = position
+
+
+class TagStore:
+    """Tags of every document, in SQLite.
+
+    Each add or remove is one small transaction on an indexed table, so the
+    cost does not grow with the number of tags and a crash cannot leave a
+    half-written file behind, as rewriting tags.json could.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, file, name, position=None):
+        """Store a tag; returns it, or None if the file already has the same one."""
+        with self.connection:
+            cursor = self.connection.execute('INSERT OR IGNORE INTO tags (file, name, position) VALUES (?, ?, ?)',
+                                             (file, name, position))
+        if not cursor.rowcount:
+            return None
+        return Tag(cursor.lastrowid, file, name, position)
+
+    def remove(self, tag_id):
+        with self.connection:
+            return self.connection.execute('DELETE FROM tags WHERE id = ?', (tag_id,)).rowcount > 0
+
+    def get(self, tag_id):
+        row = self.connection.execute('SELECT id, file, name, position FROM tags WHERE id = ?', (tag_id,)).fetchone()
+        return Tag(*row) if row else None
+
+    def tags_for(self, file):
+        return [Tag(*row) for row in
+                self.connection.execute('SELECT id, file, name, position FROM tags WHERE file = ? ORDER BY id', (file,))]
+
+    def tags(self):
+        return [Tag(*row) for row in
+                self.connection.execute('SELECT id, file, name, position FROM tags ORDER BY file, id')]
+
+    def page(self, query=None, file=None, after=None, limit=PAGE_SIZE):
+        """Up to limit tags matching every term of query in name or path, by file.
+
+        after is the last tag of the previous page; paging by (file, id) keeps
+        each page an index range scan however deep the list is scrolled.
+        """
+        conditions, parameters = _filter(query, file)
+        if after is not None:
+            conditions.append('(file, id) > (?, ?)')
+            parameters.extend([after.file, after.id])
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        sql = f'SELECT id, file, name, position FROM tags {where}ORDER BY file, id LIMIT ?'
+        return [Tag(*row) for row in self.connection.execute(sql, [*parameters, limit])]
+
+    def count(self, file=None, query=None):
+        conditions, parameters = _filter(query, file)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return self.connection.execute(f'SELECT COUNT(*) FROM tags{where}', parameters).fetchone()[0]
+
+    def migrate(self, json_path):
+        """Import a tags.json written by older versions, then rename it out of the way.
+
+        Returns the number of tags imported; an unreadable file is left untouched.
+        """
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(legacy, dict):
+            return 0
+        rows = []
+        for file, tags in legacy.items():
+            for tag in tags if isinstance(tags, list) else ():
+                if isinstance(tag, dict):
+                    if tag.get('name'):
+                        rows.append((file, str(tag['name']), tag.get('position')))
+                elif tag:
+                    rows.append((file, str(tag), None))
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany('INSERT OR IGNORE INTO tags (file, name, position) VALUES (?, ?, ?)', rows)
+            imported = self.connection.total_changes - before
+        try:
+            os.replace(json_path, json_path + '.migrated')
+        except OSError:
+            pass
+        return imported
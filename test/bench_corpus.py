@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成 Markdown 语料：按类型和大小生成内容固定的文档，供性能测试使用
+
+同样的类型、大小和种子总是生成同样的文本，不同机器、不同次运行的结果可以直接比较。
+
+用法: python test/bench_corpus.py 输出目录 [--sizes small medium] [--kinds prose tables]
+生成的目录可以直接交给 test/bench_engines.py。
+"""
+
+import argparse
+import os
+import random
+
+# 每种大小的目标字节数；生成的文档在最后一节结束处停下，略大于目标
+SIZES = {
+    "small": 32 * 1024,
+    "medium": 256 * 1024,
+    "large": 1024 * 1024,
+}
+
+WORDS = ("render", "document", "markdown", "reader", "cache", "block", "search", "index", "export", "figure",
+         "latency", "window", "section", "table", "formula", "diagram", "parser", "engine", "thread", "page",
+         "渲染", "文档", "阅读器", "缓存", "分块", "搜索", "索引", "导出", "图形", "公式", "表格", "页面")
+LANGUAGES = ("python", "javascript", "c", "rust", "bash", "json", "")
+SYMBOLS = ("x", "y", "z", "a", "b", "n", "k", "\\alpha", "\\beta", "\\lambda", "\\theta")
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def sentence(rng):
+    text = words(rng, rng.randint(6, 18))
+    roll = rng.random()
+    if roll < 0.15:
+        text += f" **{words(rng, 2)}**"
+    elif roll < 0.3:
+        text += f" `{rng.choice(WORDS)}()`"
+    elif roll < 0.4:
+        text += f" [{rng.choice(WORDS)}](https://example.com/{rng.randint(1, 999)})"
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng, sentences=None):
+    return " ".join(sentence(rng) for _ in range(sentences or rng.randint(2, 6)))
+
+
+def heading(rng, index, level=2):
+    return f"{'#' * level} {index}. {words(rng, rng.randint(2, 5))}"
+
+
+def prose_section(rng, index):
+    parts = [heading(rng, index)]
+    for _ in range(rng.randint(2, 4)):
+        parts.append(paragraph(rng))
+    if rng.random() < 0.5:
+        parts.append("\n".join(f"- {sentence(rng)}" for _ in range(rng.randint(3, 6))))
+    return "\n\n".join(parts)
+
+
+def table_section(rng, index):
+    columns = rng.randint(6, 10)
+    header = "| " + " | ".join(f"{rng.choice(WORDS)} {column}" for column in range(columns)) + " |"
+    rule = "|" + "---|" * columns
+    rows = []
+    for row in range(rng.randint(200, 400)):
+        cells = [str(row)] + [rng.choice((words(rng, rng.randint(1, 3)), str(rng.randint(0, 100000)),
+                                          f"{rng.random():.4f}")) for _ in range(columns - 1)]
+        rows.append("| " + " | ".join(cells) + " |")
+    return "\n\n".join([heading(rng, index), paragraph(rng, 1), "\n".join([header, rule, *rows])])
+
+
+def code_section(rng, index):
+    parts = [heading(rng, index)]
+    for _ in range(rng.randint(3, 6)):
+        parts.append(paragraph(rng, 1))
+        lines = []
+        for line in range(rng.randint(5, 30)):
+            indent = "    " * rng.randint(0, 3)
+            lines.append(f"{indent}{rng.choice(WORDS)}_{line} = {rng.choice(WORDS)}({rng.randint(0, 99)})  # {words(rng, 3)}")
+        parts.append(f"```{rng.choice(LANGUAGES)}\n" + "\n".join(lines) + "\n```")
+    return "\n\n".join(parts)
+
+
+def formula(rng, terms):
+    parts = []
+    for _ in range(terms):
+        symbol = rng.choice(SYMBOLS)
+        shape = rng.randint(0, 3)
+        if shape == 0:
+            parts.append(f"{symbol}^{{{rng.randint(2, 9)}}}")
+        elif shape == 1:
+            parts.append(f"\\frac{{{symbol}}}{{{rng.randint(1, 9)} + {rng.choice(SYMBOLS)}}}")
+        elif shape == 2:
+            parts.append(f"\\sqrt{{{symbol} + {rng.randint(1, 99)}}}")
+        else:
+            parts.append(f"\\sum_{{i=1}}^{{{rng.randint(2, 50)}}} {symbol}_i")
+    return " + ".join(parts)
+
+
+def math_section(rng, index):
+    parts = [heading(rng, index)]
+    for _ in range(rng.randint(3, 6)):
+        inline = ", ".join(f"${formula(rng, rng.randint(1, 2))}$" for _ in range(rng.randint(2, 5)))
+        parts.append(f"{sentence(rng)} {inline} {sentence(rng)}")
+        parts.append(f"$$\n{formula(rng, rng.randint(2, 5))}\n$$")
+    return "\n\n".join(parts)
+
+
+def mermaid_section(rng, index):
+    parts = [heading(rng, index)]
+    for _ in range(rng.randint(2, 4)):
+        parts.append(paragraph(rng, 1))
+        nodes = rng.randint(4, 12)
+        edges = [f"    N{rng.randrange(node)} -->|{rng.choice(WORDS)}| N{node}[{words(rng, 2)}]" for node in range(1, nodes)]
+        parts.append("```mermaid\ngraph TD\n    N0[" + rng.choice(WORDS) + "]\n" + "\n".join(edges) + "\n```")
+    return "\n\n".join(parts)
+
+
+def nesting_section(rng, index):
+    depth = rng.randint(6, 12)
+    lines = []
+    for level in range(depth):
+        lines.append(f"{'  ' * level}- {sentence(rng)}")
+        if rng.random() < 0.3:
+            lines.append(f"{'  ' * (level + 1)}1. {sentence(rng)}")
+    quotes = [f"{'> ' * (level + 1)}{sentence(rng)}\n{'>' * (level + 1)}" for level in range(rng.randint(4, 10))]
+    return "\n\n".join([heading(rng, index), "\n".join(lines), "\n".join(quotes), paragraph(rng, 2)])
+
+
+KINDS = {
+    "prose": prose_section,
+    "tables": table_section,
+    "code": code_section,
+    "math": math_section,
+    "mermaid": mermaid_section,
+    "nesting": nesting_section,
+}
+
+
+def generate(kind, size, seed=0):
+    """A document of one kind, at least size bytes (or one of the SIZES names) of UTF-8."""
+    size = SIZES.get(size, size)
+    rng = random.Random(f"{kind}-{seed}")
+    section = KINDS[kind]
+    parts = [f"# {kind} {size}\n\n{paragraph(rng)}"]
+    total = len(parts[0].encode("utf-8"))
+    index = 1
+    while total < size:
+        part = section(rng, index)
+        parts.append(part)
+        total += len(part.encode("utf-8")) + 2
+        index += 1
+    return "\n\n".join(parts) + "\n"
+
+
+def write_corpus(directory, sizes=("small",), kinds=tuple(KINDS), seed=0):
+    """Write one document per kind and size as directory/<size>/<kind>.md; returns the paths."""
+    paths = []
+    for size in sizes:
+        os.makedirs(os.path.join(directory, size), exist_ok=True)
+        for kind in kinds:
+            path = os.path.join(directory, size, f"{kind}.md")
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(generate(kind, size, seed))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 Markdown 语料")
+    parser.add_argument("directory", help="输出目录")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in write_corpus(args.directory, args.sizes, args.kinds, args.seed):
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
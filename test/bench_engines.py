@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染引擎对比：在同一语料上比较各引擎的吞吐量 (MB/s) 和峰值内存
+
+用法: python test/bench_engines.py [文件或目录 ...] [--repeat N]
+不指定语料时使用 test/test.md 重复拼接成的约 256 KB 文档。
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engines import ENGINES, available_engines
+from renderer import IncrementalRenderer
+
+
+def load_corpus(paths):
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                documents.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".md"))
+        else:
+            documents.append(path)
+    texts = []
+    for path in documents:
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def default_corpus():
+    with open(os.path.join(os.path.dirname(__file__), "test.md"), "r", encoding="utf-8") as f:
+        sample = f.read()
+    return [sample * max(1, (256 * 1024) // max(len(sample.encode("utf-8")), 1))]
+
+
+def measure(convert, texts, repeat):
+    """返回 (MB/s, 峰值内存 MB)，取多次运行中最快的一次"""
+    size = sum(len(text.encode("utf-8")) for text in texts)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            convert(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    for text in texts:
+        convert(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / (1024 * 1024) / best, peak / (1024 * 1024)
+
+
+def run(texts, repeat):
+    results = []
+    for name in available_engines():
+        print(f"正在测试 {name}...", file=sys.stderr, flush=True)
+        engine = ENGINES[name]()
+        # 整篇转换：引擎本身的速度；分块：阅读器实际使用的增量渲染路径
+        whole = measure(engine.convert, texts, repeat)
+        blocks = measure(lambda text: "".join(IncrementalRenderer(name).stream(text)), texts, repeat)
+        results.append((name, ENGINES[name].version(), whole, blocks))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染引擎对比")
+    parser.add_argument("paths", nargs="*", help="Markdown 文件或目录")
+    parser.add_argument("--repeat", type=int, default=3, help="每个引擎的运行次数")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.paths) if args.paths else default_corpus()
+    size = sum(len(text.encode("utf-8")) for text in texts) / (1024 * 1024)
+    print(f"语料: {len(texts)} 个文档, {size:.2f} MB")
+    print(f"{'引擎':<16}{'版本':<12}{'整篇 MB/s':>12}{'整篇峰值MB':>14}{'分块 MB/s':>12}{'分块峰值MB':>14}")
+    for name, version, whole, blocks in sorted(run(texts, args.repeat), key=lambda result: -result[2][0]):
+        print(f"{name:<16}{version:<12}{whole[0]:>12.2f}{whole[1]:>14.1f}{blocks[0]:>12.2f}{blocks[1]:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能测试：在合成语料上测量渲染吞吐量、峰值内存、导出耗时和搜索耗时，并与基线比较
+
+用法: python test/bench_suite.py [--sizes small medium] [--kinds ...] [--repeat N] [--runs N]
+                                 [--threshold 0.5] [--update-baseline]
+无需窗口或 WebEngine。任一指标比基线差出阈值以上、重新测量后仍然如此时以状态码 1 退出。
+基线 (test/bench_baseline.json) 与机器有关，换机器后先用 --runs 3 --update-baseline 重新生成。
+DOCX 导出需要 Pandoc，找不到时跳过。
+每项先预热一次，再取多次运行的中位数；进程内的工作按 CPU 时间计，调用 Pandoc 的按实际经过的时间计。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_corpus import KINDS, SIZES, write_corpus
+from document_search import DocumentSearch
+from engines import DEFAULT_ENGINE
+from html_export import HtmlExporter
+from renderer import IncrementalRenderer
+from workspace_index import WorkspaceIndex
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+# 比基线慢（或吞吐量低）超过这个比例，且差值超过指标的下限，才算作退步。
+# 共享的虚拟机上两次运行可相差四成，默认值只抓明显的退步；在安静的机器上可以用 --threshold 收紧
+THRESHOLD = 0.5
+
+# 指标: (名称, 是否越大越好, 不算退步的最大绝对差值)；几毫秒的差别主要是噪声
+METRICS = {
+    "render_mb_s": ("渲染吞吐量 MB/s", True, 0.02),
+    "first_screen_ms": ("首屏渲染 ms", False, 20.0),
+    "peak_mb": ("峰值内存 MB", False, 1.0),
+    "html_ms": ("导出 HTML ms", False, 20.0),
+    "docx_ms": ("导出 DOCX ms", False, 50.0),
+    "search_index_ms": ("建立搜索索引 ms", False, 20.0),
+    "search_ms": ("文档搜索 ms", False, 20.0),
+    "workspace_index_ms": ("建立工作区索引 ms", False, 20.0),
+    "workspace_search_ms": ("工作区搜索 ms", False, 20.0),
+}
+SEARCH_TERMS = ("render", "阅读器", "cache block")
+
+
+def median_time(action, repeat, clock=time.process_time):
+    """预热一次后多次运行的中位数，单位毫秒"""
+    action()
+    times = []
+    for _ in range(repeat):
+        start = clock()
+        action()
+        times.append(clock() - start)
+    return statistics.median(times) * 1000
+
+
+def peak_memory(action):
+    """(峰值内存 MB, action 的返回值)"""
+    tracemalloc.start()
+    try:
+        value = action()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024), value
+
+
+def render(engine, text):
+    renderer = IncrementalRenderer(engine)
+    "".join(renderer.stream(text))
+    return renderer
+
+
+def pandoc_converter():
+    """转换一个文件为 DOCX 的函数，与阅读器走同一条路径；没有 Pandoc 时为 None"""
+    from conversion_jobs import ConversionJob, run_pandoc_process, write_arguments
+    from pandoc_server import pandoc_executable
+    if not os.path.isfile(pandoc_executable()):
+        return None
+
+    def convert(input_file, output_file):
+        job = ConversionJob(0, input_file, output_file, "docx")
+        run_pandoc_process(job, [input_file, *write_arguments(job)])
+    return convert
+
+
+def measure_document(path, engine, repeat, convert_docx):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    size = len(text.encode("utf-8")) / (1024 * 1024)
+    result = {}
+    # 第一次运行要编译正则、加载引擎的扩展；median_time 的预热不计入结果
+    render_ms = median_time(lambda: render(engine, text), repeat)
+    result["render_mb_s"] = size / (render_ms / 1000)
+    result["first_screen_ms"] = median_time(lambda: next(IncrementalRenderer(engine).stream(text)), repeat)
+    result["peak_mb"], renderer = peak_memory(lambda: render(engine, text))
+
+    output = os.path.join(os.path.dirname(path), "output")
+    exporter = HtmlExporter(engine)
+    result["html_ms"] = median_time(lambda: exporter.export(path, output + ".html"), repeat)
+    if convert_docx is not None:
+        result["docx_ms"] = median_time(lambda: convert_docx(path, output + ".docx"), repeat, time.perf_counter)
+
+    blocks = renderer.blocks
+    result["search_index_ms"] = median_time(lambda: DocumentSearch(blocks), repeat)
+    search = DocumentSearch(blocks)
+
+    def find_all():
+        for term in SEARCH_TERMS:
+            search.find(term)
+        search.find(r"\d+\.\d+", regex=True)
+    result["search_ms"] = median_time(find_all, repeat)
+    return result
+
+
+def measure_workspace(root, repeat):
+    """整个语料目录：从零建立全文索引，再搜索；第一次建立索引是预热"""
+    index_times = []
+    for attempt in range(repeat + 1):
+        db_path = os.path.join(os.path.dirname(root), f"index-{attempt}.sqlite")
+        index = WorkspaceIndex(db_path, root)
+        try:
+            start = time.process_time()
+            index.update()
+            if attempt:
+                index_times.append((time.process_time() - start) * 1000)
+            if attempt == repeat:
+                search_ms = median_time(lambda: [index.search(term) for term in SEARCH_TERMS], repeat)
+        finally:
+            index.close()
+    return {"workspace_index_ms": statistics.median(index_times), "workspace_search_ms": search_ms}
+
+
+def run(sizes, kinds, repeat, engine=DEFAULT_ENGINE):
+    results = {}
+    convert_docx = pandoc_converter()
+    if convert_docx is None:
+        print("未找到 Pandoc，跳过 DOCX 导出", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus")
+        for size in sizes:
+            for path in write_corpus(corpus, [size], kinds):
+                kind = os.path.splitext(os.path.basename(path))[0]
+                print(f"正在测试 {kind}/{size}...", file=sys.stderr, flush=True)
+                # 每个文档单独一个目录，导出的文件不会进入工作区索引
+                document_dir = os.path.join(directory, "documents", size, kind)
+                os.makedirs(document_dir)
+                document = os.path.join(document_dir, os.path.basename(path))
+                os.replace(path, document)
+                results[f"{kind}/{size}"] = measure_document(document, engine, repeat, convert_docx)
+                os.replace(document, path)
+            print(f"正在测试 workspace/{size}...", file=sys.stderr, flush=True)
+            results[f"workspace/{size}"] = measure_workspace(os.path.join(corpus, size), repeat)
+    return {key: {name: round(value, 3) for name, value in metrics.items()} for key, metrics in results.items()}
+
+
+def median_results(runs):
+    """几次完整运行中每个指标的中位数，避免一次运行碰上机器特别快或特别慢的时段"""
+    return {key: {name: round(statistics.median(run[key][name] for run in runs), 3) for name in metrics}
+            for key, metrics in runs[0].items()}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """与基线比较，返回退步的指标 [(用例, 指标, 基线, 当前)]；基线中没有的指标不比较。
+    差出 threshold 的比例且差值超过指标的下限才算退步"""
+    regressions = []
+    for key, metrics in results.items():
+        for name, value in metrics.items():
+            base = baseline.get(key, {}).get(name)
+            if base is None or name not in METRICS:
+                continue
+            _, higher_is_better, noise = METRICS[name]
+            if abs(value - base) <= noise:
+                continue
+            if (value < base * (1 - threshold)) if higher_is_better else (value > base * (1 + threshold)):
+                regressions.append((key, name, base, value))
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("results", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(path, results, engine):
+    # 只更新这次测量到的用例，其余保留
+    merged = load_baseline(path)
+    for key, metrics in results.items():
+        merged[key] = metrics
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        json.dump({"engine": engine, "results": dict(sorted(merged.items()))}, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def print_results(results, baseline):
+    for key, metrics in results.items():
+        print(key)
+        for name, value in metrics.items():
+            base = baseline.get(key, {}).get(name)
+            change = f" (基线 {base:.2f}, {(value - base) / base * 100:+.0f}%)" if base else ""
+            print(f"  {METRICS[name][0]}: {value:.2f}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成语料性能测试")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--repeat", type=int, default=5, help="每项预热后的运行次数，取中位数")
+    parser.add_argument("--runs", type=int, default=1, help="完整运行的次数，取每个指标的中位数；生成基线时建议 3")
+    parser.add_argument("--engine", default=DEFAULT_ENGINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="允许比基线差的比例")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="把这次的结果写入基线")
+    args = parser.parse_args()
+
+    results = median_results([run(args.sizes, args.kinds, args.repeat, args.engine) for _ in range(args.runs)])
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+    if args.update_baseline:
+        save_baseline(args.baseline, results, args.engine)
+        print(f"已更新基线: {args.baseline}")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        # 机器忽快忽慢时一次运行也会超出阈值；重新测量这些用例，两次都退步才报告
+        print("重新测量退步的用例...", file=sys.stderr)
+        keys = {key for key, *_ in regressions}
+        kinds = [kind for kind in args.kinds if any(key.startswith(kind + "/") for key in keys)]
+        if any(key.startswith("workspace/") for key in keys):
+            kinds = args.kinds
+        sizes = [size for size in args.sizes if any(key.endswith("/" + size) for key in keys)]
+        again = run(sizes, kinds, args.repeat, args.engine)
+        regressed = {(key, name) for key, name, *_ in regressions}
+        regressions = [regression for regression in compare(again, baseline, args.threshold)
+                       if regression[:2] in regressed]
+    if not baseline:
+        print("没有基线，未做比较；使用 --update-baseline 生成")
+    for key, name, base, value in regressions:
+        print(f"❌ {key} {METRICS[name][0]}: {base:.2f} -> {value:.2f}")
+    if regressions:
+        return 1
+    print("✅ 未发现性能退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from ast_cache import AstCache
+from conversion_jobs import DONE, EXPORT_FORMATS, ConversionQueue
+from disk_cache import DiskCache
+
+
+class AstServer:
+    """代替 pandoc server：解析得到假的 AST，写出时记录输入格式"""
+
+    def __init__(self):
+        self.parses = 0
+        self.lock = threading.Lock()
+
+    def convert(self, request):
+        if request["to"] == "json":
+            with self.lock:
+                self.parses += 1
+            time.sleep(0.1)
+            return json.dumps({"blocks": request["text"]}).encode()
+        return f"{request['from']} -> {request['to']}".encode()
+
+
+def test_export_all_formats():
+    """同时导出全部格式时文档只解析一次，各格式都从 AST 写出"""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "doc.md")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("# 标题\n")
+        server = AstServer()
+        cache = AstCache(DiskCache(os.path.join(directory, "ast")), executable=os.path.join(directory, "pandoc"))
+        queue = ConversionQueue(server, workers=len(EXPORT_FORMATS), ast_cache=cache)
+        try:
+            jobs = [queue.submit(source, os.path.join(directory, f"doc.{format}"), format) for format in EXPORT_FORMATS]
+            for job in jobs:
+                job.future.result(5)
+                assert job.state == DONE, job.message
+                with open(job.output_file, "rb") as f:
+                    assert f.read() == f"json -> {job.format_type}".encode()
+            assert server.parses == 1
+
+            # 内容不变时再次导出直接使用缓存的 AST
+            queue.submit(source, os.path.join(directory, "again.docx"), "docx").future.result(5)
+            assert server.parses == 1
+            with open(source, "a", encoding="utf-8") as f:
+                f.write("\n正文\n")
+            queue.submit(source, os.path.join(directory, "changed.docx"), "docx").future.result(5)
+            print(f"解析 {server.parses} 次，导出 {len(queue.jobs)} 个文件")
+            assert server.parses == 2
+        finally:
+            queue.shutdown()
+
+
+if __name__ == "__main__":
+    test_export_all_formats()
+    print("✅ AST 缓存测试通过")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_corpus import KINDS, generate, write_corpus
+from bench_suite import compare, load_baseline, median_results, save_baseline
+
+
+def test_corpus_is_deterministic():
+    """同样的类型、大小和种子生成同样的文档，且不小于目标大小"""
+    for kind in KINDS:
+        text = generate(kind, 8 * 1024)
+        assert text == generate(kind, 8 * 1024)
+        assert text != generate(kind, 8 * 1024, seed=1)
+        assert 8 * 1024 <= len(text.encode("utf-8")) < 64 * 1024
+    assert "|---|" in generate("tables", 4096)
+    assert "```mermaid" in generate("mermaid", 4096)
+    assert "$$" in generate("math", 4096)
+    assert "          - " in generate("nesting", 4096) and "> > > > " in generate("nesting", 4096)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, ["small"], ["prose", "code"])
+        assert [os.path.relpath(path, directory) for path in paths] == [os.path.join("small", "prose.md"),
+                                                                        os.path.join("small", "code.md")]
+
+
+def test_compare_with_baseline():
+    """超出阈值且超出绝对下限的退步才报告；吞吐量越大越好，耗时越小越好"""
+    baseline = {"prose/small": {"render_mb_s": 1.0, "html_ms": 100.0, "search_ms": 0.5}}
+    assert compare({"prose/small": {"render_mb_s": 0.8, "html_ms": 120.0, "search_ms": 1.2}}, baseline, 0.25) == []
+    # 慢了几十倍但只差十几毫秒，仍是噪声
+    assert compare({"prose/small": {"search_ms": 15.0}}, baseline, 0.25) == []
+    regressions = compare({"prose/small": {"render_mb_s": 0.7, "html_ms": 130.0, "search_ms": 0.1},
+                           "math/small": {"html_ms": 1000.0}}, baseline, 0.25)
+    assert regressions == [("prose/small", "render_mb_s", 1.0, 0.7), ("prose/small", "html_ms", 100.0, 130.0)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "baseline.json")
+        assert load_baseline(path) == {}
+        save_baseline(path, baseline, "markdown2")
+        save_baseline(path, {"math/small": {"html_ms": 300.0}}, "markdown2")
+        assert load_baseline(path) == {**baseline, "math/small": {"html_ms": 300.0}}
+
+
+def test_median_of_runs():
+    """多次完整运行按指标分别取中位数"""
+    runs = [{"prose/small": {"html_ms": value, "search_ms": 1.0 / value}} for value in (30.0, 10.0, 20.0)]
+    assert median_results(runs) == {"prose/small": {"html_ms": 20.0, "search_ms": 0.05}}
+
+
+if __name__ == "__main__":
+    test_corpus_is_deterministic()
+    test_compare_with_baseline()
+    test_median_of_runs()
+    print("✅ 性能测试工具测试通过")
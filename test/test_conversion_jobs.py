@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from conversion_jobs import CANCELLED, DONE, FAILED, RUNNING, ConversionQueue
+from html_export import HtmlExporter
+from pandoc_server import pandoc_executable
+
+
+class SlowServer:
+    """代替 pandoc server：转换一直等到 release 被设置"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def convert(self, request):
+        self.started.set()
+        self.release.wait(5)
+        return request["to"].encode()
+
+
+def test_cancel_and_retry():
+    """排队中的任务立即取消；运行中的任务取消后不写出文件；取消的任务可以重试"""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "doc.md")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("# 标题\n")
+        server = SlowServer()
+        queue = ConversionQueue(server, workers=1)
+        try:
+            running = queue.submit(source, os.path.join(directory, "a.docx"), "docx")
+            queued = queue.submit(source, os.path.join(directory, "b.html"), "html")
+            assert server.started.wait(5) and running.state == RUNNING
+
+            queue.cancel(queued.id)
+            assert queued.state == CANCELLED
+            queue.cancel(running.id)
+            server.release.set()
+            running.future.result(5)
+            assert running.state == CANCELLED and not os.path.exists(running.output_file)
+
+            queue.retry(queued.id)
+            queued.future.result(5)
+            print(f"重试后状态: {queued.state}, 第 {queued.attempts} 次尝试")
+            assert queued.state == DONE and queued.progress == 100
+            with open(queued.output_file, "rb") as f:
+                assert f.read() == b"html"
+
+            queue.clear_finished()
+            assert not queue.jobs
+        finally:
+            queue.shutdown()
+
+
+def test_missing_file_is_not_missing_pandoc():
+    """只有找不到 Pandoc 时才报告“Pandoc未安装”；缺少输入文件或输出目录时显示实际错误"""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "doc.md")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("# 标题\n")
+        queue = ConversionQueue(workers=1, html_exporter=HtmlExporter())
+        try:
+            deleted = queue.submit(os.path.join(directory, "deleted.md"), os.path.join(directory, "a.html"), "html")
+            no_folder = queue.submit(source, os.path.join(directory, "missing", "b.html"), "html")
+            docx = queue.submit(source, os.path.join(directory, "c.docx"), "docx")
+            for job in (deleted, no_folder, docx):
+                job.future.result(30)
+            print(deleted.message, no_folder.message, docx.message, sep="\n")
+            assert deleted.state == FAILED and "deleted.md" in deleted.message and "Pandoc" not in deleted.message
+            assert no_folder.state == FAILED and "Pandoc" not in no_folder.message
+            if not os.path.isfile(pandoc_executable()):
+                assert docx.state == FAILED and docx.message == "Pandoc未安装"
+        finally:
+            queue.shutdown()
+
+
+if __name__ == "__main__":
+    test_cancel_and_retry()
+    test_missing_file_is_not_missing_pandoc()
+    print("✅ 转换队列测试通过")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from document_search import DocumentSearch, SearchError, block_text
+from renderer import Block, IncrementalRenderer
+
+DOCUMENT = """# Search 搜索
+
+第一段提到 search 两次：SEARCH。
+
+```python
+x = "search &amp; <code>"
+```
+
+$$search^2$$
+
+```mermaid
+graph TD; search-->B
+```
+"""
+
+
+def test_block_text():
+    """搜索文本与页面的 textContent 一致：实体已解码，公式和图表不计入"""
+    assert block_text('<p>a &amp; <b>b</b></p>') == "a & b"
+    assert block_text('<pre><code>\nx</code></pre>') == "\nx"
+    assert block_text('<pre>\nx</pre>') == "x"
+    assert block_text('<span class="mdr-math"><math><mi>x</mi></math></span> y') == " y"
+
+
+def test_document_search():
+    """统计匹配数、支持正则和大小写，匹配按块给出偏移"""
+    renderer = IncrementalRenderer()
+    "".join(renderer.stream(DOCUMENT))
+    index = DocumentSearch(renderer.blocks)
+
+    matches = index.find("search")
+    print(f"匹配: {matches}")
+    assert len(matches) == 4
+    assert len(index.find("search", case=True)) == 2
+    assert len(index.find(r"s\w+h", regex=True)) == 4
+    for match in matches:
+        block, start, end = index.locate(match)
+        assert index.block_text(block)[start:end].lower() == "search"
+    assert index.line(matches[-1]) == 4
+    assert index.nearest(matches, 3) == 3
+    highlights = index.highlights(matches)
+    assert sum(len(spans) for spans in highlights.values()) == 4
+
+    try:
+        index.find("(", regex=True)
+        assert False, "无效的正则应报错"
+    except SearchError:
+        pass
+
+    # 重新建立索引时未改变的块复用已提取的文本
+    renderer.update(DOCUMENT + "\n新增 search\n")
+    updated = DocumentSearch(renderer.blocks, index)
+    assert len(updated.find("search")) == 5
+
+
+def test_large_document():
+    """10 MB 文档的搜索保持在交互可接受的时间内"""
+    paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit 渲染 search engine."
+    count = 10 * 1024 * 1024 // len(paragraph.encode("utf-8"))
+    blocks = [Block(f"b{number}", number * 2, paragraph, str(number), f"<p>{paragraph}</p>\n") for number in range(count)]
+    start = time.perf_counter()
+    index = DocumentSearch(blocks)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    found = len(index.find("SEARCH"))
+    searched = time.perf_counter() - start
+    start = time.perf_counter()
+    regex_found = len(index.find(r"search\s+engine", regex=True))
+    regex_searched = time.perf_counter() - start
+    print(f"{count} 个块: 建立索引 {built * 1000:.0f} ms, 搜索 {searched * 1000:.0f} ms ({found} 处), "
+          f"正则 {regex_searched * 1000:.0f} ms")
+    assert found == regex_found == count
+    assert searched < 1
+
+
+if __name__ == "__main__":
+    test_block_text()
+    test_document_search()
+    test_large_document()
+    print("✅ 文档内搜索测试通过")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engines import ENGINES, available_engines, engine_class
+from renderer import IncrementalRenderer
+
+DOCUMENT = """| 列1 | 列2 |
+|-----|-----|
+| $x_1$ | 2 |
+
+```python
+print(1 < 2)
+```
+
+```mermaid
+graph TD; A-->B
+```
+
+$$
+E = mc^2
+$$
+"""
+
+
+def test_engines():
+    """每个已安装的引擎都支持表格、代码块、公式和 Mermaid，并输出相同的标记"""
+    names = available_engines()
+    print(f"可用引擎: {names}")
+    assert "markdown2" in names
+    for name in names:
+        renderer = IncrementalRenderer(name)
+        html = "".join(renderer.stream(DOCUMENT))
+        assert "<table>" in html and "<td>" in html, name
+        assert "print" in html and "&lt;" in html, name
+        assert '<div class="mermaid">graph TD; A--&gt;B' in html, name
+        assert 'data-tex="eF8x" data-display="inline"' in html, name
+        assert 'data-display="block"><math' in html, name
+
+
+def test_unknown_engine():
+    """未知或未安装的引擎回退到 markdown2"""
+    assert engine_class("不存在") is ENGINES["markdown2"]
+
+
+if __name__ == "__main__":
+    test_engines()
+    test_unknown_engine()
+    print("✅ 渲染引擎测试通过")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from conversion_jobs import DONE, ConversionQueue
+from export_cache import ExportCache
+
+# 模拟 pandoc：只回答 --version
+FAKE_PANDOC = """#!%s
+print('pandoc %s')
+"""
+
+
+class CountingServer:
+    """代替 pandoc server：记录转换次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def convert(self, request):
+        self.calls += 1
+        return f"{request['to']} #{self.calls}".encode()
+
+
+def fake_pandoc(directory, version):
+    path = os.path.join(directory, f"pandoc-{version}")
+    with open(path, "w") as f:
+        f.write(FAKE_PANDOC % (sys.executable, version))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def test_export_cache():
+    """输入、引用的图片、格式或 pandoc 版本不变时复用上次的输出"""
+    if sys.platform == "win32":
+        print("模拟的 pandoc 依赖 shebang 脚本，Windows 下跳过")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "doc.md")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("# 标题\n\n![图](a.png)\n")
+        image = os.path.join(directory, "a.png")
+        with open(image, "wb") as f:
+            f.write(b"PNG1")
+        cache = ExportCache(os.path.join(directory, "cache"), executable=fake_pandoc(directory, "3.7.0.2"))
+        server = CountingServer()
+        queue = ConversionQueue(server, workers=1, export_cache=cache)
+
+        def export(name, format_type="docx"):
+            job = queue.submit(source, os.path.join(directory, name), format_type)
+            job.future.result(5)
+            assert job.state == DONE, job.message
+            with open(job.output_file, "rb") as f:
+                return f.read()
+
+        try:
+            assert export("a.docx") == b"docx #1"
+            assert export("b.docx") == b"docx #1" and server.calls == 1
+            assert export("c.html", "html") == b"html #2"
+
+            # 引用的图片变化时重新转换
+            with open(image, "wb") as f:
+                f.write(b"PNG2")
+            assert export("d.docx") == b"docx #3"
+
+            # pandoc 版本变化时重新转换
+            key = cache.key(source, directory, "docx")
+            other = ExportCache(cache.directory, executable=fake_pandoc(directory, "3.8"))
+            assert other.key(source, directory, "docx") != key
+            print(f"pandoc 调用 {server.calls} 次，缓存占用 {cache.size()} 字节")
+        finally:
+            queue.shutdown()
+
+
+if __name__ == "__main__":
+    test_export_cache()
+    print("✅ 导出缓存测试通过")
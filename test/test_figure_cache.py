@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from disk_cache import DiskCache
+from figures import FigureCache
+from renderer import IncrementalRenderer, build_page
+
+DOCUMENT = """# 流程
+
+```mermaid
+graph TD; A-->B
+```
+
+中间段落
+
+```mermaid
+graph LR; C-->D
+```
+"""
+
+
+def test_figure_cache():
+    """Mermaid 图表：未命中时输出占位符，缓存 SVG 后直接内联且不再加载 mermaid"""
+    with tempfile.TemporaryDirectory() as directory:
+        figures = FigureCache(DiskCache(directory))
+        renderer = IncrementalRenderer(figures=figures)
+        page = build_page("".join(renderer.stream(DOCUMENT)))
+        missing = renderer.take_missing_figures()
+        print(f"未命中的图表: {[source for _, source in missing.values()]}")
+        assert sorted(source.strip() for _, source in missing.values()) == ["graph LR; C-->D", "graph TD; A-->B"]
+        assert page.count('data-figure="') == 2 and '<script src="mdr://app/mermaid' not in page
+        assert renderer.take_missing_figures() == {}
+
+        for key, (kind, source) in missing.items():
+            figures.store(key, f"<svg><text>{kind}:{source.strip()}</text></svg>")
+
+        renderer = IncrementalRenderer(figures=FigureCache(DiskCache(directory)))
+        page = build_page("".join(renderer.stream(DOCUMENT)))
+        assert renderer.take_missing_figures() == {}
+        assert "<svg><text>mermaid:graph TD; A-->B</text></svg>" in page
+        assert 'data-figure="' not in page and '<script src="mdr://app/mermaid' not in page
+
+
+def test_math_cache():
+    """公式：按 TeX 源码和显示模式缓存，命中后直接输出 SVG，不再需要 MathJax"""
+    document = "行内公式 $x_1 * y$ 和 $x_1 * y$\n\n$$\nE = mc^2\n$$\n"
+    with tempfile.TemporaryDirectory() as directory:
+        figures = FigureCache(DiskCache(directory))
+        renderer = IncrementalRenderer(figures=figures)
+        page = build_page("".join(renderer.stream(document)))
+        missing = renderer.take_missing_figures()
+        sources = sorted((source["display"], source["tex"].strip()) for _, source in missing.values())
+        print(f"未命中的公式: {sources}")
+        assert sources == [("block", "E = mc^2"), ("inline", "x_1 * y")]
+        # 未命中时先显示原生 MathML，也不加载 MathJax
+        assert "<math" in page and '<script src="mdr://app/mathjax' not in page
+
+        for key, (kind, source) in missing.items():
+            figures.store(key, f"<svg>{source['display']}</svg>")
+        renderer = IncrementalRenderer(figures=figures)
+        page = build_page("".join(renderer.stream(document)))
+        assert renderer.take_missing_figures() == {}
+        assert page.count('<span class="mdr-math mdr-math-inline"><svg>inline</svg></span>') == 2
+        assert '<span class="mdr-math mdr-math-block"><svg>block</svg></span>' in page
+        assert "<math" not in page
+
+
+if __name__ == "__main__":
+    test_figure_cache()
+    test_math_cache()
+    print("✅ 图表缓存测试通过")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PySide6.QtCore import QObject
+
+from figure_renderer import LOAD_RETRIES, FigureRenderer
+from tracing import TRACER
+
+
+class RecordingPage(QObject):
+    """代替离屏页面，只记录收到的脚本"""
+
+    def __init__(self):
+        super().__init__()
+        self.scripts = []
+
+    def runJavaScript(self, script):
+        self.scripts.append(script)
+
+
+class OfflineRenderer(FigureRenderer):
+    """不启动 WebEngine，由测试决定页面是否加载成功"""
+
+    def __init__(self):
+        super().__init__(figure_cache=None)
+        self.pages = []
+
+    def createPage(self):
+        self.page = RecordingPage()
+        self.pages.append(self.page)
+        self.span = TRACER.span("启动图形页面")
+
+
+def test_failed_page_load():
+    """页面加载失败时重建页面；仍然失败则排队的图形报告失败，之后的请求重新开始"""
+    renderer = OfflineRenderer()
+    failed = []
+    renderer.figureFailed.connect(lambda key, error: failed.append(key))
+    renderer.request({"a": ("mermaid", "graph TD; A-->B"), "b": ("math", "x^2")})
+    assert len(renderer.pages) == 1
+
+    for attempt in range(LOAD_RETRIES):
+        renderer.onPageLoaded(False)
+        assert len(renderer.pages) == attempt + 2 and not failed
+    renderer.onPageLoaded(False)
+    assert sorted(failed) == ["a", "b"]
+    assert renderer.page is None and not renderer.page_ready and not renderer.busy
+    assert not renderer.queue and not renderer.pending
+    assert not any(page.scripts for page in renderer.pages)
+
+    # 下一次请求重新创建页面，加载成功后开始渲染
+    renderer.request({"a": ("mermaid", "graph TD; A-->B")})
+    assert len(renderer.pages) == LOAD_RETRIES + 2
+    renderer.onPageLoaded(True)
+    assert renderer.busy and renderer.page.scripts[0].startswith("mdrRender(")
+
+
+if __name__ == "__main__":
+    test_failed_page_load()
+    print("✅ 图形渲染测试通过")
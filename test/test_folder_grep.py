@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from document_search import SearchError
+from folder_grep import FILES_PER_TASK, FolderGrep
+
+
+def test_folder_grep():
+    """多进程扫描文件夹，按行返回匹配；可以中途取消"""
+    with tempfile.TemporaryDirectory() as directory:
+        count = FILES_PER_TASK * 3 + 5
+        for number in range(count):
+            sub = os.path.join(directory, f"dir{number % 4}")
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f"{number}.md"), "w", encoding="utf-8") as f:
+                f.write(f"# 文档 {number}\n\n普通段落\nTODO: 第 {number} 号 todo 两次\n")
+        with open(os.path.join(directory, "empty.md"), "w") as f:
+            pass
+        with open(os.path.join(directory, "notes.txt"), "w") as f:
+            f.write("TODO\n")
+
+        grep = FolderGrep(workers=2)
+        try:
+            results = dict(grep.search(directory, r"todo:\s+第"))
+            print(f"{len(results)} 个文件匹配")
+            assert len(results) == count
+            assert all(matches == [(3, matches[0][1])] for matches in results.values())
+            assert results[os.path.join(directory, "dir1", "5.md")][0][1] == "TODO: 第 5 号 todo 两次"
+            assert not dict(grep.search(directory, "todo:", case=True))
+
+            cancel = threading.Event()
+            partial = 0
+            for _ in grep.search(directory, "TODO", cancel_event=cancel):
+                partial += 1
+                cancel.set()
+            assert partial < count
+
+            try:
+                list(grep.search(directory, "("))
+                assert False, "无效的正则应报错"
+            except SearchError:
+                pass
+        finally:
+            grep.shutdown()
+
+
+if __name__ == "__main__":
+    test_folder_grep()
+    print("✅ 文件夹查找测试通过")
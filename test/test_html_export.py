@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from disk_cache import DiskCache
+from figures import FigureCache
+from html_export import HtmlExporter
+from renderer import IncrementalRenderer
+
+DOCUMENT = """# 导出
+
+![本地](img/a.png)
+
+![网络](https://example.com/b.png)
+
+```mermaid
+graph TD; A-->B
+```
+"""
+
+
+def test_html_export():
+    """导出的 HTML 内嵌本地图片和已缓存的图表，并复用查看器的渲染缓存"""
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "img"))
+        with open(os.path.join(directory, "img", "a.png"), "wb") as f:
+            f.write(b"PNG")
+        source = os.path.join(directory, "doc.md")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(DOCUMENT)
+        render_cache = DiskCache(os.path.join(directory, "render"))
+        figures = FigureCache(DiskCache(os.path.join(directory, "figures")))
+
+        # 查看器打开过文档：渲染结果和图表 SVG 都已缓存
+        viewer = IncrementalRenderer(cache=render_cache, figures=figures)
+        "".join(viewer.stream(DOCUMENT))
+        for key in viewer.take_missing_figures():
+            figures.store(key, "<svg>diagram</svg>")
+        cached_size = render_cache.size()
+
+        output = os.path.join(directory, "doc.html")
+        HtmlExporter(cache=render_cache, figures=figures).export(source, output)
+        with open(output, encoding="utf-8") as f:
+            page = f.read()
+        print(f"导出 {len(page)} 字节")
+        assert render_cache.size() == cached_size
+        assert f'src="data:image/png;base64,{base64.b64encode(b"PNG").decode()}"' in page
+        assert 'src="https://example.com/b.png"' in page
+        assert "<svg>diagram</svg>" in page and "data-figure" not in page
+        assert "<title>doc</title>" in page
+
+        # 应用内打印 PDF 的页面经 mdr:// 加载图片，不内嵌
+        printed = HtmlExporter(cache=render_cache, figures=figures).render(DOCUMENT, directory, standalone=False)
+        assert 'src="img/a.png"' in printed and "data:image" not in printed
+
+
+if __name__ == "__main__":
+    test_html_export()
+    print("✅ HTML 导出测试通过")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from renderer import IncrementalRenderer, build_page, split_blocks
+
+DOCUMENT = """# 标题
+
+第一段文字。
+
+- 列表项1
+
+- 列表项2
+  续行
+
+```python
+def hello_world():
+
+    print("Hello, World!")
+```
+
+$$
+E = mc^2
+$$
+
+最后一段，引用 [链接][1]。
+
+[1]: https://example.com
+"""
+
+
+def test_split_blocks():
+    """块切分：空行分隔，代码块、公式块和松散列表保持完整"""
+    blocks = split_blocks(DOCUMENT)
+    sources = [source for _, source in blocks]
+    print(f"切分出 {len(blocks)} 个块")
+    assert sources[0] == "# 标题"
+    assert sources[2].startswith("- 列表项1") and sources[2].endswith("续行")
+    assert sources[3].startswith("```python") and sources[3].endswith("```")
+    assert sources[4] == "$$\nE = mc^2\n$$"
+    assert [line for line, _ in blocks][:3] == [0, 2, 4]
+
+
+def test_incremental_update():
+    """单行修改只重新渲染一个块"""
+    renderer = IncrementalRenderer()
+    renderer.update(DOCUMENT)
+    ids = [block.id for block in renderer.blocks]
+    assert 'href="https://example.com"' in renderer.body()
+
+    rendered = []
+    original = renderer.render_block
+    renderer.render_block = lambda source, definitions: rendered.append(source) or original(source, definitions)
+    ops = renderer.update(DOCUMENT.replace("第一段文字。", "第一段文字（已修改）。"))
+    print(f"补丁: {ops}")
+    assert rendered == ["第一段文字（已修改）。"]
+    assert len(ops) == 1 and ops[0]["remove"] == [ids[1]] and ops[0]["after"] == ids[0]
+    assert [block.id for block in renderer.blocks][2:] == ids[2:]
+
+    assert renderer.update(DOCUMENT.replace("第一段文字。", "第一段文字（已修改）。")) == []
+
+
+def test_line_shift():
+    """在开头插入内容后，未修改的块保留原 id 并更新行号"""
+    renderer = IncrementalRenderer()
+    renderer.update(DOCUMENT)
+    last = renderer.blocks[-1]
+    ops = renderer.update("新的开头\n\n" + DOCUMENT)
+    assert len(ops) == 1 and ops[0]["after"] is None and ops[0]["remove"] == []
+    assert renderer.blocks[-1] is last and last.line == len(("新的开头\n\n" + DOCUMENT).splitlines()) - 1
+
+
+def test_stream_first_paint():
+    """流式渲染：首屏只包含前几个块，其余分批追加，且之后可继续增量更新"""
+    document = "".join(f"段落 {i}\n\n" for i in range(100))
+    renderer = IncrementalRenderer()
+    chunks = renderer.stream(document, first=10, size=40)
+    first = next(chunks)
+    assert first.count('class="md-block"') == 10 and len(renderer.blocks) == 10
+    rest = list(chunks)
+    print(f"首屏 10 块，后续 {len(rest)} 批")
+    assert [chunk.count('class="md-block"') for chunk in rest] == [40, 40, 10]
+    assert renderer.body() == first + "".join(rest)
+    old_id = renderer.blocks[50].id
+    ops = renderer.update(document.replace("段落 50\n", "段落 五十\n"))
+    assert len(ops) == 1 and ops[0]["remove"] == [old_id]
+
+
+def test_page_assets():
+    """只有包含公式或 Mermaid 的文档才加载对应脚本，且脚本来自本地"""
+    renderer = IncrementalRenderer()
+    plain = build_page("".join(renderer.stream("# 标题\n\n普通段落\n")))
+    assert "<script src=" not in plain and "https://" not in plain
+
+    renderer = IncrementalRenderer()
+    page = build_page("".join(renderer.stream(DOCUMENT + "\n```mermaid\ngraph TD; A-->B\n```\n")))
+    scripts = [line for line in page.split("<script") if line.startswith(" src=")]
+    print(f"外部脚本: {scripts}")
+    assert len(scripts) == 2 and all(script.startswith(' src="mdr://app/') for script in scripts)
+    assert "cdn" not in page
+
+
+if __name__ == "__main__":
+    test_split_blocks()
+    test_incremental_update()
+    test_line_shift()
+    test_stream_first_paint()
+    test_page_assets()
+    print("✅ 增量渲染测试通过")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from page_lru import LOAD, REBUILD, RELOAD, SHOW, RenderedPageLRU, restore_action
+
+
+class Tab:
+    """代替 DocumentTab，只记录页面和渲染结果的状态"""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.renderer = object()
+        self.rendered_bytes = size
+        self.discarded = False
+        self.stale = False
+
+    def discard(self):
+        self.discarded = True
+
+    def release(self):
+        self.discard()
+        self.renderer = None
+        self.rendered_bytes = 0
+
+    def activate(self, lru):
+        # 与 DocumentTab.activate 相同的顺序：先决定如何恢复，再重新加载或重建页面
+        lru.touch(self)
+        action = restore_action(self.renderer is not None, self.stale, self.discarded)
+        if action != SHOW:
+            self.renderer = object()
+            self.discarded = False
+            self.stale = False
+        lru.enforce()
+        return action
+
+
+def test_eviction_order():
+    """只有最近使用的几个标签页保留网页；HTML 总量超出上限时最久未用的先释放"""
+    lru = RenderedPageLRU(max_bytes=250, live_pages=3)
+    tabs = [Tab(name, 100) for name in "abcde"]
+    for tab in tabs:
+        tab.activate(lru)
+    a, b, c, d, e = tabs
+    # e 是当前页；d、c 保留网页；b、a 的网页被丢弃
+    assert [tab.discarded for tab in tabs] == [True, True, False, False, False]
+    # 不计当前页，d、c 共 200 字节，再加上 b 或 a 就超出上限，所以 b、a 被释放
+    assert [tab.renderer is not None for tab in tabs] == [False, False, True, True, True]
+
+    # c 成为当前页，e、d 仍在前三名之内
+    c.activate(lru)
+    assert not c.discarded and d.renderer is not None and e.renderer is not None
+    lru.remove(d)
+    a.activate(lru)
+    assert a.renderer is not None and not a.discarded
+    assert e.renderer is not None and c.renderer is not None and b.renderer is None
+
+
+def test_restore():
+    """被丢弃的页面从内存中的 HTML 重建；释放或已过期的重新加载"""
+    assert restore_action(rendered=True, stale=False, discarded=False) == SHOW
+    assert restore_action(rendered=True, stale=False, discarded=True) == REBUILD
+    assert restore_action(rendered=True, stale=True, discarded=False) == RELOAD
+    assert restore_action(rendered=True, stale=True, discarded=True) == LOAD
+    assert restore_action(rendered=False, stale=False, discarded=True) == LOAD
+
+    lru = RenderedPageLRU(max_bytes=1000, live_pages=2)
+    a, b, c = Tab("a", 100), Tab("b", 100), Tab("c", 100)
+    for tab in (a, b, c):
+        tab.activate(lru)
+    assert a.discarded and a.renderer is not None
+    assert a.activate(lru) == REBUILD
+    assert b.discarded and b.renderer is not None
+
+    lru.max_bytes = 50
+    c.activate(lru)
+    assert a.renderer is None and b.renderer is None
+    assert b.activate(lru) == LOAD
+
+
+if __name__ == "__main__":
+    test_eviction_order()
+    test_restore()
+    print("✅ 标签页 LRU 测试通过")
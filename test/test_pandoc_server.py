@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import os
+import stat
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pandoc_server import PandocServer, build_request, read_document
+
+# 模拟 pandoc server：/version 用于健康检查，POST / 把请求原样放进输出；
+# 文本中有"断开"的第一个请求不回复就断开连接
+FAKE_PANDOC = """#!%s
+import json, sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+port = int([arg for arg in sys.argv if arg.startswith('--port=')][0].split('=')[1])
+dropped = []
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body):
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply(b'3.7.0.2')
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if '断开' in request['text'] and not dropped:
+            dropped.append(request)
+            self.close_connection = True
+            return
+        output = json.dumps({'to': request['to'], 'files': sorted(request['files'])})
+        self.reply(json.dumps({'output': output, 'base64': False}).encode())
+
+HTTPServer(('127.0.0.1', port), Handler).serve_forever()
+"""
+
+
+def test_build_request():
+    """请求中包含文档引用的本地图片，网络图片和不存在的文件不包含在内"""
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "img"))
+        with open(os.path.join(directory, "img", "a.png"), "wb") as f:
+            f.write(b"PNG")
+        document = os.path.join(directory, "doc.md")
+        with open(document, "w", encoding="utf-8") as f:
+            f.write('# 标题\n\n![图](img/a.png "说明")\n\n![网络](https://example.com/b.png)\n\n<img src="missing.png">\n')
+        request = build_request(read_document(document), "docx", directory)
+        assert request["to"] == "docx" and request["standalone"]
+        assert request["files"] == {"img/a.png": base64.b64encode(b"PNG").decode()}
+
+
+def test_server_restart():
+    """服务在首次转换时启动，进程退出后自动重启"""
+    if sys.platform == "win32":
+        print("模拟的 pandoc 依赖 shebang 脚本，Windows 下跳过")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "pandoc")
+        with open(executable, "w", encoding="utf-8") as f:
+            f.write(FAKE_PANDOC % sys.executable)
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+        document = os.path.join(directory, "doc.md")
+        with open(document, "w", encoding="utf-8") as f:
+            f.write("# 标题\n")
+
+        server = PandocServer(executable)
+        try:
+            output = os.path.join(directory, "doc.html")
+            server.convert_file(document, output, "html", directory)
+            with open(output, "r", encoding="utf-8") as f:
+                assert json.load(f) == {"to": "html", "files": []}
+            first = server.process
+            first.kill()
+            first.wait()
+            assert not server.healthy()
+            assert json.loads(server.convert(build_request(read_document(document), "docx", directory)))["to"] == "docx"
+            assert server.process is not first and server.healthy()
+        finally:
+            server.stop()
+        assert server.process is None
+
+
+
+def test_failed_request_keeps_healthy_server():
+    """请求失败时重试；服务仍然健康就不重启，不会停掉别的转换正在用的服务"""
+    if sys.platform == "win32":
+        print("模拟的 pandoc 依赖 shebang 脚本，Windows 下跳过")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "pandoc")
+        with open(executable, "w", encoding="utf-8") as f:
+            f.write(FAKE_PANDOC % sys.executable)
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+
+        server = PandocServer(executable)
+        try:
+            server.ensure_running()
+            first = server.process
+            output = server.convert(build_request("# 断开\n", "html", directory))
+            assert json.loads(output)["to"] == "html"
+            assert server.process is first and server.healthy()
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    test_build_request()
+    test_server_restart()
+    test_failed_request_keeps_healthy_server()
+    print("✅ pandoc server 测试通过")
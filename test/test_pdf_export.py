@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PySide6.QtCore import QObject
+
+from conversion_jobs import ConversionCancelled
+from html_export import HtmlExporter
+from pdf_export import PdfExporter, PdfExportError, _PrintJob
+from scheme_handler import DocumentSchemeHandler
+
+
+class SilentPage(QObject):
+    """从不回报的打印页面：模拟脚本出错或打印没有结果"""
+
+    def __init__(self):
+        super().__init__()
+        self.job = None
+        self.loaded = []
+        self.scripts = []
+
+    def load(self, url):
+        self.loaded.append(url)
+
+    def runJavaScript(self, script):
+        self.scripts.append(script)
+
+
+class OfflineExporter(PdfExporter):
+    def _newPage(self):
+        page = SilentPage()
+        self.pages.append(page)
+        return page
+
+
+def write_document(directory):
+    path = os.path.join(directory, "a.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# 标题\n\n正文\n")
+    return path
+
+
+def test_worker_stops_waiting():
+    """页面没有回应时，取消或超时都会让工作线程返回，占用的页面被丢弃"""
+    with tempfile.TemporaryDirectory() as directory:
+        document = write_document(directory)
+        output = os.path.join(directory, "a.pdf")
+        exporter = OfflineExporter(HtmlExporter(), DocumentSchemeHandler(), timeout=0.5)
+
+        cancel_event = threading.Event()
+        threading.Timer(0.3, cancel_event.set).start()
+        try:
+            exporter.export(document, output, cancel_event)
+        except ConversionCancelled:
+            pass
+        else:
+            raise AssertionError("取消后应当抛出 ConversionCancelled")
+        assert exporter.pages == [] and not exporter.waiting
+        assert not exporter.scheme_handler.pages
+
+        try:
+            exporter.export(document, output)
+        except PdfExportError as e:
+            assert "超时" in str(e)
+        else:
+            raise AssertionError("超时后应当抛出 PdfExportError")
+        assert exporter.pages == [] and not exporter.scheme_handler.pages
+
+
+def test_cancel_between_steps():
+    """取消后页面加载完成也不再打印，页面回到池中"""
+    with tempfile.TemporaryDirectory() as directory:
+        document = write_document(directory)
+        exporter = OfflineExporter(HtmlExporter(), DocumentSchemeHandler())
+        job = _PrintJob(document, os.path.join(directory, "a.pdf"), "<html><head></head></html>", threading.Event())
+        exporter.enqueue(job)
+        page = exporter.pages[0]
+        assert page.job is job and page.loaded
+
+        job.cancel_event.set()
+        exporter.onLoaded(page, True)
+        assert job.done.is_set() and job.cancelled and not job.error
+        assert not page.scripts and page.job is None and exporter.idle == [page]
+        assert not exporter.scheme_handler.pages
+
+
+if __name__ == "__main__":
+    test_worker_stops_waiting()
+    test_cancel_between_steps()
+    print("✅ PDF 导出测试通过")
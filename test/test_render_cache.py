@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from disk_cache import DiskCache
+from renderer import IncrementalRenderer
+
+
+def test_disk_cache_lru():
+    """磁盘缓存：压缩存取、超出容量时按最近使用顺序淘汰"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(directory, max_bytes=3000, compress=False)
+        for name in ("a", "b", "c"):
+            assert cache.put(name * 64, name.encode() * 900)
+            time.sleep(0.01)
+        # 访问 a 之后，最久未使用的是 b
+        assert cache.get("a" * 64) == b"a" * 900
+        cache.put("d" * 64, b"d" * 900)
+        print(f"缓存大小: {cache.size()} 字节")
+        assert cache.get("b" * 64) is None
+        assert cache.get("a" * 64) is not None and cache.get("d" * 64) is not None
+
+        compressed = DiskCache(directory, compress=True)
+        compressed.put("e" * 64, b"e" * 100000)
+        assert os.path.getsize(os.path.join(directory, "ee", "e" * 64)) < 1000
+        assert compressed.get("e" * 64) == b"e" * 100000
+
+
+def test_render_cache_hit():
+    """命中缓存时不再调用 Markdown 转换"""
+    document = "# 标题\n\n" + "".join(f"段落 {i}，引用 [链接][1]\n\n" for i in range(50)) + "[1]: https://example.com\n"
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(directory)
+        first = IncrementalRenderer(cache=cache)
+        body = "".join(first.stream(document))
+
+        def fail(source, definitions):
+            raise AssertionError("命中缓存时不应重新渲染")
+
+        second = IncrementalRenderer(cache=cache)
+        second.render_block = fail
+        assert "".join(second.stream(document)) == body
+        assert [block.source for block in second.blocks] == [block.source for block in first.blocks]
+
+        # 缓存恢复后仍可继续增量更新
+        second.render_block = first.render_block
+        ops = second.update(document.replace("段落 7，", "第七段，"))
+        assert len(ops) == 1 and "第七段" in ops[0]["html"]
+
+
+if __name__ == "__main__":
+    test_disk_cache_lru()
+    test_render_cache_hit()
+    print("✅ 渲染缓存测试通过")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from render_pool import RenderPool
+from renderer import IncrementalRenderer
+
+DOCUMENT = "".join(f"## 第 {i} 节\n\n段落 {i}，公式 $x_{i}$，引用 [链接][1]\n\n" for i in range(300)) + "[1]: https://example.com\n"
+
+
+def test_render_pool():
+    """多进程渲染与单线程渲染结果一致，且之后可继续增量更新"""
+    pool = RenderPool(workers=2)
+    try:
+        local = IncrementalRenderer()
+        expected = "".join(local.stream(DOCUMENT))
+        renderer = IncrementalRenderer(pool=pool)
+        chunks = list(renderer.stream(DOCUMENT, first=10, size=100))
+        sizes = [chunk.count("md-block") for chunk in chunks]
+        print(f"分批: {sizes}")
+        assert sizes == [10] + [100] * 5 + [91]
+        assert "".join(chunks) == expected
+        assert 'href="https://example.com"' in chunks[0]
+        ops = renderer.update(DOCUMENT.replace("段落 150，", "第一百五十段，"))
+        assert len(ops) == 1 and "第一百五十段" in ops[0]["html"]
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    test_render_pool()
+    print("✅ 多进程渲染测试通过")
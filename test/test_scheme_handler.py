@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PySide6.QtCore import QObject, QUrl
+from PySide6.QtWebEngineCore import QWebEngineUrlRequestJob
+
+from scheme_handler import DocumentSchemeHandler, local_path, local_url
+
+
+class RecordingJob(QObject):
+    """记录处理结果的请求，代替 WebEngine 传入的 QWebEngineUrlRequestJob"""
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = QUrl(url)
+        self.error = None
+        self.data = None
+
+    def requestUrl(self):
+        return self.url
+
+    def fail(self, error):
+        self.error = error
+
+    def reply(self, mime_type, device):
+        self.data = bytes(device.readAll())
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def request(handler, url):
+    job = RecordingJob(url)
+    handler.requestStarted(job)
+    return job
+
+
+def test_local_path_round_trip():
+    """mdr://local 的地址与本地路径一一对应"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "子目录", "a b.md")
+        url = local_url(path)
+        assert url.scheme() == "mdr" and url.host() == "local"
+        url.setQuery("v=1")
+        assert os.path.normcase(local_path(url)) == os.path.normcase(os.path.abspath(path))
+
+    # UNC 路径保留服务器名
+    url = local_url("//server/share/docs/a b.md")
+    assert url.host() == "local" and url.path() == "/unc/server/share/docs/a b.md"
+    assert local_path(url) == "//server/share/docs/a b.md"
+    image = url.resolved(QUrl("../images/a.png"))
+    assert local_path(image) == "//server/share/images/a.png"
+
+
+def test_page_scripts_and_images():
+    """只有应用写在 head 中的脚本带 nonce；文档中的脚本不能运行，远程图片可以显示"""
+    with tempfile.TemporaryDirectory() as directory:
+        document = os.path.join(directory, "a.md")
+        write(document, "# a\n")
+        handler = DocumentSchemeHandler()
+        html = ('<html><head><script>var a = 1;</script><script src="mdr://app/a.js"></script></head>'
+                '<body><script>alert(1)</script><img src="https://example.com/a.png"></body></html>')
+        served = request(handler, handler.publish(document, html).toString()).data.decode("utf-8")
+        policy = re.search(r'content="([^"]*)"', served).group(1)
+        nonce = re.search(r"'nonce-([^']+)'", policy).group(1)
+        assert served.count(f'<script nonce="{nonce}"') == 2
+        assert "<body><script>alert(1)</script>" in served
+        assert "'unsafe-inline'" not in policy.split("script-src")[1].split(";")[0]
+        assert "https:" in policy.split("img-src")[1].split(";")[0]
+
+        # 每次发布使用新的 nonce
+        again = request(handler, handler.publish(document, html).toString()).data.decode("utf-8")
+        assert nonce not in again
+
+
+def test_only_document_folder_is_served():
+    """文档所在目录的文件都提供；上层目录和工作区只提供图片，其他目录和其他盘符都被拒绝"""
+    with tempfile.TemporaryDirectory() as directory:
+        docs = os.path.join(directory, "docs")
+        document = os.path.join(docs, "a.md")
+        write(document, "# a\n")
+        write(os.path.join(docs, "images", "a.svg"), "<svg/>")
+        write(os.path.join(directory, "secret.txt"), "secret")
+        write(os.path.join(directory, "images", "b.png"), "png")
+        handler = DocumentSchemeHandler()
+
+        image_url = local_url(os.path.join(docs, "images", "a.svg")).toString()
+        # 没有发布任何文档时什么都不提供
+        assert request(handler, image_url).error == QWebEngineUrlRequestJob.Error.RequestDenied
+
+        page = handler.publish(document, "<html><head></head><body>a</body></html>")
+        served = request(handler, page.toString()).data
+        assert served.startswith(b'<html><head><meta http-equiv="Content-Security-Policy"')
+        assert request(handler, image_url).data == b"<svg/>"
+        # ../images/b.png 是图片，可以提供
+        assert request(handler, local_url(docs).toString() + "/../images/b.png").data == b"png"
+
+        docs_url = local_url(docs).toString()
+        for url in (local_url(os.path.join(directory, "secret.txt")).toString(),
+                    docs_url + "/../secret.txt",
+                    docs_url + "/images/%2E%2E/%2E%2E/secret.txt",
+                    "mdr://local/D:/secret.txt",
+                    "mdr://local/etc/passwd"):
+            job = request(handler, url)
+            assert job.data is None and job.error is not None, url
+        assert request(handler, local_url(os.path.join(docs, "missing.png")).toString()).error is not None
+        assert request(handler, "mdr://other" + local_url(document).path()).error == QWebEngineUrlRequestJob.Error.UrlNotFound
+
+        # 文档关闭之后它的目录也不再提供，工作区中的图片仍然提供
+        handler.withdraw(document)
+        assert request(handler, image_url).error == QWebEngineUrlRequestJob.Error.RequestDenied
+        handler.workspace_root = directory
+        assert request(handler, image_url).data == b"<svg/>"
+        assert request(handler, local_url(os.path.join(directory, "secret.txt")).toString()).error is not None
+
+
+if __name__ == "__main__":
+    test_local_path_round_trip()
+    test_page_scripts_and_images()
+    test_only_document_folder_is_served()
+    print("✅ mdr:// 协议处理测试通过")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PySide6.QtCore import QCoreApplication
+
+from single_instance import InstanceServer, decode_message, encode_message
+
+LAUNCH = """
+import sys
+sys.path.insert(0, {root!r})
+from PySide6.QtCore import QCoreApplication
+from single_instance import InstanceServer
+app = QCoreApplication([])
+print(InstanceServer({name!r}, {lock!r}).acquire(sys.argv[1:], wait=3000))
+"""
+
+
+def launch(name, lock, paths):
+    code = LAUNCH.format(root=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."), name=name, lock=lock)
+    return subprocess.Popen([sys.executable, "-c", code, *paths], stdout=subprocess.PIPE, text=True)
+
+
+def test_message():
+    """消息编码解码；格式错误的消息被忽略"""
+    assert decode_message(encode_message(["C:\\文档\\a.md", "/b.md"])) == ["C:\\文档\\a.md", "/b.md"]
+    assert decode_message(b"not json\n") == []
+    assert decode_message(b'{"paths": [1, "a.md"]}\n') == ["a.md"]
+
+
+def test_forward_to_running_instance():
+    """第二次启动把文件交给已运行的实例后立即退出"""
+    app = QCoreApplication.instance() or QCoreApplication([])
+    with tempfile.TemporaryDirectory() as directory:
+        name = f"MarkdownReader-test-{os.getpid()}"
+        lock = os.path.join(directory, "instance.lock")
+        server = InstanceServer(name, lock)
+        received = []
+        server.filesReceived.connect(received.append)
+        try:
+            assert server.acquire([])
+            process = launch(name, lock, ["/docs/a.md", "/docs/b.md"])
+            deadline = time.monotonic() + 20
+            while process.poll() is None and time.monotonic() < deadline:
+                app.processEvents()
+                time.sleep(0.01)
+            app.processEvents()
+            output = process.communicate()[0].strip()
+            print(output, received)
+            assert output == "False"
+            assert received == [["/docs/a.md", "/docs/b.md"]]
+        finally:
+            server.close()
+
+        # 实例关闭后，新的启动成为主实例
+        process = launch(name, lock, [])
+        assert process.communicate(timeout=20)[0].strip() == "True"
+
+
+if __name__ == "__main__":
+    test_message()
+    test_forward_to_running_instance()
+    print("✅ 单实例测试通过")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from startup_profile import IMPORTS, VISIBLE, WINDOW, StartupProfile, process_started
+
+
+def test_phases_and_budget():
+    """各阶段耗时按顺序累计；窗口可见时间超过预算时报告失败"""
+    profile = StartupProfile(started=100.0, budget=1.0)
+    profile.mark(IMPORTS, 100.3)
+    profile.mark(WINDOW, 100.5)
+    assert not profile.within_budget()
+    profile.mark(VISIBLE, 100.9)
+    # 同一阶段只记录第一次
+    profile.mark(VISIBLE, 105.0)
+    phases = [(name, round(duration, 3), round(total, 3)) for name, duration, total in profile.phases()]
+    assert phases == [(IMPORTS, 0.3, 0.3), (WINDOW, 0.2, 0.5), (VISIBLE, 0.4, 0.9)]
+    assert profile.within_budget()
+    report = profile.report()
+    print(report)
+    assert "900 ms" in report and "通过" in report
+
+    slow = StartupProfile(started=100.0, budget=0.5)
+    slow.mark(VISIBLE, 100.9)
+    assert not slow.within_budget() and "超出预算" in slow.report()
+
+
+def test_process_started():
+    """进程启动时间早于当前时间（无法获取时为 None）"""
+    started = process_started()
+    if started is not None:
+        assert 0 <= time.perf_counter() - started < 600
+
+
+if __name__ == "__main__":
+    test_phases_and_budget()
+    test_process_started()
+    print("✅ 启动分析测试通过")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tag_store import TagStore, legacy_tag_files
+
+
+def test_tag_store():
+    """标签逐条写入数据库；同一文件的同名同位置标签只保存一次"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = TagStore(os.path.join(directory, "data", "tags.sqlite"))
+        try:
+            first = store.add("a.md", "开头", 0)
+            assert first is not None and first.name == "开头"
+            assert store.add("a.md", "开头", 0) is None
+            assert store.add("a.md", "开头", 120) is not None
+            store.add("b.md", "结尾", 900)
+            assert store.count() == 3 and store.count("a.md") == 2
+            assert [tag.position for tag in store.tags_for("a.md")] == [0, 120]
+            assert [tag.file for tag in store.tags()] == ["a.md", "a.md", "b.md"]
+
+            assert store.remove(first.id)
+            assert not store.remove(first.id)
+            assert store.get(first.id) is None
+            assert store.count("a.md") == 1
+        finally:
+            store.close()
+
+        # 重新打开后数据仍在
+        store = TagStore(os.path.join(directory, "data", "tags.sqlite"))
+        try:
+            assert store.count() == 2
+        finally:
+            store.close()
+
+
+def test_migrate_tags_json():
+    """旧版 tags.json 自动导入，导入后改名，不会重复导入"""
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = os.path.join(directory, "tags.json")
+        with open(legacy, "w") as f:
+            json.dump({"a.md": [{"name": "第一节", "position": 300}, "旧标签"], "b.md": []}, f, indent=4)
+        store = TagStore(os.path.join(directory, "tags.sqlite"))
+        try:
+            assert store.migrate(legacy) == 2
+            assert not os.path.exists(legacy) and os.path.exists(legacy + ".migrated")
+            tags = store.tags_for("a.md")
+            print([(tag.name, tag.position) for tag in tags])
+            assert [(tag.name, tag.position) for tag in tags] == [("第一节", 300), ("旧标签", None)]
+            assert store.migrate(legacy) == 0
+
+            # 导入是幂等的：改名失败后再次导入不会产生重复标签
+            os.replace(legacy + ".migrated", legacy)
+            assert store.migrate(legacy) == 0 and store.count() == 2
+        finally:
+            store.close()
+
+
+def test_legacy_tag_files():
+    """旧版 tags.json 在工作目录或程序目录中；打包后的程序目录是 exe 所在的目录"""
+    program_dir = os.path.dirname(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tag_store.py")))
+    working_dir = os.getcwd()
+    saved = sys.executable
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            here = os.path.join(os.path.abspath(directory), "tags.json")
+            assert legacy_tag_files() == {here, os.path.join(program_dir, "tags.json")}
+
+            sys.frozen, sys.executable = True, os.path.join(directory, "MarkdownReader", "MarkdownReader.exe")
+            assert legacy_tag_files() == {here, os.path.join(os.path.abspath(directory), "MarkdownReader", "tags.json")}
+        finally:
+            os.chdir(working_dir)
+            sys.__dict__.pop("frozen", None)
+            sys.executable = saved
+
+def test_tag_pages():
+    """标签按页读取，按文件排序；筛选同时匹配标签名和文件路径"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = TagStore(os.path.join(directory, "tags.sqlite"))
+        try:
+            for number in range(500):
+                store.add(f"/docs/{'笔记' if number % 2 else 'notes'}{number % 5}.md", f"tag{number}", number)
+            pages = []
+            page = store.page(limit=200)
+            while page:
+                pages.append(page)
+                page = store.page(after=page[-1], limit=200)
+            tags = [tag for page in pages for tag in page]
+            assert [len(page) for page in pages] == [200, 200, 100]
+            assert [(tag.file, tag.id) for tag in tags] == sorted((tag.file, tag.id) for tag in tags)
+            assert len({tag.id for tag in tags}) == 500
+
+            assert {tag.name for tag in store.page("tag49")} == {"tag49", *(f"tag{n}" for n in range(490, 500))}
+            assert store.count(query="笔记") == 250
+            assert store.count(query="笔记 tag1") == len([tag for tag in tags if "笔记" in tag.file and "tag1" in tag.name])
+            assert store.count("/docs/notes0.md", "tag1") == len([tag for tag in store.tags_for("/docs/notes0.md") if "tag1" in tag.name])
+            # LIKE 的通配符按字面匹配
+            assert store.count(query="%") == 0 and store.count(query="_") == 0
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    test_tag_store()
+    test_migrate_tags_json()
+    test_legacy_tag_files()
+    test_tag_pages()
+    print("✅ 标签存储测试通过")
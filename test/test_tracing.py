@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tracing import MetricsLog, Tracer, document_record
+
+
+def test_disabled_tracer_records_nothing():
+    """关闭跟踪时不记录任何耗时"""
+    tracer = Tracer()
+    with tracer.span("读取文件", document="a.md"):
+        pass
+    tracer.add("渲染分块", "load", 1.0, 2.0)
+    assert not tracer.spans
+
+
+def test_spans_and_phases():
+    """按文档汇总各阶段耗时，页面内的时间换算到同一时钟"""
+    tracer = Tracer()
+    tracer.enabled = True
+    seen = []
+    tracer.listeners.append(seen.append)
+    started = time.perf_counter()
+    with tracer.span("读取文件", thread="加载", document="a.md"):
+        time.sleep(0.01)
+    span = tracer.span("页面加载", "page", document="a.md")
+    span.finish(ok=True)
+    span.finish()
+    tracer.add("渲染分块", "load", started, started + 0.002, document="a.md")
+    tracer.add("渲染分块", "load", started, started + 0.003, document="a.md")
+    tracer.add("渲染分块", "load", started, started + 0.5, document="b.md")
+    now = time.time()
+    tracer.add_wall("插入分块", "page", now, now + 0.004, document="a.md")
+    assert len(tracer.spans) == len(seen) == 6
+    assert tracer.spans[1].args == {"document": "a.md", "ok": True}
+    assert abs(tracer.spans[-1].start - time.perf_counter()) < 1
+
+    phases = tracer.document_phases("a.md", since=started)
+    assert set(phases) == {"读取文件", "页面加载", "渲染分块", "插入分块"}
+    assert phases["读取文件"] >= 10
+    assert phases["渲染分块"] == 5.0
+    assert phases["插入分块"] == 4.0
+    assert tracer.document_phases("a.md", since=time.perf_counter() + 1) == {}
+
+
+def test_chrome_trace():
+    """导出的 Chrome 跟踪文件按线程分组，时间以微秒计"""
+    tracer = Tracer()
+    tracer.enabled = True
+    tracer.add("读取文件", "load", 1.0, 1.25, "加载: a.md", document="a.md")
+    tracer.add("页面加载", "page", 1.5, 2.0, "页面: a.md")
+    tracer.add("渲染分块", "load", 2.0, 2.001, "加载: a.md")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.json")
+        tracer.export(path)
+        with open(path, encoding="utf-8") as f:
+            trace = json.load(f)
+    events = trace["traceEvents"]
+    threads = {event["args"]["name"]: event["tid"] for event in events if event["name"] == "thread_name"}
+    assert set(threads) == {"加载: a.md", "页面: a.md"}
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["读取文件", "页面加载", "渲染分块"]
+    assert spans[0]["ts"] == 1000000.0 and spans[0]["dur"] == 250000.0
+    assert spans[0]["tid"] == spans[2]["tid"] == threads["加载: a.md"]
+    assert spans[0]["args"] == {"document": "a.md"}
+
+
+def test_metrics_log_is_capped():
+    """指标日志超过上限时只保留较新的一半"""
+    with tempfile.TemporaryDirectory() as directory:
+        log = MetricsLog(os.path.join(directory, "trace", "metrics.jsonl"), max_bytes=4096)
+        for index in range(200):
+            log.append(document_record(f"{index}.md", {"读取文件": 1.5}, 12.34, 100))
+        assert os.path.getsize(log.path) <= 4096
+        records = log.read()
+        assert 10 < len(records) < 200
+        assert records[-1]["document"] == "199.md"
+        assert records[-1]["total_ms"] == 12.3 and records[-1]["phases"] == {"读取文件": 1.5}
+        indexes = [int(record["document"].split(".")[0]) for record in records]
+        assert indexes == list(range(indexes[0], 200))
+
+
+if __name__ == "__main__":
+    test_disabled_tracer_records_nothing()
+    test_spans_and_phases()
+    test_chrome_trace()
+    test_metrics_log_is_capped()
+    print("✅ 性能跟踪测试通过")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from workspace_index import HIGHLIGHT_END, HIGHLIGHT_START, WorkspaceIndex, match_line
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_workspace_index():
+    """建立索引后只重新读取修改过的文件；结果按相关度排序并高亮匹配"""
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "docs")
+        write(os.path.join(root, "a.md"), "# 渲染\n\n增量渲染 incremental rendering 的说明\n")
+        write(os.path.join(root, "sub", "b.md"), "# 其他\n\n这里只提到一次 rendering\n\nrendering rendering\n")
+        write(os.path.join(root, "sub", "c.txt"), "rendering 不是 Markdown 文件\n")
+        write(os.path.join(root, ".git", "d.md"), "rendering\n")
+        index = WorkspaceIndex(os.path.join(directory, "index.sqlite"), root)
+        try:
+            assert index.update() == (2, 0)
+            assert index.update() == (0, 0)
+
+            results = index.search("rendering")
+            print([(os.path.basename(result.path), result.snippet) for result in results])
+            assert [os.path.basename(result.path) for result in results] == ["b.md", "a.md"]
+            assert f"{HIGHLIGHT_START}rendering{HIGHLIGHT_END}" in results[0].snippet
+            # 中文子串和两个字的短词都能找到
+            assert [os.path.basename(result.path) for result in index.search("增量渲染")] == ["a.md"]
+            assert [os.path.basename(result.path) for result in index.search("渲染 rendering")] == ["a.md"]
+            assert match_line(results[0].path, "rendering") == 2
+
+            # 修改、删除、新增文件后增量更新
+            time.sleep(0.01)
+            write(os.path.join(root, "a.md"), "# 已改写\n")
+            os.remove(os.path.join(root, "sub", "b.md"))
+            write(os.path.join(root, "sub", "e.md"), "rendering 新文件\n")
+            index.update_file(os.path.join(root, "a.md"))
+            index.update_directory(os.path.join(root, "sub"))
+            assert [os.path.basename(result.path) for result in index.search("rendering")] == ["e.md"]
+            assert index.file_count() == 2 and index.update() == (0, 0)
+        finally:
+            index.close()
+
+
+if __name__ == "__main__":
+    test_workspace_index()
+    print("✅ 工作区索引测试通过")
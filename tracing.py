@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Spans kept for export; the oldest are dropped beyond this
+MAX_SPANS = 200000
+# The metrics log is cut back to its newer half when it grows past this
+METRICS_LOG_BYTES = 2 * 1024 * 1024
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'category', 'start', 'end', 'thread', 'args')
+
+    def __init__(self, tracer, name, category, args, start=None, end=None, thread=None):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = start if start is not None else time.perf_counter()
+        self.end = end
+        self.thread = thread or threading.current_thread().name
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def finish(self, **args):
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.args.update(args)
+            self.tracer.record(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off."""
+    duration = 0.0
+
+    def finish(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Timed spans from every stage of showing and exporting a document.
+
+    Spans can be opened on one thread or callback and finished on another, so a
+    stage like a page load is timed from the call that starts it to the signal
+    that ends it. Times are perf_counter seconds; spans measured in the page
+    arrive as wall-clock times and are converted. While disabled, span() hands
+    out a shared no-op span and nothing is recorded.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.enabled = False
+        self.spans = deque(maxlen=max_spans)
+        self.listeners = []
+        self._lock = threading.Lock()
+        # perf_counter has no fixed origin; this maps wall-clock times onto it
+        self._wall_offset = time.time() - time.perf_counter()
+
+    def span(self, name, category='load', thread=None, **args):
+        """A span starting now; finish() it, or use it as a context manager."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args, thread=thread)
+
+    def add(self, name, category, start, end, thread=None, **args):
+        """Record a span measured elsewhere, in perf_counter seconds."""
+        if self.enabled:
+            self.record(Span(self, name, category, args, start, end, thread))
+
+    def add_wall(self, name, category, start, end, thread=None, **args):
+        """Record a span measured in wall-clock seconds, e.g. by the page."""
+        self.add(name, category, start - self._wall_offset, end - self._wall_offset, thread, **args)
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def document_phases(self, document, since=None):
+        """Total milliseconds per span name for a document, from spans starting at or after since."""
+        with self._lock:
+            spans = [span for span in self.spans
+                     if span.args.get('document') == document and (since is None or span.start >= since)]
+        phases = {}
+        for span in spans:
+            phases[span.name] = phases.get(span.name, 0.0) + (span.end - span.start) * 1000
+        return {name: round(duration, 1) for name, duration in phases.items()}
+
+    def chrome_trace(self):
+        """The spans as a Chrome trace (chrome://tracing, Perfetto)."""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        threads = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'Markdown Reader'}}]
+        for span in spans:
+            tid = threads.get(span.thread)
+            if tid is None:
+                tid = threads[span.thread] = len(threads) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': span.thread}})
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round(span.start * 1e6, 1),
+                'dur': round((span.end - span.start) * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': span.args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False, default=str)
+        os.replace(temp_path, path)
+
+
+class MetricsLog:
+    """Per-document timings, one JSON line per load, capped in size."""
+
+    def __init__(self, path, max_bytes=METRICS_LOG_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                size = f.tell()
+            if size > self.max_bytes:
+                self._trim()
+
+    def _trim(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        kept = []
+        total = 0
+        for line in reversed(lines):
+            total += len(line.encode('utf-8'))
+            if total > self.max_bytes // 2:
+                break
+            kept.append(line)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(reversed(kept))
+        os.replace(temp_path, self.path)
+
+    def read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+
+
+def document_record(document, phases, total_ms, size=None):
+    return {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'document': document,
+        'bytes': size,
+        'total_ms': round(total_ms, 1),
+        'phases': phases,
+    }
+
+
+# Shared by the loaders, the pages, the figure renderer and the export queue
+TRACER = Tracer()
@@ -0,0 +1,247 @@
+import os
+import re
+import sqlite3
+import threading
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+# Marks around matched text in snippets
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# Trigram indexes substrings, which also covers Chinese text without word breaks;
+# it needs at least three characters per term, shorter ones are matched with LIKE
+_TRIGRAM = 3
+
+# Matches ranked per query; bm25 over every hit of a term found in most files
+# would cost more than the whole search budget, so only the first ones are ranked
+RANK_CANDIDATES = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime REAL NOT NULL, size INTEGER NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(body, tokenize='trigram');
+"""
+
+
+def _is_markdown(name):
+    return name.lower().endswith(MARKDOWN_EXTENSIONS)
+
+
+def iter_markdown_files(root):
+    for directory, dirnames, filenames in os.walk(root):
+        # Hidden folders (.git and the like) hold no documents worth searching
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        for name in filenames:
+            if _is_markdown(name):
+                yield os.path.join(directory, name)
+
+
+def _terms(query):
+    return [term for term in query.split() if term]
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _snippet(body, terms, width=40):
+    lowered = body.lower()
+    positions = [(lowered.find(term.lower()), term) for term in terms]
+    positions = [(position, term) for position, term in positions if position >= 0]
+    if not positions:
+        return body[:width * 2]
+    position, term = min(positions)
+    start = max(position - width, 0)
+    end = position + len(term) + width
+    text = body[start:end]
+    for term in terms:
+        text = re.sub(re.escape(term), lambda match: f'{HIGHLIGHT_START}{match.group(0)}{HIGHLIGHT_END}', text, flags=re.I)
+    return ('…' if start else '') + text + ('…' if end < len(body) else '')
+
+
+def match_line(path, query):
+    """Line (0-based) of the first match of query's first term in path, or 0."""
+    terms = _terms(query)
+    if not terms:
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for number, line in enumerate(f):
+                if terms[0].lower() in line.lower():
+                    return number
+    except OSError:
+        pass
+    return 0
+
+
+class SearchResult:
+    __slots__ = ('path', 'snippet', 'rank')
+
+    def __init__(self, path, snippet, rank):
+        self.path = path
+        self.snippet = snippet
+        self.rank = rank
+
+
+class WorkspaceIndex:
+    """Full-text index of the Markdown files under a folder, in SQLite FTS5.
+
+    Files are re-read only when their mtime or size changed since they were
+    indexed, so refreshing a large tree after startup or a watcher event is
+    mostly a directory walk. Every thread gets its own connection; WAL lets
+    searches run while the indexer writes.
+    """
+
+    def __init__(self, db_path, root):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        self._local = threading.local()
+        self._interrupted = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def interrupt(self):
+        self._interrupted.set()
+
+    def file_count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def update(self, progress=None, batch=200):
+        """Bring the index in line with the folder; returns (indexed, removed)."""
+        self._interrupted.clear()
+        connection = self._connection()
+        known = {path: (file_id, mtime, size) for file_id, path, mtime, size in
+                 connection.execute('SELECT id, path, mtime, size FROM files')}
+        seen = set()
+        indexed = 0
+        pending = 0
+        for path in iter_markdown_files(self.root):
+            if self._interrupted.is_set():
+                connection.commit()
+                return indexed, 0
+            seen.add(path)
+            if self._index(connection, path, known.get(path)):
+                indexed += 1
+                pending += 1
+                if pending >= batch:
+                    connection.commit()
+                    pending = 0
+                    if progress is not None:
+                        progress(indexed)
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            self._remove(connection, path, known[path][0])
+        connection.commit()
+        return indexed, len(removed)
+
+    def update_directory(self, directory):
+        """Re-check the files directly inside directory, e.g. after a watcher event."""
+        connection = self._connection()
+        directory = os.path.abspath(directory)
+        prefix = os.path.join(directory, '')
+        known = {path: (file_id, mtime, size) for file_id, path, mtime, size in
+                 connection.execute("SELECT id, path, mtime, size FROM files WHERE path LIKE ? ESCAPE '\\'",
+                                    (_escape_like(prefix) + '%',))
+                 if os.path.dirname(path) == directory}
+        try:
+            names = [name for name in os.listdir(directory) if _is_markdown(name)]
+        except OSError:
+            names = []
+        current = {os.path.join(directory, name) for name in names}
+        for path in current:
+            self._index(connection, path, known.get(path))
+        for path in set(known) - current:
+            self._remove(connection, path, known[path][0])
+        connection.commit()
+
+    def update_file(self, path):
+        connection = self._connection()
+        path = os.path.abspath(path)
+        row = connection.execute('SELECT id, mtime, size FROM files WHERE path = ?', (path,)).fetchone()
+        if os.path.isfile(path):
+            self._index(connection, path, row)
+        elif row is not None:
+            self._remove(connection, path, row[0])
+        connection.commit()
+
+    def _index(self, connection, path, known):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if known is not None and known[1] == stat.st_mtime and known[2] == stat.st_size:
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                body = f.read()
+        except OSError:
+            return False
+        if known is None:
+            file_id = connection.execute('INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)',
+                                         (path, stat.st_mtime, stat.st_size)).lastrowid
+        else:
+            file_id = known[0]
+            connection.execute('UPDATE files SET mtime = ?, size = ? WHERE id = ?', (stat.st_mtime, stat.st_size, file_id))
+            connection.execute('DELETE FROM docs WHERE rowid = ?', (file_id,))
+        connection.execute('INSERT INTO docs (rowid, body) VALUES (?, ?)', (file_id, body))
+        return True
+
+    def _remove(self, connection, path, file_id):
+        connection.execute('DELETE FROM docs WHERE rowid = ?', (file_id,))
+        connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def search(self, query, limit=50):
+        """Best matches for all whitespace-separated terms of query, best first."""
+        terms = _terms(query)
+        if not terms:
+            return []
+        long_terms = [term for term in terms if len(term) >= _TRIGRAM]
+        short_terms = [term for term in terms if len(term) < _TRIGRAM]
+        conditions = []
+        parameters = []
+        if long_terms:
+            conditions.append('docs MATCH ?')
+            parameters.append(' AND '.join(_fts_phrase(term) for term in long_terms))
+        for term in short_terms:
+            conditions.append("docs.body LIKE ? ESCAPE '\\'")
+            parameters.append(f'%{_escape_like(term)}%')
+        if long_terms:
+            where = " AND ".join(conditions)
+            cutoff = self._connection().execute(f'SELECT rowid FROM docs WHERE {where} ORDER BY rowid LIMIT 1 OFFSET ?',
+                                                [*parameters, RANK_CANDIDATES - 1]).fetchone()
+            if cutoff is not None:
+                conditions.append('docs.rowid <= ?')
+                parameters.append(cutoff[0])
+            # Snippets are cut in Python: FTS5 counts trigrams, not characters, for their length
+            sql = (f'SELECT files.path, docs.rank FROM docs JOIN files ON files.id = docs.rowid '
+                   f'WHERE {" AND ".join(conditions)} ORDER BY docs.rank LIMIT ?')
+            rows = self._connection().execute(sql, [*parameters, limit]).fetchall()
+            return [SearchResult(path, _snippet(self._body(path), terms), rank) for path, rank in rows]
+        sql = (f'SELECT files.path, docs.body FROM docs JOIN files ON files.id = docs.rowid '
+               f'WHERE {" AND ".join(conditions)} LIMIT ?')
+        rows = self._connection().execute(sql, [*parameters, limit]).fetchall()
+        return [SearchResult(path, _snippet(body, terms), 0) for path, body in rows]
+
+    def _body(self, path):
+        row = self._connection().execute('SELECT docs.body FROM docs JOIN files ON files.id = docs.rowid WHERE files.path = ?',
+                                         (path,)).fetchone()
+        return row[0] if row else ''
@@ -0,0 +1,345 @@
+import html
+import os
+import threading
+import time
+
+from PySide6.QtCore import QFileSystemWatcher, Qt, QThread, QTimer, Signal
+from PySide6.QtWidgets import (QComboBox, QDockWidget, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QListWidget,
+                               QListWidgetItem, QPushButton, QVBoxLayout, QWidget)
+
+from disk_cache import make_key, user_cache_dir
+from document_search import SearchError
+from folder_grep import FolderGrep
+from workspace_index import HIGHLIGHT_END, HIGHLIGHT_START, WorkspaceIndex, match_line
+
+# Folders watched for added and removed files; deeper trees are refreshed by a full update
+MAX_WATCHED_DIRECTORIES = 4000
+
+INDEX_MODE = 0
+GREP_MODE = 1
+# Lines shown for a folder regex search before it stops
+MAX_GREP_RESULTS = 5000
+
+
+def index_path(root):
+    return user_cache_dir('workspace', make_key(os.path.abspath(root))[:16] + '.sqlite')
+
+
+class IndexThread(QThread):
+    progress = Signal(int)
+
+    def __init__(self, index, directories=None, files=None):
+        super().__init__()
+        self.index = index
+        # Without directories or files the whole tree is brought up to date
+        self.directories = directories
+        self.files = files
+
+    def run(self):
+        try:
+            if self.directories is None and self.files is None:
+                self.index.update(progress=self.progress.emit)
+            else:
+                for directory in self.directories or ():
+                    self.index.update_directory(directory)
+                for path in self.files or ():
+                    self.index.update_file(path)
+        finally:
+            self.index.close()
+
+
+class GrepThread(QThread):
+    resultsFound = Signal(list)
+    failed = Signal(str)
+
+    def __init__(self, grep, root, pattern, case):
+        super().__init__()
+        self.grep = grep
+        self.root = root
+        self.pattern = pattern
+        self.case = case
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        # Results are handed to the list in batches so a flood of matches does not
+        # swamp the event loop
+        pending = []
+        found = 0
+        last_emit = time.monotonic()
+        try:
+            for path, matches in self.grep.search(self.root, self.pattern, self.case, self.cancel_event):
+                pending.extend((path, line, text) for line, text in matches)
+                found += len(matches)
+                if found >= MAX_GREP_RESULTS:
+                    break
+                if time.monotonic() - last_emit > 0.1:
+                    self.resultsFound.emit(pending)
+                    pending = []
+                    last_emit = time.monotonic()
+        except SearchError as e:
+            self.failed.emit(str(e))
+        if pending:
+            self.resultsFound.emit(pending)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class WorkspaceSearchPanel(QDockWidget):
+    """Searches every Markdown file under a folder through a WorkspaceIndex.
+
+    The index is refreshed in the background when the folder is chosen, when
+    files are added or removed and when an open document changes; results are
+    ranked and open at the first match.
+
+    In the "正则查找" mode the folder is scanned with a FolderGrep instead, for
+    regex searches and folders that have not been indexed yet.
+    """
+    openRequested = Signal(str, int)
+    rootChanged = Signal(str)
+
+    def __init__(self, root=None, parent=None):
+        super().__init__('工作区搜索', parent)
+        self.index = None
+        self.thread = None
+        self.pending_directories = set()
+        self.pending_files = set()
+        self.grep = None
+        self.grep_thread = None
+        self.grep_count = 0
+
+        self.folderLabel = QLabel()
+        folderButton = QPushButton('选择文件夹')
+        folderButton.clicked.connect(self.chooseFolder)
+        refreshButton = QPushButton('刷新')
+        refreshButton.clicked.connect(self.refresh)
+        folderRow = QHBoxLayout()
+        folderRow.addWidget(self.folderLabel, 1)
+        folderRow.addWidget(folderButton)
+        folderRow.addWidget(refreshButton)
+
+        self.modeBox = QComboBox()
+        self.modeBox.addItems(['索引搜索', '正则查找'])
+        self.modeBox.currentIndexChanged.connect(self.onModeChanged)
+        self.queryInput = QLineEdit()
+        self.queryInput.setPlaceholderText('在工作区中搜索...')
+        self.queryInput.textChanged.connect(self.onQueryChanged)
+        self.queryInput.returnPressed.connect(self.search)
+        self.stopButton = QPushButton('停止')
+        self.stopButton.setEnabled(False)
+        self.stopButton.clicked.connect(self.stopGrep)
+        queryRow = QHBoxLayout()
+        queryRow.addWidget(self.modeBox)
+        queryRow.addWidget(self.queryInput, 1)
+        queryRow.addWidget(self.stopButton)
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(150)
+        self.searchTimer.timeout.connect(self.search)
+
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.openResult)
+        self.statusLabel = QLabel()
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(folderRow)
+        layout.addLayout(queryRow)
+        layout.addWidget(self.results)
+        layout.addWidget(self.statusLabel)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.onDirectoryChanged)
+        # Saving a file often touches its folder several times; update once
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(500)
+        self.updateTimer.timeout.connect(self.startPendingUpdate)
+
+        if root and os.path.isdir(root):
+            self.setRoot(root)
+        else:
+            self.folderLabel.setText('未选择文件夹')
+
+    @property
+    def root(self):
+        return self.index.root if self.index is not None else None
+
+    def chooseFolder(self):
+        root = QFileDialog.getExistingDirectory(self, '选择工作区文件夹', self.root or '')
+        if root:
+            self.setRoot(root)
+            self.rootChanged.emit(self.root)
+
+    def setRoot(self, root):
+        self.stopGrep()
+        self.stopIndexing()
+        self.pending_directories = set()
+        self.pending_files = set()
+        self.index = WorkspaceIndex(index_path(root), root)
+        self.folderLabel.setText(self.index.root)
+        self.folderLabel.setToolTip(self.index.root)
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        directories = [self.index.root]
+        for directory, dirnames, _ in os.walk(self.index.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            directories.extend(os.path.join(directory, name) for name in dirnames)
+            if len(directories) >= MAX_WATCHED_DIRECTORIES:
+                break
+        self.watcher.addPaths(directories[:MAX_WATCHED_DIRECTORIES])
+        self.refresh()
+
+    def refresh(self):
+        if self.index is None:
+            return
+        if self.thread is not None and self.thread.isRunning():
+            return
+        self.statusLabel.setText('正在更新索引...')
+        self.startThread(IndexThread(self.index))
+
+    def startThread(self, thread):
+        self.thread = thread
+        thread.progress.connect(lambda count: self.statusLabel.setText(f'正在更新索引: {count} 个文件'))
+        thread.finished.connect(self.onIndexUpdated)
+        thread.start()
+
+    def onIndexUpdated(self):
+        if self.sender() is not self.thread or self.index is None:
+            return
+        self.statusLabel.setText(f'已索引 {self.index.file_count()} 个文件')
+        if self.queryInput.text():
+            self.search()
+        self.startPendingUpdate()
+
+    def onDirectoryChanged(self, directory):
+        self.pending_directories.add(directory)
+        self.updateTimer.start()
+
+    def onFileChanged(self, path):
+        if self.root and os.path.abspath(path).startswith(os.path.join(self.root, '')):
+            self.pending_files.add(path)
+            self.updateTimer.start()
+
+    def startPendingUpdate(self):
+        if self.index is None or not (self.pending_directories or self.pending_files):
+            return
+        if self.thread is not None and self.thread.isRunning():
+            # Picked up when the running update finishes
+            return
+        directories, self.pending_directories = self.pending_directories, set()
+        files, self.pending_files = self.pending_files, set()
+        self.startThread(IndexThread(self.index, directories, files))
+
+    def showMode(self, mode):
+        self.modeBox.setCurrentIndex(mode)
+        self.show()
+        self.raise_()
+        self.queryInput.setFocus()
+
+    def onModeChanged(self, mode):
+        self.stopGrep()
+        self.results.clear()
+        self.queryInput.setPlaceholderText('在工作区中搜索...' if mode == INDEX_MODE else '正则表达式，回车开始查找')
+        if mode == INDEX_MODE and self.index is not None:
+            self.statusLabel.setText(f'已索引 {self.index.file_count()} 个文件')
+        else:
+            self.statusLabel.setText('')
+
+    def onQueryChanged(self):
+        # Scanning a folder is too slow to repeat on every keystroke
+        if self.modeBox.currentIndex() == INDEX_MODE:
+            self.searchTimer.start()
+
+    def search(self):
+        self.searchTimer.stop()
+        if self.modeBox.currentIndex() == GREP_MODE:
+            self.startGrep()
+            return
+        self.results.clear()
+        query = self.queryInput.text().strip()
+        if self.index is None or not query:
+            return
+        for result in self.index.search(query):
+            snippet = html.escape(' '.join(result.snippet.split()))
+            snippet = snippet.replace(HIGHLIGHT_START, '<span style="background-color:#ffe066">').replace(HIGHLIGHT_END, '</span>')
+            label = QLabel(f'<b>{html.escape(os.path.relpath(result.path, self.index.root))}</b><br>{snippet}')
+            label.setWordWrap(True)
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, result.path)
+            item.setToolTip(result.path)
+            item.setSizeHint(label.sizeHint())
+            self.results.addItem(item)
+            self.results.setItemWidget(item, label)
+
+    def startGrep(self):
+        self.stopGrep()
+        self.results.clear()
+        pattern = self.queryInput.text()
+        if not pattern:
+            return
+        if self.root is None:
+            self.statusLabel.setText('请先选择文件夹')
+            return
+        if self.grep is None:
+            self.grep = FolderGrep()
+        self.grep_count = 0
+        self.statusLabel.setText('正在查找...')
+        self.grep_thread = GrepThread(self.grep, self.root, pattern, case=False)
+        self.grep_thread.resultsFound.connect(self.addGrepResults)
+        self.grep_thread.failed.connect(lambda message: self.statusLabel.setText(f'正则表达式有误: {message}'))
+        self.grep_thread.finished.connect(self.onGrepFinished)
+        self.stopButton.setEnabled(True)
+        self.grep_thread.start()
+
+    def addGrepResults(self, results):
+        if self.sender() is not self.grep_thread:
+            return
+        for path, line, text in results:
+            item = QListWidgetItem(f'{os.path.relpath(path, self.root)}:{line + 1}  {text.strip()}')
+            item.setData(Qt.UserRole, path)
+            item.setData(Qt.UserRole + 1, line)
+            item.setToolTip(path)
+            self.results.addItem(item)
+        self.grep_count += len(results)
+        self.statusLabel.setText(f'正在查找: {self.grep_count} 处匹配')
+
+    def onGrepFinished(self):
+        if self.sender() is not self.grep_thread:
+            return
+        self.stopButton.setEnabled(False)
+        if not self.statusLabel.text().startswith('正则表达式有误'):
+            stopped = ' (已停止)' if self.grep_thread.cancel_event.is_set() else ''
+            self.statusLabel.setText(f'找到 {self.grep_count} 处匹配{stopped}')
+        self.grep_thread = None
+
+    def stopGrep(self):
+        if self.grep_thread is not None:
+            self.grep_thread.cancel()
+
+    def openResult(self, item):
+        path = item.data(Qt.UserRole)
+        line = item.data(Qt.UserRole + 1)
+        if line is None:
+            line = match_line(path, self.queryInput.text())
+        self.openRequested.emit(path, line)
+
+    def stopIndexing(self):
+        if self.thread is not None and self.thread.isRunning():
+            self.index.interrupt()
+            self.thread.wait()
+        self.thread = None
+        if self.index is not None:
+            self.index.close()
+
+    def shutdown(self):
+        if self.grep_thread is not None:
+            self.grep_thread.cancel()
+            self.grep_thread.wait()
+            self.grep_thread = None
+        if self.grep is not None:
+            self.grep.shutdown()
+        self.stopIndexing()